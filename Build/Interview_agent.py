@@ -1,109 +1,234 @@
-import ollama
 import streamlit as st
 import re
-import sqlite3
 from pathlib import Path
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import contextvars
+import json
+import logging
 import random
+import secrets
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from evaluation import EVALUATION_FORMAT, REPAIR_PROMPT, parse_evaluation, stream_explanation
+from llm_cache import cache_key, get_cache
+from llm_client import LLMBusyError, filter_think, get_client
+from llm_router import get_router
+from llm_scheduler import BACKGROUND, QUESTION, ROUTE_PRIORITY, SUMMARY
+from llm_warmup import get_warmer, start_warmup
+from metrics import REGISTRY, record_llm_response, span, start_exporters, start_trace, timed
+from prescore import prescore, record_shortcut, remember
+from prompt_builder import Section, plan_prompt
+from question_bank import (add_questions, draw_question, fill_in_background, question_prompt, regenerate_question,
+                           similar_question)
+from storage import (fetch_leaderboard, fetch_user_history, get_pool, load_checkpoint, save_checkpoint, save_final_results,
+                     save_question_answer, start_session, warm_read_cache)
+
+logger = logging.getLogger(__name__)
 
 # Load external CSS
-with open("style.css", "r") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    st.markdown('<link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">', unsafe_allow_html=True)
+STYLE_PATH = Path(__file__).with_name("style.css")  # Not the CWD: tools import this module from elsewhere
+FONT_LINK = '<link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">'
+
+@st.cache_resource
+def load_styles():
+    # Read once per process; each rerun only re-sends the cached markup
+    return f"<style>{STYLE_PATH.read_text()}</style>\n{FONT_LINK}"
 
 # Database Functions
-def init_db(conn):
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS interviews (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            job_role TEXT,
-            question TEXT,
-            answer TEXT,
-            question_score INTEGER,
-            total_score INTEGER,
-            selected TEXT,
-            timestamp TEXT
-        )
-    """)
-    c.execute("CREATE INDEX IF NOT EXISTS idx_user_role ON interviews (username, job_role)")
-    conn.commit()
-
-def save_question_answer(conn, username, job_role, question, answer, question_score):
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO interviews (username, job_role, question, answer, question_score, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (username, job_role, question, answer, question_score, datetime.now().isoformat()))
-    conn.commit()
-
-def save_final_results(conn, username, job_role, total_score, selected):
-    c = conn.cursor()
-    c.execute("""
-        UPDATE interviews
-        SET total_score = ?, selected = ?
-        WHERE username = ? AND job_role = ? AND total_score IS NULL
-    """, (total_score, "Selected" if selected else "Not Selected", username, job_role))
-    conn.commit()
-
-@st.cache_data(ttl=60)
-def get_leaderboard(job_role):
-    conn = sqlite3.connect("interviews.db")
-    c = conn.cursor()
-    c.execute("""
-        SELECT DISTINCT username, job_role, total_score
-        FROM interviews
-        WHERE job_role = ? AND total_score IS NOT NULL
-        ORDER BY total_score DESC
-        LIMIT 5
-    """, (job_role,))
-    leaderboard = c.fetchall()
-    conn.close()
-    return leaderboard
-
-@st.cache_data(ttl=60)
-def get_user_history(username, job_role):
-    conn = sqlite3.connect("interviews.db")
-    c = conn.cursor()
-    c.execute("""
-        SELECT DISTINCT total_score
-        FROM interviews
-        WHERE username = ? AND job_role = ? AND total_score IS NOT NULL
-        ORDER BY timestamp DESC
-    """, (username, job_role))
-    scores = [row[0] for row in c.fetchall()]
-    conn.close()
-    return scores
-
-# LLM Interaction with DeepSeek-R1
-def call_llm(prompt, context="", model="deepseek-r1"):
+@st.cache_resource
+def warm_read_cache_once():
+    # Once per process: the busiest roles' leaderboards are in memory before their first sidebar
+    threading.Thread(target=warm_read_cache, name="read-cache-warmup", daemon=True).start()
+
+# LLM Interaction (model per call site chosen by llm_router)
+LLM_OPTIONS = {"temperature": 0.7}  # num_ctx is chosen per prompt by plan_prompt
+# Shows the candidate their place in the shared LLM queue; set per rerun by watch_queue, unset in worker threads
+queue_notice = contextvars.ContextVar("queue_notice", default=None)
+
+def cached_llm_response(cache, key, cache_policy, exclude=()):
+    cached = cache.get(key, cache_policy, exclude)
+    REGISTRY.inc("llm_cache_lookups_total", help="LLM cache lookups by call site and outcome.",
+                 route=cache_policy, result="miss" if cached is None else "hit")
+    return cached
+
+def record_llm_error(model, cache_policy):
+    logger.exception("LLM call failed (model=%s, route=%s)", model, cache_policy)
+    REGISTRY.inc("llm_errors_total", help="LLM calls that failed.", model=model, route=cache_policy)
+
+def call_llm(prompt, context="", model=None, cache_policy="evaluation", exclude=(), timeout=None, format="",
+             priority=None, user=None):
+    # The router picks the model for this call site; on an error or timeout the next model in its chain answers.
+    # The scheduler runs it by priority (the call site's class unless given), taking turns between users.
+    with span("call_llm", route=cache_policy):
+        priority = ROUTE_PRIORITY.get(cache_policy, QUESTION) if priority is None else priority
+        plan = plan_prompt(prompt, context, route=cache_policy)
+        router = get_router()
+        cache = get_cache()
+        error = None
+        for target in router.chain(cache_policy, model):
+            options = dict(LLM_OPTIONS, **target.options, num_ctx=plan.num_ctx)
+            key = cache_key(target.model, options, plan.context, prompt, format)
+            cached = cached_llm_response(cache, key, cache_policy, exclude)
+            if cached is not None:
+                return cached
+            started = time.perf_counter()
+            try:
+                response = get_client().generate(
+                    model=target.model,
+                    prompt=f"{plan.context}\n{prompt}",
+                    options=options,
+                    timeout=timeout or target.timeout,
+                    format=format,
+                    priority=priority,
+                    user=user,
+                    on_wait=queue_notice.get()
+                )
+            except LLMBusyError as e:
+                # Every model shares the same slots, so falling back would only add to the queue
+                record_llm_error(target.model, cache_policy)
+                return f"Error calling LLM: {str(e)}"
+            except Exception as e:
+                record_llm_error(target.model, cache_policy)
+                router.record(cache_policy, target.model, time.perf_counter() - started, ok=False)
+                error = e
+                continue
+            router.record(cache_policy, target.model, time.perf_counter() - started, ok=True)
+            record_llm_response(response, target.model, cache_policy)
+            raw_response = response["response"].strip()
+            filtered_response = re.sub(r'<think>.*?</think>', '', raw_response, flags=re.DOTALL).strip()
+            cache.put(key, cache_policy, filtered_response)
+            return filtered_response
+        return f"Error calling LLM: {str(error)}"
+
+def call_llm_stream(prompt, context="", model=None, cache_policy="evaluation", timeout=None, format="", priority=None,
+                    user=None):
+    # Same as call_llm, but yields visible text as the model produces it.
+    # Falls back only until the first text is shown; after that an error ends the stream.
+    with span("call_llm_stream", route=cache_policy):
+        priority = ROUTE_PRIORITY.get(cache_policy, QUESTION) if priority is None else priority
+        plan = plan_prompt(prompt, context, route=cache_policy)
+        router = get_router()
+        cache = get_cache()
+        error = None
+        for target in router.chain(cache_policy, model):
+            options = dict(LLM_OPTIONS, **target.options, num_ctx=plan.num_ctx)
+            key = cache_key(target.model, options, plan.context, prompt, format)
+            cached = cached_llm_response(cache, key, cache_policy)
+            if cached is not None:
+                yield cached
+                return
+            parts = []
+            started = time.perf_counter()
+            try:
+                chunks = get_client().stream(
+                    target.model, f"{plan.context}\n{prompt}", options, timeout or target.timeout,
+                    on_done=lambda final, m=target.model: record_llm_response(final, m, cache_policy), format=format,
+                    priority=priority, user=user, on_wait=queue_notice.get()
+                )
+                for text in filter_think(chunks):
+                    parts.append(text)
+                    yield text
+            except Exception as e:
+                record_llm_error(target.model, cache_policy)
+                if not isinstance(e, LLMBusyError):
+                    router.record(cache_policy, target.model, time.perf_counter() - started, ok=False)
+                if parts or isinstance(e, LLMBusyError):
+                    yield f"Error calling LLM: {str(e)}"
+                    return
+                error = e
+                continue
+            router.record(cache_policy, target.model, time.perf_counter() - started, ok=True)
+            cache.put(key, cache_policy, "".join(parts).strip())
+            return
+        yield f"Error calling LLM: {str(error)}"
+
+def settle_future(setter, value):
     try:
-        response = ollama.generate(
-            model=model,
-            prompt=f"{context}\n{prompt}",
-            options={"temperature": 0.7, "num_ctx": 2048}
-        )
-        raw_response = response["response"].strip()
-        filtered_response = re.sub(r'<think>.*?</think>', '', raw_response, flags=re.DOTALL)
-        return filtered_response.strip()
-    except Exception as e:
-        return f"Error calling LLM: {str(e)}"
+        setter(value)
+    except InvalidStateError:
+        pass  # Cancelled meanwhile
+
+def then_run(source, fn, executor, result=None):
+    # Future of fn(source's result), run on `executor` once `source` is done; no thread waits on `source`
+    # meanwhile. Cancelling the returned future cancels `source`.
+    result = Future() if result is None else result
+    result.add_done_callback(lambda future: future.cancelled() and source.cancel())
+
+    def run():
+        try:
+            settle_future(result.set_result, fn(source.result()))
+        except Exception as e:
+            settle_future(result.set_exception, e)
+
+    def done(source):
+        if source.cancelled():
+            result.cancel()
+        elif source.exception() is not None:
+            settle_future(result.set_exception, source.exception())
+        else:
+            try:
+                executor.submit(run)
+            except RuntimeError as e:  # Interpreter shutting down
+                settle_future(result.set_exception, e)
+
+    source.add_done_callback(done)
+    return result
+
+def submit_llm(prompt, context="", cache_policy="evaluation", exclude=(), priority=None, user=None, executor=None):
+    # Same as call_llm, but returns a Future of the text instead of waiting: the call only sits in the
+    # scheduler queue, and its reply is processed on `executor`. The route's first model only, no fallback.
+    priority = ROUTE_PRIORITY.get(cache_policy, QUESTION) if priority is None else priority
+    plan = plan_prompt(prompt, context, route=cache_policy)
+    router = get_router()
+    cache = get_cache()
+    target = router.chain(cache_policy)[0]
+    options = dict(LLM_OPTIONS, **target.options, num_ctx=plan.num_ctx)
+    key = cache_key(target.model, options, plan.context, prompt, "")
+    cached = cached_llm_response(cache, key, cache_policy, exclude)
+    if cached is not None:
+        result = Future()
+        result.set_result(cached)
+        return result
+    started = time.perf_counter()
+    call = get_client().generate_async(target.model, f"{plan.context}\n{prompt}", options, priority=priority, user=user)
+
+    def failed(call):
+        if not call.cancelled() and call.exception() is not None and not isinstance(call.exception(), LLMBusyError):
+            record_llm_error(target.model, cache_policy)
+            router.record(cache_policy, target.model, time.perf_counter() - started, ok=False)
+
+    def accept(response):
+        router.record(cache_policy, target.model, time.perf_counter() - started, ok=True)
+        record_llm_response(response, target.model, cache_policy)
+        text = re.sub(r'<think>.*?</think>', '', response["response"].strip(), flags=re.DOTALL).strip()
+        cache.put(key, cache_policy, text)
+        return text
+
+    call.add_done_callback(failed)
+    return then_run(call, accept, executor)
 
 # Interview State Management
+class Round:
+    __slots__ = ("difficulty", "scores", "history", "question_index")
+
+    def __init__(self, difficulty, scores=(), history=(), question_index=0):
+        self.difficulty = difficulty
+        self.scores = list(scores)
+        self.history = [tuple(qa) for qa in history]  # (question, answer)
+        self.question_index = question_index
+
 class InterviewState:
+    # Saved by to_json; prefetched and unfinished round summaries are Futures and are left out
+    FIELDS = ("job_role", "username", "current_round", "topics", "max_questions_per_round", "custom_question",
+              "total_time", "question_start_time", "interview_duration", "session_id", "token", "version", "ui")
+    __slots__ = FIELDS + ("rounds", "questions", "prefetched", "round_summaries", "question_info")
+
     def __init__(self, job_role, username, interview_duration):
         self.job_role = job_role
         self.username = username
-        self.rounds = [
-            {"difficulty": "Easy", "scores": [], "history": [], "question_index": 0},
-            {"difficulty": "Medium", "scores": [], "history": [], "question_index": 0},
-            {"difficulty": "Hard", "scores": [], "history": [], "question_index": 0}
-        ]
+        self.rounds = [Round("Easy"), Round("Medium"), Round("Hard")]
         self.questions = [[] for _ in self.rounds]  # Cache questions per round
+        self.prefetched = {}  # (round_idx, q_idx) -> {difficulty: Future} for the next slot
         self.current_round = 0
         self.topics = [
             "technical_skills", "technical_skills", "problem_solving", "behavioral", "technical_skills"
@@ -113,42 +238,203 @@ class InterviewState:
         self.total_time = 0
         self.question_start_time = None
         self.interview_duration = interview_duration  # in seconds
+        self.session_id = None  # Row in the sessions table, set when the interview starts
+        self.round_summaries = {}  # round_idx -> Future of that round's short summary
+        self.question_info = {}  # question -> (topic, difficulty) it was generated for
+        self.token = secrets.token_urlsafe(12)  # Resume token, also the checkpoint key
+        self.version = 0  # Bumped on every checkpoint; an older copy never overwrites a newer one
+        self.ui = {}  # The page's session_state values needed to redraw the interview
+
+    def to_json(self):
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        data["rounds"] = [[r.difficulty, r.scores, r.history, r.question_index] for r in self.rounds]
+        data["questions"] = self.questions
+        data["question_info"] = [[q, topic, difficulty] for q, (topic, difficulty) in self.question_info.items()]
+        data["round_summaries"] = {
+            i: future.result() for i, future in self.round_summaries.items()
+            if future.done() and not future.cancelled() and future.exception() is None and future.result() is not None
+        }
+        return json.dumps(data, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        state = cls.__new__(cls)
+        for name in cls.FIELDS:
+            setattr(state, name, data[name])
+        state.rounds = [Round(*r) for r in data["rounds"]]
+        state.questions = data["questions"]
+        state.question_info = {q: (topic, difficulty) for q, topic, difficulty in data["question_info"]}
+        state.prefetched = {}
+        state.round_summaries = {}
+        for i, summary in data["round_summaries"].items():
+            future = Future()
+            future.set_result(summary)
+            state.round_summaries[int(i)] = future
+        return state
 
 # Question Generation
-def generate_question(state, topic, difficulty, round_idx, q_idx):
-    if state.questions[round_idx] and len(state.questions[round_idx]) > q_idx:
-        return state.questions[round_idx][q_idx]  # Use cached question
-    context = f"Job Role: {state.job_role}\nDifficulty: {difficulty}\nAssume typical skills and responsibilities."
-    if state.job_role.lower() == "agi researcher":
-        context += "\nFor AGI Researcher, include reasoning, ethics, or novel architectures in Hard difficulty."
-    if (state.job_role.lower() == "agi researcher" and 
+@st.cache_resource
+def get_prefetch_executor():
+    # Shared by every session in this process; reruns reuse the same pool. Its workers never wait on
+    # the LLM queue (see prefetch_question), so a few threads serve any number of sessions.
+    return ThreadPoolExecutor(max_workers=3, thread_name_prefix="question-prefetch")
+
+def ready_question(job_role, topic, difficulty, q_idx, asked=(), user=None, priority=QUESTION):
+    # A question that needs no LLM call: the special AGI one or a banked one (None if neither)
+    if (job_role.lower() == "agi researcher" and 
         difficulty == "Hard" and 
         random.random() < 0.3 and 
         q_idx == 4):
-        question = "How would you design an AGI to ensure safe alignment with human values?"
-    else:
-        prompt = f"""
-        Generate a {topic} interview question for a {state.job_role} at {difficulty} difficulty.
-        - Easy: Basic concepts or simple scenarios.
-        - Medium: Practical applications or moderate challenges.
-        - Hard: Advanced topics, complex problem-solving, or futuristic concepts (e.g., AGI ethics).
-        Ensure the question is specific to the role. Return only the question.
-        """
-        question = call_llm(prompt, context)
+        return "How would you design an AGI to ensure safe alignment with human values?"
+    return draw_question(job_role, topic, difficulty, exclude=asked, priority=priority, user=user)
+
+def accept_question(job_role, topic, difficulty, question, asked=(), user=None, priority=QUESTION):
+    if similar_question(job_role, question, asked, priority, user):
+        # Reworded copy of a question already asked: replace it from a batch generated at once
+        question = regenerate_question(job_role, topic, difficulty, asked, priority, user) or question
+    add_questions(job_role, topic, difficulty, [question], priority, user)
+    fill_in_background(job_role, topic, difficulty)
+    return question
+
+def build_question(job_role, topic, difficulty, q_idx, asked=(), user=None, priority=QUESTION):
+    question = ready_question(job_role, topic, difficulty, q_idx, asked, user, priority)
+    if question:
+        return question
+    # Unseen role or an exhausted slot: generate live and grow the bank for next time
+    prompt, context = question_prompt(job_role, topic, difficulty)
+    question = call_llm(prompt, context, cache_policy="question", exclude=asked, priority=priority, user=user)
+    if question.startswith("Error calling LLM"):
+        # e.g. rejected by a queue full of live work: never show (or score an answer to) the error itself
+        return fallback_question(job_role, topic, difficulty, asked, user)
+    return accept_question(job_role, topic, difficulty, question, asked, user, priority)
+
+def fallback_question(job_role, topic, difficulty, asked=(), user=None):
+    # A banked question of another difficulty, else a generic one for the topic
+    for other in ("Easy", "Medium", "Hard"):
+        if other != difficulty:
+            banked = draw_question(job_role, topic, other, exclude=asked, user=user)
+            if banked:
+                return banked
+    return f"Tell me about a {topic.replace('_', ' ')} challenge you faced as a {job_role} and how you handled it."
+
+@timed("generate_question")
+def generate_question(state, topic, difficulty, round_idx, q_idx):
+    if state.questions[round_idx] and len(state.questions[round_idx]) > q_idx:
+        return state.questions[round_idx][q_idx]  # Use cached question
+    question = take_prefetched_question(state, topic, round_idx, q_idx, difficulty)
+    if question is None:
+        question = build_question(state.job_role, topic, difficulty, q_idx, asked_questions(state), state.username)
     if len(state.questions[round_idx]) <= q_idx:
         state.questions[round_idx].append(question)
+    state.question_info.setdefault(question, (topic, difficulty))
+    prefetch_next_questions(state, round_idx, q_idx)
     return question
 
+def asked_questions(state):
+    return tuple(q for round_questions in state.questions for q in round_questions)
+
+# Speculative Prefetch
+def candidate_difficulties(current_difficulty):
+    # Mirrors next_action: a low score drops to Easy, a high score jumps to Hard
+    return list(dict.fromkeys(["Easy", current_difficulty, "Hard"]))
+
+def prefetch_next_questions(state, round_idx, q_idx):
+    if q_idx + 1 < state.max_questions_per_round:
+        next_slot = (round_idx, q_idx + 1)
+        topic = state.topics[q_idx + 1]
+        difficulties = candidate_difficulties(state.rounds[round_idx].difficulty)
+    elif round_idx < len(state.rounds) - 1:
+        next_slot = (round_idx + 1, 0)
+        topic = state.topics[0]
+        difficulties = [state.rounds[round_idx + 1].difficulty]
+    else:
+        return
+    if next_slot in state.prefetched:
+        return
+    asked = asked_questions(state)
+    state.prefetched[next_slot] = {
+        difficulty: prefetch_question(state.job_role, topic, difficulty, next_slot[1], asked, state.username)
+        for difficulty in difficulties
+    }
+
+def prefetch_question(job_role, topic, difficulty, q_idx, asked, user):
+    # Speculative: queued behind every candidate's live call, and the first to go when the queue fills up.
+    # A worker only looks up the bank and cache and queues the LLM call; no thread waits on the queue, and
+    # the reply is finished on a worker once it arrives. Cancelling the Future drops the queued call.
+    executor = get_prefetch_executor()
+    result = Future()
+
+    def start():
+        if result.cancelled():
+            return
+        try:
+            question = ready_question(job_role, topic, difficulty, q_idx, asked, user, BACKGROUND)
+            if question is None:
+                prompt, context = question_prompt(job_role, topic, difficulty)
+                text = submit_llm(prompt, context, "question", asked, BACKGROUND, user, executor)
+                then_run(text, lambda question: accept_question(job_role, topic, difficulty, question, asked, user,
+                                                                BACKGROUND), executor, result)
+                return
+        except Exception as e:
+            settle_future(result.set_exception, e)
+            return
+        settle_future(result.set_result, question)
+
+    executor.submit(start)
+    return result
+
+def take_prefetched_question(state, topic, round_idx, q_idx, difficulty):
+    candidates = state.prefetched.pop((round_idx, q_idx), {})
+    chosen = candidates.pop(difficulty, None)
+    for future in candidates.values():
+        future.cancel()  # Its queued LLM call is dropped; a running one finishes and is discarded
+    if chosen is None:
+        return None
+    if not chosen.done():
+        # Other candidates may have banked a question for this slot since the prefetch started
+        banked = draw_question(state.job_role, topic, difficulty, exclude=asked_questions(state), user=state.username)
+        if banked:
+            chosen.cancel()
+            return banked
+        get_client().scheduler.promote(state.username, QUESTION)  # The candidate is waiting on it now
+    try:
+        return chosen.result(timeout=get_client().timeout)
+    except Exception:
+        chosen.cancel()
+        return None  # Evicted, failed or timed out: generated live instead
+
+def cancel_prefetch(state):
+    for candidates in state.prefetched.values():
+        for future in candidates.values():
+            future.cancel()
+    state.prefetched.clear()
+
 # Response Handling and Evaluation
-def handle_response(state, question, response, confidence, conn):
-    evaluation = evaluate_response(state, question, response, confidence)
-    state.rounds[state.current_round]["history"].append((question, response))
-    state.rounds[state.current_round]["scores"].append(evaluation["score"])
-    save_question_answer(conn, state.username, state.job_role, question, response, evaluation["score"])
+@timed("handle_response")
+def handle_response(state, question, response, confidence, render=None):
+    evaluation = evaluate_response(state, question, response, confidence, render)
+    state.rounds[state.current_round].history.append((question, response))
+    state.rounds[state.current_round].scores.append(evaluation["score"])
+    topic, difficulty = state.question_info.get(question, (None, state.rounds[state.current_round].difficulty))
+    save_question_answer(state.session_id, state.username, state.job_role, question, response, evaluation["score"],
+                         topic, difficulty)
     return evaluation
 
-def evaluate_response(state, question, response, confidence):
-    context = f"Job Role: {state.job_role}\nDifficulty: {state.rounds[state.current_round]['difficulty']}\nQuestion: {question}\nResponse: {response}"
+def evaluate_response(state, question, response, confidence, render=None):
+    shortcut = prescore(question, response)
+    if shortcut:
+        # Junk or an answer the LLM already scored: no GPU time, and the reason is audited
+        record_shortcut(state.session_id, state.username, state.job_role, question, response, shortcut)
+        if render:
+            render(iter([shortcut.explanation]))
+        if shortcut.reason != "duplicate":
+            return {"score": shortcut.score, "explanation": shortcut.explanation}
+        return apply_bonuses(state, question, response, confidence, shortcut.score, shortcut.explanation)
+    context = [
+        f"Job Role: {state.job_role}\nDifficulty: {state.rounds[state.current_round].difficulty}\nQuestion: {question}",
+        Section(f"Response: {response}", priority=1),  # Long answers/code are trimmed to fit, never the question
+    ]
     prompt = """
     Evaluate for:
     - Accuracy
@@ -156,56 +442,124 @@ def evaluate_response(state, question, response, confidence):
     - Clarity
     - Ethics (if AGI Researcher, +2 for ethical considerations like safety, bias)
     Assign a score from 0-10 and provide a brief, encouraging explanation (1-2 sentences).
-    Example: "Great start, adding more details could make it even stronger! Score: 6"
-    Return only: Score: X, Explanation: ...
+    Example: {"score": 6, "explanation": "Great start, adding more details could make it even stronger!"}
+    Return only JSON: {"score": X, "explanation": "..."}
     """
-    evaluation = call_llm(prompt, context)
-    try:
-        score = int(evaluation.split("Score: ")[1].split(",")[0])
-        if state.job_role.lower() == "agi researcher":
-            if "agi" in response.lower() or "ethics" in response.lower():
-                score = min(score + 2, 10)
-            if question.startswith("How would you design an AGI to ensure"):
-                score = min(score + 5, 10)
-        if confidence >= 8:
-            score = min(score + 1, 10)
-        explanation = evaluation.split("Explanation: ")[1]
-        return {"score": score, "explanation": explanation}
-    except:
+    if render:  # e.g. st.write_stream: shows the explanation as it arrives
+        parts = []
+        def record(chunks):
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        render(stream_explanation(record(
+            call_llm_stream(prompt, context, cache_policy="evaluation", format=EVALUATION_FORMAT, user=state.username)
+        )))
+        evaluation = "".join(parts).strip()
+    else:
+        evaluation = call_llm(prompt, context, cache_policy="evaluation", format=EVALUATION_FORMAT, user=state.username)
+    parsed = parse_evaluation(evaluation)
+    if parsed is None and not evaluation.startswith("Error calling LLM"):
+        parsed = repair_evaluation(evaluation, state.username)
+    if parsed is None:
+        logger.warning("Unparseable evaluation: %r", evaluation[:200])
+        REGISTRY.inc("evaluation_parse_failures_total", help="Evaluations scored 0 because no score could be read.")
         return {"score": 0, "explanation": "Oops, something went wrong, but keep shining!"}
+    score, explanation = parsed
+    remember(question, response, score, explanation)
+    return apply_bonuses(state, question, response, confidence, score, explanation)
+
+def apply_bonuses(state, question, response, confidence, score, explanation):
+    if state.job_role.lower() == "agi researcher":
+        if "agi" in response.lower() or "ethics" in response.lower():
+            score = min(score + 2, 10)
+        if question.startswith("How would you design an AGI to ensure"):
+            score = min(score + 5, 10)
+    if confidence >= 8:
+        score = min(score + 1, 10)
+    return {"score": score, "explanation": explanation}
+
+def repair_evaluation(evaluation, user=None):
+    # One short reformatting call on the existing text instead of re-running the whole evaluation
+    repaired = call_llm(REPAIR_PROMPT, evaluation, cache_policy="evaluation", format=EVALUATION_FORMAT, user=user)
+    parsed = parse_evaluation(repaired)
+    REGISTRY.inc("evaluation_repairs_total", help="Evaluations re-requested as JSON after a parse failure.",
+                 result="ok" if parsed else "failed")
+    return parsed
 
 # Decision Engine
+@timed("next_action")
 def next_action(state):
-    state.rounds[state.current_round]["question_index"] += 1
-    if state.rounds[state.current_round]["question_index"] < state.max_questions_per_round:
-        last_score = state.rounds[state.current_round]["scores"][-1] if state.rounds[state.current_round]["scores"] else 5
-        current_difficulty = state.rounds[state.current_round]["difficulty"]
+    state.rounds[state.current_round].question_index += 1
+    if state.rounds[state.current_round].question_index < state.max_questions_per_round:
+        last_score = state.rounds[state.current_round].scores[-1] if state.rounds[state.current_round].scores else 5
+        current_difficulty = state.rounds[state.current_round].difficulty
         if last_score < 5 and current_difficulty != "Easy":
             temp_difficulty = "Easy"
         elif last_score >= 8 and current_difficulty != "Hard":
             temp_difficulty = "Hard"
         else:
             temp_difficulty = current_difficulty
-        return generate_question(state, state.topics[state.rounds[state.current_round]["question_index"]], temp_difficulty, state.current_round, state.rounds[state.current_round]["question_index"])
-    elif state.current_round < len(state.rounds) - 1:
+        return generate_question(state, state.topics[state.rounds[state.current_round].question_index], temp_difficulty, state.current_round, state.rounds[state.current_round].question_index)
+    start_round_summary(state, state.current_round)  # Round finished: summarize it while the next one runs
+    if state.current_round < len(state.rounds) - 1:
         state.current_round += 1
-        state.rounds[state.current_round]["question_index"] = 0
-        return generate_question(state, state.topics[0], state.rounds[state.current_round]["difficulty"], state.current_round, 0)
+        state.rounds[state.current_round].question_index = 0
+        return generate_question(state, state.topics[0], state.rounds[state.current_round].difficulty, state.current_round, 0)
     return None
 
+# Per-Round Summaries
+@st.cache_resource
+def get_summary_executor():
+    return ThreadPoolExecutor(max_workers=3, thread_name_prefix="round-summary")
+
+def summarize_round(job_role, round_idx, difficulty, history, scores, user=None):
+    context = []
+    for (q, a), score in zip(history, scores):
+        context += [f"Q: {q}", Section(f"A: {a}", priority=1), f"Score: {score}/10"]
+    context.append(f"Job Role: {job_role}\nRound {round_idx + 1} ({difficulty})")
+    prompt = """
+    Summarize this interview round in 2 sentences: the candidate's main strengths and the clearest gap.
+    Return only the summary.
+    """
+    summary = call_llm(prompt, context, cache_policy="summary", priority=SUMMARY, user=user)
+    # e.g. evicted from a full queue: None, so the final evaluation retries instead of quoting the error
+    return None if summary.startswith("Error calling LLM") else summary
+
+def start_round_summary(state, round_idx):
+    round = state.rounds[round_idx]
+    if round_idx in state.round_summaries or not round.history:
+        return
+    # Snapshot the lists: the worker must not see answers appended later
+    state.round_summaries[round_idx] = get_summary_executor().submit(
+        summarize_round, state.job_role, round_idx, round.difficulty, list(round.history), list(round.scores),
+        state.username
+    )
+
 # Final Evaluation
-def generate_final_evaluation(state, conn):
-    total_score = sum(sum(round["scores"]) for round in state.rounds)
-    max_possible_score = sum(len(round["scores"]) * 10 for round in state.rounds)
+@timed("generate_final_evaluation")
+def generate_final_evaluation(state, render=None):
+    cancel_prefetch(state)
+    total_score = sum(sum(round.scores) for round in state.rounds)
+    max_possible_score = sum(len(round.scores) * 10 for round in state.rounds)
     total_score = int((total_score / 150) * 100) if max_possible_score > 0 else 0
     selection_threshold = 60
     is_selected = total_score >= selection_threshold
 
+    # Map: rounds finished earlier are already summarized; a round cut short by a timeout starts now
+    for i in range(len(state.rounds)):
+        start_round_summary(state, i)
+    summaries = {i: future.result() for i, future in sorted(state.round_summaries.items())}
+    for i, summary in summaries.items():
+        if summary is None:  # The background summary failed: retry it while the candidate waits
+            round = state.rounds[i]
+            summaries[i] = summarize_round(state.job_role, i, round.difficulty, round.history, round.scores,
+                                           state.username)
+    # Reduce: the final call only sees three short summaries, however long the answers were
     context = "\n".join(
-        f"Round {i+1} ({round['difficulty']}): History: {round['history']}, Scores: {round['scores']}"
+        f"Round {i+1} ({round.difficulty}): Summary: {summaries.get(i) or 'Not reached.'} Scores: {round.scores}"
         for i, round in enumerate(state.rounds)
     )
-    context += f"\nJob Role: {state.job_role}\nTotal Time: {int(state.total_time)} seconds"
+    context += f"\nJob Role: {state.job_role}\nTotal Time: {int(state.total_time)} seconds\nTotal Score: {total_score}"
     prompt = f"""
     Summarize the candidate's performance for a {state.job_role} role across three rounds (Easy, Medium, Hard).
     If the interview was incomplete (e.g., timed out), note that only submitted answers were evaluated.
@@ -217,13 +571,17 @@ def generate_final_evaluation(state, conn):
     Total Score: X
     Selection: [Selected/Not Selected]
     """
-    evaluation = call_llm(prompt, context)
-    save_final_results(conn, state.username, state.job_role, total_score, is_selected)
+    if render:
+        evaluation = render(call_llm_stream(prompt, context, cache_policy="summary", user=state.username)).strip()
+    else:
+        evaluation = call_llm(prompt, context, cache_policy="summary", user=state.username)
+    save_final_results(state.session_id, total_score, is_selected)
     return evaluation, total_score
 
 # Leaderboard and Score History
 def show_leaderboard(username, job_role):
-    leaderboard = get_leaderboard(job_role)
+    # Shared across sessions and worker processes, refreshed the moment an interview finishes
+    leaderboard = fetch_leaderboard(job_role)
     st.sidebar.header("🏆 Leaderboard")
     for i, (user, role, score) in enumerate(leaderboard):
         icon = "🥇" if i == 0 else "🥈" if i == 1 else "🥉" if i == 2 else ""
@@ -233,39 +591,128 @@ def show_leaderboard(username, job_role):
     st.sidebar.subheader("Your Past Scores")
     show_history = st.sidebar.checkbox("Show score history", value=False)
     if show_history:
-        role_scores = get_user_history(username, job_role)
+        role_scores = fetch_user_history(username, job_role)
         if role_scores:
             st.sidebar.write(f"Past {job_role} scores: {', '.join(map(str, role_scores))}")
         else:
             st.sidebar.write("No past scores for this role.")
 
+# Streamed Output
+def stream_renderer(placeholder, label):
+    # Renders a token stream inside `placeholder` and returns the full text
+    def render(chunks):
+        with placeholder.container():
+            st.markdown(f"**{label}**")
+            return st.write_stream(chunks)
+    return render
+
+def watch_queue(placeholder):
+    # While this rerun's LLM calls wait for a model slot, tell the candidate where they are in line
+    def on_wait(position):
+        if position is None:
+            placeholder.empty()
+        else:
+            placeholder.info(f"⏳ The interviewer is busy with other candidates, you're #{position} in line...")
+    queue_notice.set(on_wait)
+
+# Session Timings
+def record_session_timings(trace):
+    timings = st.session_state.setdefault("timings", {})
+    for name, seconds in trace:
+        calls, total, _ = timings.get(name, (0, 0.0, 0.0))
+        timings[name] = (calls + 1, total + seconds, seconds)
+
+def show_timings():
+    if not st.sidebar.checkbox("Show timings", value=False):
+        return
+    timings = st.session_state.get("timings", {})
+    if not timings:
+        st.sidebar.write("No timings recorded yet.")
+        return
+    st.sidebar.table([
+        {"Step": name, "Calls": calls, "Total ms": round(total * 1000), "Last ms": round(last * 1000)}
+        for name, (calls, total, last) in sorted(timings.items(), key=lambda item: -item[1][1])
+    ])
+    routes = get_router().stats()
+    if routes:
+        st.sidebar.caption("Model latency by call site (all sessions)")
+        st.sidebar.table([
+            {"Route": route, "Model": model, "Calls": s["calls"], "Errors": s["errors"],
+             "p50 ms": round(s["p50"] * 1000) if s["p50"] is not None else None,
+             "p95 ms": round(s["p95"] * 1000) if s["p95"] is not None else None}
+            for route, models in routes.items() for model, s in models.items()
+        ])
+    queue = get_client().stats()
+    st.sidebar.caption(f"LLM queue (all sessions): {queue['in_flight']}/{queue['slots']} slots busy, "
+                       f"{queue['queued']} waiting")
+    st.sidebar.table([
+        {"Class": name, "Queued": c["queued"],
+         "Wait p50 ms": round(c["wait_p50"] * 1000) if c["wait_p50"] is not None else None,
+         "Wait p95 ms": round(c["wait_p95"] * 1000) if c["wait_p95"] is not None else None,
+         "Preempted": c["preempted"], "Rejected": c["rejected"]}
+        for name, c in queue["classes"].items()
+    ])
+
+# Model Readiness
+def show_model_status():
+    warmer = get_warmer()
+    if warmer is None:
+        return
+    for model, status in warmer.status().items():
+        if status["ready"]:
+            st.sidebar.caption(f"🟢 {model} ready (loaded in {status['load_seconds']:.1f}s)")
+        elif status["error"]:
+            st.sidebar.caption(f"🔴 {model} unavailable: {status['error']}")
+        else:
+            st.sidebar.caption(f"🟡 Loading {model}... the first question may take a moment")
+
 # PDF Report
-def generate_report(state):
-    pdf_file = "interview_report.pdf"
-    c = canvas.Canvas(pdf_file, pagesize=letter)
-    c.drawString(100, 750, f"Interview Report: {state.job_role}")
-    c.drawString(100, 730, f"Username: {state.username}")
-    c.drawString(100, 710, f"Total Time: {int(state.total_time)} seconds")
-    c.drawString(100, 690, f"Duration Set: {int(state.interview_duration / 60)} minutes")
-    y = 660
-    for i, round in enumerate(state.rounds):
-        c.drawString(100, y, f"Round {i+1} ({round['difficulty']}):")
-        y -= 20
-        for j, (q, r) in enumerate(round["history"]):
-            c.drawString(100, y, f"Q{j+1}: {q[:100]}...")
-            c.drawString(100, y-20, f"A: {r[:100]}...")
-            c.drawString(100, y-40, f"Score: {round['scores'][j]}")
-            y -= 60
-        y -= 20
-    c.drawString(100, y, st.session_state.feedback.replace("\n", "; "))
-    c.save()
-    return pdf_file
+@st.cache_resource
+def get_report_executor():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="report")
+
+@timed("generate_report")
+def generate_report(data):
+    from report import render_report  # reportlab is only loaded once someone finishes an interview
+    return render_report(data)
+
+def start_report(state, feedback):
+    # Renders in a worker thread; reruns with an unchanged interview reuse the same result
+    from report import report_data
+    data = report_data(state, feedback)
+    cached = st.session_state.get("report")
+    if cached is None or cached[0] != data:
+        st.session_state.report = (data, get_report_executor().submit(generate_report, data))
+    return st.session_state.report[1]
 
 # Streamlit UI
+# Checkpoints
+SESSION_FIELDS = ("current_question", "feedback", "interview_started", "response_submitted", "question_count",
+                  "custom_question_used", "timer_start", "total_time", "interview_start_time", "interview_duration")
+
+def checkpoint(state):
+    # After every answer: a refresh, restart or another worker resumes here without redoing LLM calls
+    state.ui = {name: st.session_state[name] for name in SESSION_FIELDS}
+    state.version += 1
+    save_checkpoint(state.token, state.session_id, state.version, state.to_json())
+
+def resume_session(token):
+    saved = load_checkpoint(token)
+    if saved is None:
+        return False
+    state = InterviewState.from_json(saved)
+    st.session_state.state = state
+    for name, value in state.ui.items():
+        st.session_state[name] = value
+    if state.ui.get("interview_started"):
+        prefetch_next_questions(state, state.current_round, state.rounds[state.current_round].question_index)
+    return True
+
 def main():
-    # Initialize database connection
-    conn = sqlite3.connect("interviews.db")
-    init_db(conn)
+    st.markdown(load_styles(), unsafe_allow_html=True)
+    # Shared connection pool; the schema is created once per process
+    get_pool()
+    warm_read_cache_once()
 
     st.markdown("""
     <div class="welcome-banner">
@@ -276,6 +723,7 @@ def main():
     
     st.title("🚀 AI Interviewer Agent")
     st.write("Enter your details, set interview duration, and start your journey!")
+    watch_queue(st.empty())
 
     # Initialize session state
     if "state" not in st.session_state:
@@ -290,17 +738,21 @@ def main():
         st.session_state.total_time = 0
         st.session_state.interview_start_time = None
         st.session_state.interview_duration = None
+        token = st.query_params.get("resume")
+        if token and not resume_session(token):
+            st.warning("That interview could not be found; start a new one below.")
+            del st.query_params["resume"]
 
     # Sidebar
     with st.sidebar:
         st.header("Progress")
         if st.session_state.interview_started and st.session_state.state:
             round_idx = st.session_state.state.current_round
-            q_idx = st.session_state.state.rounds[round_idx]["question_index"]
+            q_idx = st.session_state.state.rounds[round_idx].question_index
             total_qs = st.session_state.state.max_questions_per_round * len(st.session_state.state.rounds)
             current_q = q_idx + 1 + (round_idx * st.session_state.state.max_questions_per_round)
             st.progress(current_q / total_qs)
-            st.write(f"Round {round_idx + 1}: {st.session_state.state.rounds[round_idx]['difficulty']}")
+            st.write(f"Round {round_idx + 1}: {st.session_state.state.rounds[round_idx].difficulty}")
             st.write(f"Question {q_idx + 1}/5")
             # JavaScript Timers
             interview_remaining = int(max(0, st.session_state.interview_duration - (time.time() - st.session_state.interview_start_time)))
@@ -333,13 +785,25 @@ def main():
             <p id="question-warning" class="timer-warning" style="display:none">Over 5 minutes! Try to wrap up.</p>
             """, unsafe_allow_html=True)
             st.write(f"Total Time: {int(st.session_state.state.total_time)} seconds")
+            st.caption(f"Resume code: {st.session_state.state.token}")
+        elif not st.session_state.state:
+            resume_code = st.text_input("Resume Code", placeholder="Continue an earlier interview")
+            if resume_code:
+                if resume_session(resume_code.strip()):
+                    st.query_params["resume"] = resume_code.strip()
+                    st.rerun()
+                st.warning("No interview found for that code.")
         
         username = st.session_state.state.username if st.session_state.state else "Unknown"
         job_role = st.session_state.state.job_role if st.session_state.state else "Unknown"
         show_leaderboard(username, job_role)
+        show_model_status()
+        show_timings()
         
         if not st.session_state.interview_started and st.session_state.feedback:
             if st.button("🔄 Retry Interview"):
+                if st.session_state.state:
+                    cancel_prefetch(st.session_state.state)
                 st.session_state.state = None
                 st.session_state.current_question = None
                 st.session_state.feedback = ""
@@ -351,6 +815,7 @@ def main():
                 st.session_state.total_time = 0
                 st.session_state.interview_start_time = None
                 st.session_state.interview_duration = None
+                st.query_params.pop("resume", None)
 
     # Input widget
     username = st.text_input("Your Name", placeholder="Enter your name")
@@ -362,11 +827,12 @@ def main():
     # Start interview
     if start_button and job_role and username:
         st.session_state.state = InterviewState(job_role, username, interview_duration * 60)
+        st.session_state.state.session_id = start_session(username, job_role)
         st.session_state.interview_started = True
         st.session_state.current_question = generate_question(
             st.session_state.state, 
             st.session_state.state.topics[0], 
-            st.session_state.state.rounds[0]["difficulty"],
+            st.session_state.state.rounds[0].difficulty,
             0, 0
         )
         st.session_state.feedback = ""
@@ -377,24 +843,31 @@ def main():
         st.session_state.total_time = 0
         st.session_state.interview_start_time = time.time()
         st.session_state.interview_duration = interview_duration * 60
+        st.query_params["resume"] = st.session_state.state.token  # A refresh reopens this interview
+        checkpoint(st.session_state.state)
 
     # Check for interview timeout
     if (st.session_state.interview_started and st.session_state.state and 
         st.session_state.interview_start_time):
         elapsed = time.time() - st.session_state.interview_start_time
         if elapsed >= st.session_state.interview_duration:
-            final_evaluation, total_score = generate_final_evaluation(st.session_state.state, conn)
+            summary_box = st.empty()
+            final_evaluation, total_score = generate_final_evaluation(
+                st.session_state.state, render=stream_renderer(summary_box, "Summary:")
+            )
+            summary_box.empty()  # Replaced by the completion card below
             st.session_state.feedback = final_evaluation + "\nNote: Interview timed out, evaluated submitted answers only."
+            start_report(st.session_state.state, st.session_state.feedback)  # Ready by the time the card renders
             st.session_state.interview_started = False
             st.session_state.current_question = None
             st.session_state.timer_start = None
             st.session_state.interview_start_time = None
-            conn.close()
+            checkpoint(st.session_state.state)
 
     # Interview in progress
     if st.session_state.interview_started and st.session_state.state:
         round_idx = st.session_state.state.current_round
-        q_idx = st.session_state.state.rounds[round_idx]["question_index"]
+        q_idx = st.session_state.state.rounds[round_idx].question_index
         if (not st.session_state.custom_question_used and 
             st.session_state.state.custom_question and 
             q_idx == 1):
@@ -402,7 +875,7 @@ def main():
             st.session_state.custom_question_used = True
 
         st.markdown(f"""
-        <div class="status-badge">Round {round_idx + 1}: {st.session_state.state.rounds[round_idx]['difficulty']}</div>
+        <div class="status-badge">Round {round_idx + 1}: {st.session_state.state.rounds[round_idx].difficulty}</div>
         <div class="card">
             <h3>Question {q_idx + 1}/5</h3>
             <p>💡 {st.session_state.current_question}</p>
@@ -441,7 +914,7 @@ def main():
                 st.session_state.current_question, 
                 user_response, 
                 confidence, 
-                conn
+                render=stream_renderer(st.empty(), "Feedback:")
             )
             st.session_state.feedback = evaluation["explanation"]
             st.session_state.response_submitted = True
@@ -453,14 +926,19 @@ def main():
                 st.session_state.question_count += 1
                 st.session_state.response_submitted = False
             else:
-                final_evaluation, total_score = generate_final_evaluation(st.session_state.state, conn)
+                summary_box = st.empty()
+                final_evaluation, total_score = generate_final_evaluation(
+                    st.session_state.state, render=stream_renderer(summary_box, "Summary:")
+                )
+                summary_box.empty()  # Replaced by the completion card below
                 st.session_state.feedback = final_evaluation
+                start_report(st.session_state.state, st.session_state.feedback)
                 st.session_state.interview_started = False
                 st.session_state.current_question = None
                 st.session_state.timer_start = None
                 st.session_state.interview_start_time = None
-                conn.close()
-
+            checkpoint(st.session_state.state)
+    
         if st.session_state.response_submitted:
             st.markdown(f"""
             <div class="feedback">
@@ -477,9 +955,14 @@ def main():
         </div>
         """.format(st.session_state.feedback.replace("\n", "<br>")), unsafe_allow_html=True)
         
-        pdf_file = generate_report(st.session_state.state)
-        with open(pdf_file, "rb") as f:
-            st.download_button("📄 Download Report", f, file_name=pdf_file)
+        report = start_report(st.session_state.state, st.session_state.feedback)
+        st.download_button("📄 Download Report", report.result(), file_name="interview_report.pdf",
+                           mime="application/pdf")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    start_exporters()  # Once per process; no-op unless METRICS_FILE or METRICS_PORT is set
+    start_warmup()  # Once per process; loads and pins the models before the first interview
+    rerun_trace = start_trace()
+    with span("rerun"):
+        main()
+    record_session_timings(rerun_trace)
\ No newline at end of file
@@ -0,0 +1,312 @@
+import argparse
+import logging
+import sqlite3
+
+import numpy as np
+
+import storage
+from metrics import timed
+from question_bank import DIFFICULTIES, normalize_role, question_hash
+
+MAX_SCORE = 10  # question_score range is 0..MAX_SCORE
+MAX_TOTAL = 100  # sessions.total_score range is 0..MAX_TOTAL
+REFRESH_BATCH = 500  # Sessions folded in per transaction
+PERCENTILES = (25, 50, 75, 90)
+MIN_ANSWERS = 5  # Fewer answers than this and a question's mean says little
+
+# Mean question score a question of each difficulty should land in; outside it is mislabelled
+TARGET_MEAN = {"Easy": (6.0, 9.0), "Medium": (4.5, 7.5), "Hard": (2.5, 6.0)}
+MIN_DISCRIMINATION = 0.2  # Below this a question barely separates strong and weak candidates
+
+logger = logging.getLogger(__name__)
+
+
+def _pending_sessions(conn, limit):
+    return conn.execute("""
+        SELECT id, job_role, total_score FROM sessions s
+        WHERE ended_at IS NOT NULL AND total_score IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM analytics_sessions a WHERE a.session_id = s.id)
+        ORDER BY id LIMIT ?
+    """, (limit,)).fetchall()
+
+
+def _banked_labels(conn):
+    # Rows saved before interviews had topic/difficulty columns get them from the bank where possible
+    return {
+        (role_key, hash_): (topic, difficulty)
+        for role_key, hash_, topic, difficulty in conn.execute(
+            "SELECT role_key, question_hash, topic, difficulty FROM question_bank"
+        )
+    }
+
+
+def _group(keys):
+    """Distinct keys and, for every input, the index of its key."""
+    uniques, inverse = np.unique(np.array(keys, dtype=object), return_inverse=True)
+    return uniques, inverse
+
+
+def _fold_batch(conn, sessions, banked):
+    session_ids = [row[0] for row in sessions]
+    role_of = {session_id: normalize_role(job_role) for session_id, job_role, _ in sessions}
+    total_of = {session_id: min(max(int(total), 0), MAX_TOTAL) for session_id, _, total in sessions}
+    placeholders = ",".join("?" * len(session_ids))
+    rows = conn.execute(f"""
+        SELECT session_id, question, question_score, topic, difficulty FROM interviews
+        WHERE session_id IN ({placeholders}) AND question_score IS NOT NULL
+    """, session_ids).fetchall()
+
+    # Session totals per role
+    role_keys, role_idx = _group([role_of[session_id] for session_id in session_ids])
+    totals = np.array([total_of[session_id] for session_id in session_ids])
+    total_counts = np.bincount(role_idx * (MAX_TOTAL + 1) + totals,
+                               minlength=len(role_keys) * (MAX_TOTAL + 1)).reshape(len(role_keys), MAX_TOTAL + 1)
+    updates = {"total_histogram": [
+        (role_keys[r], int(score), int(total_counts[r, score])) for r, score in zip(*np.nonzero(total_counts))
+    ]}
+
+    if rows:
+        slots, hashes, questions = [], [], []
+        for session_id, question, _, topic, difficulty in rows:
+            role_key = role_of[session_id]
+            hash_ = question_hash(question or "")
+            if topic is None or difficulty is None:
+                topic, difficulty = banked.get((role_key, hash_), (topic, difficulty))
+            slots.append(f"{role_key}\x1f{topic or 'unknown'}\x1f{difficulty or 'unknown'}")
+            hashes.append(hash_)
+            questions.append(question)
+        scores = np.clip(np.array([row[2] for row in rows], dtype=np.int64), 0, MAX_SCORE)
+        row_totals = np.array([total_of[row[0]] for row in rows], dtype=np.float64)
+
+        slot_keys, slot_idx = _group(slots)
+        hist = np.bincount(slot_idx * (MAX_SCORE + 1) + scores,
+                           minlength=len(slot_keys) * (MAX_SCORE + 1)).reshape(len(slot_keys), MAX_SCORE + 1)
+        updates["score_histogram"] = [
+            (*slot_keys[s].split("\x1f"), int(score), int(hist[s, score])) for s, score in zip(*np.nonzero(hist))
+        ]
+
+        question_keys, question_idx = _group([f"{slot}\x1f{hash_}" for slot, hash_ in zip(slots, hashes)])
+        first = np.zeros(len(question_keys), dtype=np.int64)
+        first[question_idx[::-1]] = np.arange(len(rows))[::-1]  # Any one row per question, for its text
+        n = len(question_keys)
+        s = scores.astype(np.float64)
+        sums = [np.bincount(question_idx, weights=w, minlength=n)
+                for w in (np.ones_like(s), s, s * s, row_totals, row_totals * row_totals, s * row_totals)]
+        updates["question_stats"] = [
+            (*question_keys[q].split("\x1f"), questions[first[q]], *(float(column[q]) for column in sums))
+            for q in range(n)
+        ]
+
+    with conn:
+        conn.executemany("""
+            INSERT INTO total_histogram (role_key, score, count) VALUES (?, ?, ?)
+            ON CONFLICT (role_key, score) DO UPDATE SET count = count + excluded.count
+        """, updates["total_histogram"])
+        conn.executemany("""
+            INSERT INTO score_histogram (role_key, topic, difficulty, score, count) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (role_key, topic, difficulty, score) DO UPDATE SET count = count + excluded.count
+        """, updates.get("score_histogram", []))
+        conn.executemany("""
+            INSERT INTO question_stats (role_key, topic, difficulty, question_hash, question, answers, score_sum,
+                                        score_sq_sum, total_sum, total_sq_sum, cross_sum)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (role_key, topic, difficulty, question_hash) DO UPDATE SET
+                answers = answers + excluded.answers,
+                score_sum = score_sum + excluded.score_sum,
+                score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                total_sum = total_sum + excluded.total_sum,
+                total_sq_sum = total_sq_sum + excluded.total_sq_sum,
+                cross_sum = cross_sum + excluded.cross_sum
+        """, updates.get("question_stats", []))
+        conn.executemany("INSERT INTO analytics_sessions (session_id) VALUES (?)", [(i,) for i in session_ids])
+    return len(rows)
+
+
+@timed("analytics_refresh")
+def refresh(batch_size=REFRESH_BATCH):
+    """
+    Fold sessions completed since the last refresh into the summary tables.
+
+    Each session is counted exactly once (its id goes into analytics_sessions in the same
+    transaction as its counts), so the dashboard only pays for new interviews.
+
+    Returns:
+        int: Number of answers folded in.
+    """
+    folded = 0
+    with storage.get_pool().connection() as conn:
+        banked = None
+        while True:
+            sessions = _pending_sessions(conn, batch_size)
+            if not sessions:
+                break
+            if banked is None:
+                banked = _banked_labels(conn)
+            try:
+                folded += _fold_batch(conn, sessions, banked)
+            except sqlite3.IntegrityError:
+                # Another process folded some of these sessions first; its counts stand, ours rolled back
+                continue
+    if folded:
+        logger.info("Analytics: folded in %d answers", folded)
+    return folded
+
+
+def rebuild():
+    """Drop every summary and recompute from scratch (e.g. after editing old scores)."""
+    with storage.get_pool().connection() as conn:
+        with conn:
+            for table in ("analytics_sessions", "score_histogram", "total_histogram", "question_stats"):
+                conn.execute(f"DELETE FROM {table}")
+    return refresh()
+
+
+def percentiles_from_histogram(counts, percentiles=PERCENTILES):
+    """
+    Nearest-rank percentiles of integer scores given their histogram.
+
+    Args:
+        counts (array): counts[k] is the number of observations equal to k.
+
+    Returns:
+        numpy.ndarray: One score per percentile (NaN when there are no observations).
+    """
+    counts = np.asarray(counts)
+    total = counts.sum()
+    if not total:
+        return np.full(len(percentiles), np.nan)
+    ranks = np.maximum(1, np.ceil(np.asarray(percentiles) / 100 * total))
+    return np.searchsorted(np.cumsum(counts), ranks).astype(np.float64)
+
+
+def roles():
+    with storage.get_pool().connection() as conn:
+        return [row[0] for row in conn.execute("SELECT DISTINCT role_key FROM total_histogram ORDER BY role_key")]
+
+
+def total_distribution(role_key):
+    """
+    Returns:
+        numpy.ndarray: Histogram of session total scores (index = score 0..MAX_TOTAL).
+    """
+    counts = np.zeros(MAX_TOTAL + 1, dtype=np.int64)
+    with storage.get_pool().connection() as conn:
+        for score, count in conn.execute("SELECT score, count FROM total_histogram WHERE role_key = ?", (role_key,)):
+            counts[score] += count
+    return counts
+
+
+def score_distributions(role_key):
+    """
+    Question-score histograms and percentiles per topic and difficulty for one role.
+
+    Returns:
+        dict: {(topic, difficulty): {"counts", "answers", "mean", "percentiles"}}, with
+        counts indexed by score 0..MAX_SCORE and percentiles matching PERCENTILES.
+    """
+    with storage.get_pool().connection() as conn:
+        rows = conn.execute(
+            "SELECT topic, difficulty, score, count FROM score_histogram WHERE role_key = ?", (role_key,)
+        ).fetchall()
+    if not rows:
+        return {}
+    slots, slot_idx = _group([f"{topic}\x1f{difficulty}" for topic, difficulty, _, _ in rows])
+    hist = np.zeros((len(slots), MAX_SCORE + 1), dtype=np.int64)
+    np.add.at(hist, (slot_idx, np.array([row[2] for row in rows])), np.array([row[3] for row in rows]))
+    answers = hist.sum(axis=1)
+    means = hist @ np.arange(MAX_SCORE + 1) / np.maximum(answers, 1)
+    order = sorted(range(len(slots)), key=lambda i: (slots[i].split("\x1f")[0], _difficulty_rank(slots[i])))
+    return {
+        tuple(slots[i].split("\x1f")): {
+            "counts": hist[i],
+            "answers": int(answers[i]),
+            "mean": float(means[i]),
+            "percentiles": percentiles_from_histogram(hist[i]),
+        }
+        for i in order
+    }
+
+
+def _difficulty_rank(slot):
+    difficulty = slot.split("\x1f")[1]
+    return DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else len(DIFFICULTIES)
+
+
+def question_calibration(role_key, min_answers=MIN_ANSWERS):
+    """
+    Mean score, spread and discrimination of every question asked for a role.
+
+    Discrimination is the Pearson correlation between a question's score and the
+    candidate's final total: near 0 (or negative) means strong and weak candidates
+    score alike on it.
+
+    Returns:
+        list: Dicts with topic, difficulty, question, answers, mean, std, discrimination
+        and verdict ("too easy", "too hard", "weak discrimination" or "ok"), hardest first.
+    """
+    with storage.get_pool().connection() as conn:
+        rows = conn.execute("""
+            SELECT topic, difficulty, question, answers, score_sum, score_sq_sum, total_sum, total_sq_sum, cross_sum
+            FROM question_stats WHERE role_key = ? AND answers >= ?
+        """, (role_key, min_answers)).fetchall()
+    if not rows:
+        return []
+    n, s, ss, t, tt, st = np.array([row[3:] for row in rows], dtype=np.float64).T
+    mean = s / n
+    std = np.sqrt(np.maximum(ss / n - mean * mean, 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discrimination = (n * st - s * t) / np.sqrt((n * ss - s * s) * (n * tt - t * t))
+
+    result = []
+    for i in np.argsort(mean, kind="stable"):
+        topic, difficulty, question = rows[i][:3]
+        low, high = TARGET_MEAN.get(difficulty, (0, MAX_SCORE))
+        if mean[i] > high:
+            verdict = "too easy"
+        elif mean[i] < low:
+            verdict = "too hard"
+        elif np.isfinite(discrimination[i]) and discrimination[i] < MIN_DISCRIMINATION:
+            verdict = "weak discrimination"
+        else:
+            verdict = "ok"
+        result.append({
+            "topic": topic,
+            "difficulty": difficulty,
+            "question": question,
+            "answers": int(n[i]),
+            "mean": float(mean[i]),
+            "std": float(std[i]),
+            "discrimination": float(discrimination[i]) if np.isfinite(discrimination[i]) else None,
+            "verdict": verdict,
+        })
+    return result
+
+
+def print_report(role_key, limit=20):
+    totals = total_distribution(role_key)
+    p25, p50, p75, p90 = percentiles_from_histogram(totals)
+    print(f"\n{role_key}: {totals.sum()} completed interviews, total score p25/p50/p75/p90 = "
+          f"{p25:.0f}/{p50:.0f}/{p75:.0f}/{p90:.0f}")
+    for (topic, difficulty), stats in score_distributions(role_key).items():
+        p25, p50, p75, p90 = stats["percentiles"]
+        print(f"  {topic:<20}{difficulty:<10}{stats['answers']:>8} answers  mean {stats['mean']:4.1f}  "
+              f"p25/p50/p75/p90 {p25:.0f}/{p50:.0f}/{p75:.0f}/{p90:.0f}")
+    flagged = [q for q in question_calibration(role_key) if q["verdict"] != "ok"]
+    for q in flagged[:limit]:
+        print(f"  [{q['verdict']}] ({q['difficulty']}, mean {q['mean']:.1f}, n={q['answers']}) {q['question'][:70]}")
+    if len(flagged) > limit:
+        print(f"  ... and {len(flagged) - limit} more flagged questions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score distributions and question calibration.")
+    parser.add_argument("roles", nargs="*", help="Job roles to report on (default: all)")
+    parser.add_argument("--db", default=storage.DB_PATH, help="Path to the SQLite database file")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the summary tables from scratch")
+    args = parser.parse_args()
+
+    storage.set_db_path(args.db)
+    folded = rebuild() if args.rebuild else refresh()
+    print(f"Folded in {folded} new answers.")
+    for role_key in [normalize_role(role) for role in args.roles] or roles():
+        print_report(role_key)
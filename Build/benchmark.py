@@ -0,0 +1,334 @@
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import llm_cache
+import llm_client
+import llm_router
+import llm_warmup
+import question_bank
+import question_index
+import storage
+from fake_ollama import FakeOllamaClient
+
+STAGES = ["generate_question", "handle_response", "next_action", "checkpoint", "generate_final_evaluation",
+          "db_start_session", "db_flush"]
+
+
+class StageTimer:
+    """Thread-safe collection of per-stage latencies."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def time(self, stage, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile; `values` must be sorted
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(samples):
+    result = {}
+    for stage, values in samples.items():
+        values = sorted(values)
+        result[stage] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+    return result
+
+
+def count_repeats(questions):
+    """Questions that are near-duplicates of one asked earlier in the same interview."""
+    if len(questions) < 2:
+        return 0
+    embedder = question_index.get_embedder()
+    vectors = embedder(questions)
+    similarities = vectors @ vectors.T
+    return sum(1 for i in range(1, len(questions)) if similarities[i, :i].max() >= embedder.threshold)
+
+
+def run_candidate(agent, timer, index, job_role, answer_time, stream, junk_rate=0.0, repeats=None):
+    username = f"candidate-{index}"
+    rng = random.Random(index)
+    state = agent.InterviewState(job_role, username, 3600)
+    state.session_id = timer.time("db_start_session", storage.start_session, username, job_role)
+    question = timer.time("generate_question", agent.generate_question,
+                          state, state.topics[0], state.rounds[0].difficulty, 0, 0)
+    render = None
+    if stream:
+        def render(chunks):
+            started = time.perf_counter()
+            parts = []
+            for chunk in chunks:
+                if not parts:
+                    timer.record("first_token", time.perf_counter() - started)
+                parts.append(chunk)
+            return "".join(parts)
+    while question:
+        time.sleep(answer_time)  # The candidate typing; prefetch runs meanwhile
+        answer = f"{username}'s answer to: {question[:40]} ... with details and an example."
+        if rng.random() < junk_rate:
+            answer = rng.choice(["idk", "pass", question])  # Skipped or pasted back: pre-scored locally
+        timer.time("handle_response", agent.handle_response, state, question, answer, 6, render)
+        question = timer.time("next_action", agent.next_action, state)
+        state.version += 1
+        timer.time("checkpoint", lambda: storage.save_checkpoint(state.token, state.session_id, state.version,
+                                                                 state.to_json()))
+    timer.time("generate_final_evaluation", agent.generate_final_evaluation, state, render)
+    if repeats is not None:
+        repeats.append(count_repeats(list(agent.asked_questions(state))))
+
+
+def run_benchmark(candidates=4, job_role="AI Engineer", answer_time=0.2, latency=0.2,
+                  tokens_per_sec=200.0, think_tokens=40, slots=2, use_cache=False, stream=False,
+                  bank_fill=False, format_drift=0.0, load_time=0.0, warmup=False, routes=None, speeds=None,
+                  junk_rate=0.0, repeat_rate=0.0, dedup=True):
+    """
+    Run full interviews headlessly against FakeOllamaClient and a temporary database.
+
+    Args:
+        candidates (int): Simulated candidates interviewing concurrently.
+        job_role (str): Role every candidate interviews for.
+        answer_time (float): Seconds each candidate spends per answer.
+        latency (float): Fake model time to first token.
+        tokens_per_sec (float): Fake model output rate.
+        think_tokens (int): Hidden reasoning tokens per response.
+        slots (int): LLM client concurrency limit.
+        use_cache (bool): Keep the LLM response cache on (off measures raw generation).
+        stream (bool): Stream evaluations and summaries, recording time to first token.
+        bank_fill (bool): Let question-bank misses trigger background fills (extra LLM load).
+        format_drift (float): Fraction of evaluations the fake answers in free text (repair calls).
+        load_time (float): Fake model load time paid by the first request to a cold model.
+        warmup (bool): Load and pin the models before the candidates arrive, as the app does at startup.
+        routes (dict, optional): Router config over the defaults, e.g. {"question": ["small", "deepseek-r1"]}.
+        speeds (dict, optional): {model: factor} making fake models faster (>1) or slower (<1).
+        junk_rate (float): Fraction of answers that are "idk", "pass" or the question pasted back.
+        repeat_rate (float): Fraction of generated questions the fake rewords from an earlier one.
+        dedup (bool): Reject near-duplicate questions (question_index); off measures the repeats.
+
+    Returns:
+        dict: Configuration, per-stage p50/p95/p99, throughput and DB wait figures.
+    """
+    import Interview_agent as agent
+
+    workdir = tempfile.mkdtemp(prefix="interview-bench-")
+    storage.set_db_path(os.path.join(workdir, "interviews.db"))
+    llm_cache.set_cache(llm_cache.LLMCache(os.path.join(workdir, "llm_cache.db"),
+                                           max_entries=llm_cache.MAX_ENTRIES if use_cache else 0))
+    question_bank.BACKGROUND_FILL = bank_fill
+    question_bank.DEDUPLICATE = dedup
+    question_index.set_embedder(question_index.HashingEmbedder())
+    fake = FakeOllamaClient(latency=latency, tokens_per_sec=tokens_per_sec, think_tokens=think_tokens,
+                            format_drift=format_drift, load_time=load_time, speeds=speeds, repeat_rate=repeat_rate)
+    client = llm_client.LLMClient(max_concurrency=slots, max_queue=max(32, candidates * 4), client=fake)
+    llm_client.set_client(client)
+    router = llm_router.ModelRouter(llm_router.parse_routes({**llm_router.DEFAULT_ROUTES, **(routes or {})}))
+    llm_router.set_router(router)
+    if warmup:
+        warmer = llm_warmup.ModelWarmer(client, router.models())
+        for model in warmer.models:
+            warmer.warm(model)
+
+    timer = StageTimer()
+    errors = []
+    repeats = []
+
+    def worker(index):
+        try:
+            run_candidate(agent, timer, index, job_role, answer_time, stream, junk_rate, repeats)
+        except Exception as e:
+            errors.append(f"candidate-{index}: {e!r}")
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(candidates)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    timer.time("db_flush", storage.flush)
+    elapsed = time.perf_counter() - started
+
+    answers = len(timer.samples.get("handle_response", []))
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "candidates": candidates, "job_role": job_role, "answer_time": answer_time,
+            "latency": latency, "tokens_per_sec": tokens_per_sec, "think_tokens": think_tokens,
+            "slots": slots, "use_cache": use_cache, "stream": stream, "bank_fill": bank_fill,
+            "format_drift": format_drift, "load_time": load_time, "warmup": warmup,
+            "routes": routes or {}, "speeds": speeds or {}, "junk_rate": junk_rate,
+            "repeat_rate": repeat_rate, "dedup": dedup,
+        },
+        "stages": summarize(timer.samples),
+        "throughput": {
+            "elapsed_s": elapsed,
+            "interviews_per_min": 60 * (candidates - len(errors)) / elapsed,
+            "answers_per_s": answers / elapsed,
+            "llm_calls": fake.calls,
+        },
+        "db": {"pool_wait_s": storage.get_pool().wait_seconds},
+        "cache": llm_cache.get_cache().stats(),
+        "routes": router.stats(),
+        "queue": client.stats(),
+        "questions": {"repeats_asked": sum(repeats), "index": question_index.stats()},
+        "errors": errors,
+    }
+
+
+def measure_imports(module="Interview_agent", repeat=3):
+    """
+    Cold-import `module` in fresh interpreters with `-X importtime`.
+
+    Args:
+        module (str): Module to import from this directory.
+        repeat (int): Runs; the fastest is kept to smooth out disk cache noise.
+
+    Returns:
+        dict: {imported module: cumulative seconds} for the fastest run, slowest first.
+    """
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True)
+        times = {}
+        for line in proc.stderr.splitlines():
+            # "import time:  self [us] | cumulative | imported package"
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1e6
+        if best is None or times.get(module, 0) < best.get(module, 0):
+            best = times
+    return dict(sorted(best.items(), key=lambda item: -item[1]))
+
+
+def print_import_report(times, module="Interview_agent", top=15):
+    print(f"\nCold import of {module}: {times.get(module, 0) * 1000:.1f}ms")
+    print(f"{'module':<60}{'cumulative ms':>15}")
+    for name, seconds in list(times.items())[:top]:
+        print(f"{name:<60}{seconds * 1000:>15.1f}")
+
+
+def compare(result, baseline, tolerance):
+    """
+    List stages whose p95 got slower than the baseline by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for stage, stats in result["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before and before["p95"] and stats["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {before['p95'] * 1000:.1f}ms -> {stats['p95'] * 1000:.1f}ms")
+    return regressions
+
+
+def print_report(result):
+    print(f"\nStage latencies ({result['config']['candidates']} concurrent candidates):")
+    print(f"{'stage':<28}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage in STAGES + sorted(set(result["stages"]) - set(STAGES)):
+        stats = result["stages"].get(stage)
+        if stats:
+            print(f"{stage:<28}{stats['count']:>7}{stats['p50'] * 1000:>10.1f}"
+                  f"{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}")
+    throughput = result["throughput"]
+    print(f"\nElapsed: {throughput['elapsed_s']:.2f}s, "
+          f"{throughput['interviews_per_min']:.1f} interviews/min, "
+          f"{throughput['answers_per_s']:.2f} answers/s, {throughput['llm_calls']} LLM calls")
+    print(f"DB pool wait: {result['db']['pool_wait_s'] * 1000:.1f}ms")
+    print(f"\n{'route':<14}{'model':<22}{'calls':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for route, models in result["routes"].items():
+        for model, stats in models.items():
+            p50 = f"{stats['p50'] * 1000:.1f}" if stats["p50"] is not None else "-"
+            p95 = f"{stats['p95'] * 1000:.1f}" if stats["p95"] is not None else "-"
+            print(f"{route:<14}{model:<22}{stats['calls']:>7}{stats['errors']:>8}{p50:>10}{p95:>10}")
+    print(f"\n{'queue class':<14}{'wait p50 ms':>12}{'wait p95 ms':>12}{'preempted':>11}{'rejected':>10}")
+    for name, stats in result["queue"]["classes"].items():
+        p50 = f"{stats['wait_p50'] * 1000:.1f}" if stats["wait_p50"] is not None else "-"
+        p95 = f"{stats['wait_p95'] * 1000:.1f}" if stats["wait_p95"] is not None else "-"
+        print(f"{name:<14}{p50:>12}{p95:>12}{stats['preempted']:>11}{stats['rejected']:>10}")
+    questions = result["questions"]
+    print(f"\nNear-duplicate questions asked within an interview: {questions['repeats_asked']}")
+    for role_key, stats in questions["index"].items():
+        print(f"Question index {role_key}: {stats['rows']} questions, {stats['rejected']} near-duplicates rejected")
+    for error in result["errors"]:
+        print(f"Error: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark for the interview agent.")
+    parser.add_argument("--candidates", type=int, default=4, help="Concurrent simulated candidates")
+    parser.add_argument("--job-role", default="AI Engineer")
+    parser.add_argument("--answer-time", type=float, default=0.2, help="Seconds spent answering each question")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model time to first token (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Fake model output rate")
+    parser.add_argument("--think-tokens", type=int, default=40, help="Hidden <think> tokens per response")
+    parser.add_argument("--slots", type=int, default=2, help="LLM client concurrency limit")
+    parser.add_argument("--cache", action="store_true", help="Enable the LLM response cache")
+    parser.add_argument("--stream", action="store_true", help="Stream evaluations and summaries")
+    parser.add_argument("--bank-fill", action="store_true", help="Allow background question-bank fills")
+    parser.add_argument("--format-drift", type=float, default=0.0, help="Fraction of evaluations not returned as JSON")
+    parser.add_argument("--load-time", type=float, default=0.0, help="Fake model load time on a cold start (s)")
+    parser.add_argument("--warmup", action="store_true", help="Preload the models before the run starts")
+    parser.add_argument("--routes", type=json.loads, help='Router config as JSON, e.g. \'{"question": ["small", "deepseek-r1"]}\'')
+    parser.add_argument("--speeds", type=json.loads, help='Fake model speed factors as JSON, e.g. \'{"small": 4}\'')
+    parser.add_argument("--junk-rate", type=float, default=0.0, help="Fraction of junk answers (pre-scored locally)")
+    parser.add_argument("--repeat-rate", type=float, default=0.0, help="Fraction of generated questions reworded from earlier ones")
+    parser.add_argument("--no-dedup", action="store_true", help="Turn off near-duplicate question rejection")
+    parser.add_argument("--imports", action="store_true", help="Only measure the cold import time of the app")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs baseline (fraction)")
+    args = parser.parse_args()
+
+    if args.imports:
+        print_import_report(measure_imports())
+        sys.exit(0)
+
+    result = run_benchmark(
+        candidates=args.candidates, job_role=args.job_role, answer_time=args.answer_time,
+        latency=args.latency, tokens_per_sec=args.tokens_per_sec, think_tokens=args.think_tokens,
+        slots=args.slots, use_cache=args.cache, stream=args.stream, bank_fill=args.bank_fill,
+        format_drift=args.format_drift, load_time=args.load_time, warmup=args.warmup,
+        routes=args.routes, speeds=args.speeds, junk_rate=args.junk_rate,
+        repeat_rate=args.repeat_rate, dedup=not args.no_dedup,
+    )
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}")
+        if regressions:
+            sys.exit(1)
@@ -1,78 +1,188 @@
+import argparse
+import csv
+import json
 import sqlite3
+import sys
 from tabulate import tabulate
 from pathlib import Path
 
-def check_database(db_path="interviews.db"):
+HEADERS = [
+    "ID", "Username", "Job Role", "Question", "Answer",
+    "Q Score", "Total Score", "Selected", "Timestamp"
+]
+FIELDS = [
+    "id", "username", "job_role", "question", "answer",
+    "question_score", "total_score", "selected", "timestamp"
+]
+PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 1000
+
+def table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+def truncated(column, width=50):
+    # Same display rule as before (first 47 chars + "..."), applied by SQLite so long
+    # answers never reach Python in full
+    return f"CASE WHEN length({column}) > {width} THEN substr({column}, 1, {width - 3}) || '...' ELSE {column} END"
+
+def records_source(conn, truncate=True):
     """
-    Check the contents of the interviews database and display all records in a table.
-    
+    Build the SELECT column list and FROM clause for answer records.
+
+    Answers saved after the sessions table was introduced keep their final score on the
+    session row, so it is joined in when present; older rows carry it themselves.
+
     Args:
-        db_path (str): Path to the SQLite database file.
+        conn (sqlite3.Connection): Connection to the interviews database.
+        truncate (bool): Shorten question and answer text in SQL.
     """
-    try:
-        # Check if database file exists
-        if not Path(db_path).exists():
-            print(f"Error: Database file '{db_path}' does not exist.")
-            return
+    question = truncated("i.question") if truncate else "i.question"
+    answer = truncated("i.answer") if truncate else "i.answer"
+    if not table_exists(conn, "sessions"):
+        return f"""
+            SELECT i.id, i.username, i.job_role, {question}, {answer}, i.question_score,
+                   i.total_score, i.selected, i.timestamp
+            FROM interviews i"""
+    return f"""
+            SELECT i.id, i.username, i.job_role, {question}, {answer}, i.question_score,
+                   COALESCE(s.total_score, i.total_score), COALESCE(s.selected, i.selected), i.timestamp
+            FROM interviews i LEFT JOIN sessions s ON s.id = i.session_id"""
 
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
+def iter_records(conn, username=None, job_role=None, truncate=True, after_id=None, limit=None,
+                 batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield answer records newest first, reading `batch_size` rows at a time.
 
-        # Verify table exists
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='interviews'")
-        if not c.fetchone():
-            print("Error: 'interviews' table does not exist in the database.")
-            conn.close()
-            return
+    Ordering is by id (insertion order, the same as timestamp order) so every page is a
+    keyset range on the primary key rather than an OFFSET scan.
 
-        # Query all records from interviews table
-        c.execute("""
-            SELECT id, username, job_role, question, answer, question_score, 
-                   total_score, selected, timestamp 
-            FROM interviews
-            ORDER BY timestamp DESC
-        """)
-        rows = c.fetchall()
+    Args:
+        conn (sqlite3.Connection): Connection to the interviews database.
+        username (str, optional): Filter by username.
+        job_role (str, optional): Filter by job role.
+        truncate (bool): Shorten question and answer text in SQL.
+        after_id (int, optional): Only rows with a smaller id (the previous page's last id).
+        limit (int, optional): Stop after this many rows.
+        batch_size (int): Rows fetched per round trip.
+    """
+    query = records_source(conn, truncate) + """
+            WHERE 1=1
+        """
+    params = []
+    if username:
+        query += " AND i.username = ?"
+        params.append(username)
+    if job_role:
+        query += " AND i.job_role = ?"
+        params.append(job_role)
+    if after_id is not None:
+        query += " AND i.id < ?"
+        params.append(after_id)
+    query += " ORDER BY i.id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
 
-        # Check if there are any records
+    c = conn.execute(query, params)
+    while True:
+        rows = c.fetchmany(batch_size)
         if not rows:
-            print("No records found in the 'interviews' table.")
-            conn.close()
             return
+        yield from rows
+
+def summary_stats(conn, username=None, job_role=None):
+    """
+    Compute record counts with SQL aggregates instead of loading rows.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the interviews database.
+        username (str, optional): Filter by username.
+        job_role (str, optional): Filter by job role.
+
+    Returns:
+        dict: total, unique_users, unique_roles, completed (finished interviews; on a database
+        without sessions, answer rows with a final score) and unmigrated (completed answer
+        rows not yet moved into sessions).
+    """
+    where = "WHERE 1=1"
+    params = []
+    if username:
+        where += " AND username = ?"
+        params.append(username)
+    if job_role:
+        where += " AND job_role = ?"
+        params.append(job_role)
+    total, users, roles = conn.execute(
+        f"SELECT COUNT(*), COUNT(DISTINCT username), COUNT(DISTINCT job_role) FROM interviews {where}", params
+    ).fetchone()
+    stats = {"total": total, "unique_users": users, "unique_roles": roles, "completed": 0, "unmigrated": 0}
+    if table_exists(conn, "sessions"):
+        stats["completed"] = conn.execute(
+            f"SELECT COUNT(*) FROM sessions {where} AND total_score IS NOT NULL", params
+        ).fetchone()[0]
+        stats["unmigrated"] = conn.execute(
+            f"SELECT COUNT(*) FROM interviews {where} AND session_id IS NULL AND total_score IS NOT NULL", params
+        ).fetchone()[0]
+    else:
+        # Old schema: the final score is copied onto every answer row; count those rows as
+        # before, and flag them all as unmigrated
+        stats["completed"] = stats["unmigrated"] = conn.execute(
+            f"SELECT COUNT(*) FROM interviews {where} AND total_score IS NOT NULL", params
+        ).fetchone()[0]
+    return stats
+
+def open_database(db_path):
+    # Returns None (after printing why) if the file or the interviews table is missing
+    if not Path(db_path).exists():
+        print(f"Error: Database file '{db_path}' does not exist.")
+        return None
+    conn = sqlite3.connect(db_path)
+    if not table_exists(conn, "interviews"):
+        print("Error: 'interviews' table does not exist in the database.")
+        conn.close()
+        return None
+    return conn
+
+def print_page(conn, title, username=None, job_role=None, after_id=None, page_size=PAGE_SIZE):
+    rows = list(iter_records(conn, username, job_role, after_id=after_id, limit=page_size))
+    if not rows:
+        return None
+    print(f"\n{title}:")
+    print(tabulate(rows, headers=HEADERS, tablefmt="grid"))
+    last_id = rows[-1][0]
+    if len(rows) == page_size:
+        print(f"\nShowing {len(rows)} records. Next page: --after-id {last_id}")
+    return last_id
+
+def print_stats(stats):
+    print("\nSummary:")
+    print(f"Total Records: {stats['total']}")
+    print(f"Unique Users: {stats['unique_users']}")
+    print(f"Unique Job Roles: {stats['unique_roles']}")
+    print(f"Completed Interviews: {stats['completed']}")
+    if stats["unmigrated"]:
+        print(f"Completed answer rows not yet in sessions: {stats['unmigrated']} (run migrate_db.py)")
+
+def check_database(db_path="interviews.db", after_id=None, page_size=PAGE_SIZE):
+    """
+    Check the contents of the interviews database: one page of records plus summary counts.
+    
+    Args:
+        db_path (str): Path to the SQLite database file.
+        after_id (int, optional): Show records older than this id (from the previous page).
+        page_size (int): Records per page.
+    """
+    try:
+        conn = open_database(db_path)
+        if not conn:
+            return
+
+        if print_page(conn, "Interview Records", after_id=after_id, page_size=page_size) is None:
+            print("No records found in the 'interviews' table.")
+        print_stats(summary_stats(conn))
 
-        # Define table headers
-        headers = [
-            "ID", "Username", "Job Role", "Question", "Answer", 
-            "Q Score", "Total Score", "Selected", "Timestamp"
-        ]
-
-        # Truncate long strings for display (e.g., question, answer)
-        display_rows = []
-        for row in rows:
-            # Truncate question and answer to 50 characters for readability
-            question = (row[3][:47] + "...") if row[3] and len(row[3]) > 50 else row[3]
-            answer = (row[4][:47] + "...") if row[4] and len(row[4]) > 50 else row[4]
-            display_rows.append([
-                row[0], row[1], row[2], question, answer, 
-                row[5], row[6], row[7], row[8]
-            ])
-
-        # Print table using tabulate
-        print("\nInterview Records:")
-        print(tabulate(display_rows, headers=headers, tablefmt="grid"))
-
-        # Summary statistics
-        print("\nSummary:")
-        print(f"Total Records: {len(rows)}")
-        usernames = len(set(row[1] for row in rows))
-        print(f"Unique Users: {usernames}")
-        job_roles = len(set(row[2] for row in rows))
-        print(f"Unique Job Roles: {job_roles}")
-        completed = sum(1 for row in rows if row[6] is not None)
-        print(f"Completed Interviews: {completed}")
-
-        # Close connection
         conn.close()
 
     except sqlite3.Error as e:
@@ -80,63 +190,28 @@ def check_database(db_path="interviews.db"):
     except Exception as e:
         print(f"Unexpected error: {e}")
 
-def filter_by_user_or_role(db_path="interviews.db", username=None, job_role=None):
+def filter_by_user_or_role(db_path="interviews.db", username=None, job_role=None, after_id=None,
+                           page_size=PAGE_SIZE):
     """
-    Query records filtered by username or job role.
+    Query records filtered by username or job role, one page at a time.
     
     Args:
         db_path (str): Path to the SQLite database file.
         username (str, optional): Filter by username.
         job_role (str, optional): Filter by job role.
+        after_id (int, optional): Show records older than this id (from the previous page).
+        page_size (int): Records per page.
     """
     try:
-        if not Path(db_path).exists():
-            print(f"Error: Database file '{db_path}' does not exist.")
+        conn = open_database(db_path)
+        if not conn:
             return
 
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-
-        query = """
-            SELECT id, username, job_role, question, answer, question_score, 
-                   total_score, selected, timestamp 
-            FROM interviews
-            WHERE 1=1
-        """
-        params = []
-        if username:
-            query += " AND username = ?"
-            params.append(username)
-        if job_role:
-            query += " AND job_role = ?"
-            params.append(job_role)
-        query += " ORDER BY timestamp DESC"
-
-        c.execute(query, params)
-        rows = c.fetchall()
-
-        if not rows:
+        title = f"Filtered Records (username='{username}', job_role='{job_role}')"
+        if print_page(conn, title, username, job_role, after_id, page_size) is None:
             print(f"No records found for username='{username}' and/or job_role='{job_role}'.")
-            conn.close()
-            return
-
-        headers = [
-            "ID", "Username", "Job Role", "Question", "Answer", 
-            "Q Score", "Total Score", "Selected", "Timestamp"
-        ]
-        display_rows = [
-            [
-                row[0], row[1], row[2], 
-                (row[3][:47] + "...") if row[3] and len(row[3]) > 50 else row[3],
-                (row[4][:47] + "...") if row[4] and len(row[4]) > 50 else row[4],
-                row[5], row[6], row[7], row[8]
-            ]
-            for row in rows
-        ]
-
-        print(f"\nFiltered Records (username='{username}', job_role='{job_role}'):")
-        print(tabulate(display_rows, headers=headers, tablefmt="grid"))
-        print(f"\nTotal Filtered Records: {len(rows)}")
+        else:
+            print(f"\nTotal Filtered Records: {summary_stats(conn, username, job_role)['total']}")
 
         conn.close()
 
@@ -145,18 +220,70 @@ def filter_by_user_or_role(db_path="interviews.db", username=None, job_role=None
     except Exception as e:
         print(f"Unexpected error: {e}")
 
+def export_records(db_path="interviews.db", output=None, fmt="csv", username=None, job_role=None, truncate=False):
+    """
+    Stream records to CSV or JSON Lines without holding them in memory.
+    
+    Args:
+        db_path (str): Path to the SQLite database file.
+        output (str, optional): Output file; stdout when omitted.
+        fmt (str): "csv" or "jsonl".
+        username (str, optional): Filter by username.
+        job_role (str, optional): Filter by job role.
+        truncate (bool): Shorten question and answer text as in the table view.
+    """
+    try:
+        conn = open_database(db_path)
+        if not conn:
+            return
+        try:
+            out = open(output, "w", newline="", encoding="utf-8") if output else sys.stdout
+            try:
+                count = 0
+                if fmt == "csv":
+                    writer = csv.writer(out)
+                    writer.writerow(FIELDS)
+                for row in iter_records(conn, username, job_role, truncate=truncate):
+                    if fmt == "csv":
+                        writer.writerow(row)
+                    else:
+                        out.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n")
+                    count += 1
+                if output:
+                    print(f"Exported {count} records to {output}")
+            finally:
+                if output:
+                    out.close()
+        finally:
+            conn.close()
+
+    # Errors go to stderr so they never end up inside an export written to stdout
+    except sqlite3.Error as e:
+        print(f"Database error: {e}", file=sys.stderr)
+    except Exception as e:
+        print(f"Unexpected error: {e}", file=sys.stderr)
+
 if __name__ == "__main__":
-    # Path to the database
-    DB_PATH = r"C:\Users\Ajay sivakumar\Desktop\RAG\interviews.db"
-
-    # Check all records
-    print("Checking all records in the database...")
-    check_database(DB_PATH)
-
-    # Example: Filter by username or job role (uncomment to use)
-    # print("\nChecking records for specific user...")
-    # filter_by_user_or_role(DB_PATH, username="Ajay Sivakumar")
-    # print("\nChecking records for specific job role...")
-    # filter_by_user_or_role(DB_PATH, job_role="AGI Researcher")
-    # print("\nChecking records for user and job role...")
-    # filter_by_user_or_role(DB_PATH, username="Ajay Sivakumar", job_role="AGI Researcher")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inspect the interviews database.")
+    parser.add_argument("--db", default="interviews.db", help="Path to the SQLite database file")
+    parser.add_argument("--user", help="Filter by username")
+    parser.add_argument("--role", help="Filter by job role")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Records per page")
+    parser.add_argument("--after-id", type=int, help="Show the page after this record id")
+    parser.add_argument("--stats", action="store_true", help="Only print summary counts")
+    parser.add_argument("--export", choices=["csv", "jsonl"], help="Stream all matching records in this format")
+    parser.add_argument("--output", help="Export destination (default: stdout)")
+    args = parser.parse_args()
+
+    if args.export:
+        export_records(args.db, args.output, args.export, args.user, args.role)
+    elif args.stats:
+        conn = open_database(args.db)
+        if conn:
+            print_stats(summary_stats(conn, args.user, args.role))
+            conn.close()
+    elif args.user or args.role:
+        filter_by_user_or_role(args.db, args.user, args.role, args.after_id, args.page_size)
+    else:
+        print("Checking all records in the database...")
+        check_database(args.db, args.after_id, args.page_size)
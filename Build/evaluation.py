@@ -0,0 +1,125 @@
+import json
+import math
+import re
+
+EVALUATION_FORMAT = "json"  # ollama constrains the reply to valid JSON
+MAX_SCORE = 10
+
+REPAIR_PROMPT = """
+    Rewrite the evaluation above as JSON without changing its verdict.
+    Return only: {"score": <0-10>, "explanation": "<1-2 sentences>"}
+    """
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+# "Score: 7", "score = 7/10", "**Score:** 7.5", "I'd give it a score of 7", '"score": "7"'
+_SCORE = re.compile(r"""score["'*\s]*(?:[:=]|of|is)["'*\s]*(\d{1,2}(?:\.\d+)?)(?!\d)(?:\s*/\s*10)?""", re.IGNORECASE)
+_EXPLANATION = re.compile(r"""(?:explanation|feedback)["'*\s]*[:=]["'*\s]*(.+?)["'}\s]*$""", re.IGNORECASE | re.DOTALL)
+_FIELD_START = re.compile(r'"(?:explanation|feedback)"\s*:\s*"', re.IGNORECASE)
+
+
+def _clamp(score):
+    score = float(score)
+    if not math.isfinite(score):  # json.loads accepts Infinity and NaN
+        return None
+    score = round(score)
+    return score if 0 <= score <= MAX_SCORE else None
+
+
+def _from_json(text):
+    match = _JSON_OBJECT.search(text)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    fields = {key.lower(): value for key, value in data.items()}
+    try:
+        score = _clamp(fields.get("score"))
+    except (TypeError, ValueError, OverflowError):  # float() of a huge integer overflows
+        return None
+    explanation = fields.get("explanation") or fields.get("feedback") or ""
+    return (score, str(explanation).strip()) if score is not None else None
+
+
+def parse_evaluation(text):
+    """
+    Extract the score and explanation from an evaluation reply.
+
+    Tries the reply as JSON first (the structured-output path), then falls back to
+    "Score: X, Explanation: ..." style text in any case, order or punctuation.
+
+    Returns:
+        tuple or None: (score, explanation), or None if no score in 0-10 was found.
+    """
+    parsed = _from_json(text)
+    if parsed:
+        return parsed
+    match = _SCORE.search(text)
+    if not match:
+        return None
+    score = _clamp(match.group(1))
+    if score is None:
+        return None
+    explanation = _EXPLANATION.search(text)
+    if explanation:
+        return score, explanation.group(1).strip()
+    # No labelled explanation: the text after the score, or failing that before it, is the feedback
+    after = text[match.end():].strip(" \n\t,.-:")
+    return score, after or text[:match.start()].strip(" \n\t,.-:")
+
+
+def stream_explanation(chunks):
+    """
+    Yield only the text of the "explanation" field from a streamed JSON reply.
+
+    Lets the UI show feedback as it is generated even though the model is writing
+    JSON. Escapes are decoded as they complete. After the closing quote the rest of
+    the stream is consumed but not shown, so wrappers that record or cache the full
+    reply still see all of it. If the reply never contains the field, nothing is yielded.
+    """
+    chunks = iter(chunks)
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        if not started:
+            match = _FIELD_START.search(buffer)
+            if not match:
+                continue
+            started = True
+            buffer = buffer[match.end():]
+        out = []
+        i = 0
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                if out:
+                    yield "".join(out)
+                for _ in chunks:
+                    pass
+                return
+            if char == "\\":
+                if i + 1 >= len(buffer):
+                    break  # Escape split across chunks
+                if buffer[i + 1] == "u":
+                    # \uXXXX, or two of them for a surrogate pair (e.g. emoji with ensure_ascii)
+                    width = 12 if buffer[i + 2:i + 4].lower() in ("d8", "d9", "da", "db") else 6
+                    if i + width > len(buffer):
+                        break
+                    try:
+                        out.append(json.loads(f'"{buffer[i:i + width]}"'))
+                    except ValueError:
+                        pass
+                    i += width
+                    continue
+                out.append({"n": "\n", "t": "\t", "r": "", "b": "", "f": ""}.get(buffer[i + 1], buffer[i + 1]))
+                i += 2
+                continue
+            out.append(char)
+            i += 1
+        buffer = buffer[i:]
+        if out:
+            yield "".join(out)
@@ -0,0 +1,184 @@
+import argparse
+import csv
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import storage
+from question_bank import normalize_role
+from report import ReportData, render_report
+
+# Mirrors InterviewState: answers are stored in order, five per round
+ROUND_DIFFICULTIES = ("Easy", "Medium", "Hard")
+QUESTIONS_PER_ROUND = 5
+FETCH_BATCH = 200  # Sessions whose answers are read per query
+TRANSCRIPT_FIELDS = [
+    "session_id", "username", "job_role", "started_at", "ended_at", "total_score", "selected",
+    "round", "question_no", "topic", "difficulty", "question", "answer", "question_score", "answered_at",
+]
+
+
+def pending_sessions(conn, role_key, export_name, include_exported=False):
+    """
+    Finished sessions for a role that the named export has not shipped yet.
+
+    Returns:
+        list: (id, username, job_role, started_at, ended_at, total_score, selected) rows, oldest first.
+    """
+    already = "" if include_exported else """
+          AND NOT EXISTS (SELECT 1 FROM exported_sessions e WHERE e.export_name = ? AND e.session_id = s.id)"""
+    rows = conn.execute(f"""
+        SELECT id, username, job_role, started_at, ended_at, total_score, selected FROM sessions s
+        WHERE ended_at IS NOT NULL AND total_score IS NOT NULL {already}
+        ORDER BY ended_at, id
+    """, () if include_exported else (export_name,)).fetchall()
+    return [row for row in rows if normalize_role(row[2]) == role_key]
+
+
+def iter_answers(conn, sessions):
+    """Yield (session row, [answer rows]) in `sessions` order, reading FETCH_BATCH sessions per query."""
+    for start in range(0, len(sessions), FETCH_BATCH):
+        batch = sessions[start:start + FETCH_BATCH]
+        placeholders = ",".join("?" * len(batch))
+        answers = {}
+        for row in conn.execute(f"""
+            SELECT session_id, question, answer, question_score, topic, difficulty, timestamp FROM interviews
+            WHERE session_id IN ({placeholders}) ORDER BY id
+        """, [session[0] for session in batch]):
+            answers.setdefault(row[0], []).append(row[1:])
+        for session in batch:
+            yield session, answers.get(session[0], [])
+
+
+def _seconds_between(started_at, ended_at):
+    try:
+        return int((datetime.fromisoformat(ended_at) - datetime.fromisoformat(started_at)).total_seconds())
+    except (TypeError, ValueError):
+        return 0
+
+
+def rebuild_report_data(session, answers):
+    """
+    Reconstruct the report of a finished session from its stored rows.
+
+    The final evaluation text is not stored, so the report summary is the total score
+    and selection status; the interview duration setting is not stored either.
+
+    Returns:
+        ReportData
+    """
+    session_id, username, job_role, started_at, ended_at, total_score, selected = session
+    rounds = []
+    for i, difficulty in enumerate(ROUND_DIFFICULTIES):
+        chunk = answers[i * QUESTIONS_PER_ROUND:(i + 1) * QUESTIONS_PER_ROUND]
+        rounds.append((difficulty, tuple((q, a, score) for q, a, score, *_ in chunk)))
+    feedback = f"Total Score: {total_score}\nSelection: {selected}\nCompleted: {ended_at}"
+    return ReportData(job_role, username, _seconds_between(started_at, ended_at), None, tuple(rounds), feedback)
+
+
+def _entry_name(session):
+    username = re.sub(r"[^A-Za-z0-9._-]+", "_", session[1] or "unknown").strip("_") or "unknown"
+    return f"reports/{session[0]:06d}_{username}.pdf"
+
+
+def _write_transcripts(archive, conn, sessions):
+    with archive.open("transcripts.csv", "w", force_zip64=True) as raw:
+        out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        writer = csv.writer(out)
+        writer.writerow(TRANSCRIPT_FIELDS)
+        for session, answers in iter_answers(conn, sessions):
+            for n, (question, answer, score, topic, difficulty, answered_at) in enumerate(answers):
+                writer.writerow([
+                    *session, n // QUESTIONS_PER_ROUND + 1, n % QUESTIONS_PER_ROUND + 1,
+                    topic, difficulty, question, answer, score, answered_at,
+                ])
+        out.flush()
+        out.detach()
+
+
+def _write_reports(archive, conn, sessions, workers):
+    # At most `window` reports are in flight or waiting to be written, however many sessions there are
+    window = max(1, workers) * 4
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+
+        def drain(block_until):
+            nonlocal written
+            while len(in_flight) > block_until:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    archive.writestr(in_flight.pop(future), future.result(), compress_type=zipfile.ZIP_STORED)
+                    written += 1
+
+        for session, answers in iter_answers(conn, sessions):
+            future = executor.submit(render_report, rebuild_report_data(session, answers))
+            in_flight[future] = _entry_name(session)
+            drain(window - 1)
+        drain(0)
+    return written
+
+
+def export_role(job_role, output=None, export_name=None, workers=None, include_exported=False):
+    """
+    Write a zip of PDF reports plus a transcript CSV for a role's finished sessions.
+
+    Only sessions not yet shipped under `export_name` are included, so running it weekly
+    produces weekly packs. Sessions are marked as exported only after the zip is
+    complete and in place; an interrupted run leaves a `.partial` file behind and the
+    next run exports the same sessions again.
+
+    Args:
+        job_role (str): Role to export; matched after normalization.
+        output (str, optional): Zip path; defaults to exports/<role>_<timestamp>.zip.
+        export_name (str, optional): Progress is tracked per name; defaults to the role.
+        workers (int, optional): Report rendering processes; defaults to the CPU count.
+        include_exported (bool): Re-export sessions that earlier runs already shipped.
+
+    Returns:
+        tuple: (output path or None if there was nothing to export, sessions exported)
+    """
+    role_key = normalize_role(job_role)
+    export_name = export_name or role_key
+    workers = workers or os.cpu_count() or 1
+    with storage.get_pool().connection() as conn:
+        sessions = pending_sessions(conn, role_key, export_name, include_exported)
+        if not sessions:
+            return None, 0
+        stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        output = output or os.path.join("exports", f"{role_key.replace(' ', '_')}_{stamp}.zip")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        partial = f"{output}.partial"
+        with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            _write_transcripts(archive, conn, sessions)
+            _write_reports(archive, conn, sessions, workers)
+        os.replace(partial, output)
+
+        exported_at = datetime.now().isoformat()
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO exported_sessions (export_name, session_id, exported_at, archive)
+                VALUES (?, ?, ?, ?)
+            """, [(export_name, session[0], exported_at, os.path.basename(output)) for session in sessions])
+    return output, len(sessions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export PDF reports and transcripts for a role.")
+    parser.add_argument("job_role", help='Role to export, e.g. "AI Engineer"')
+    parser.add_argument("--output", help="Zip file to write (default: exports/<role>_<timestamp>.zip)")
+    parser.add_argument("--name", help="Track progress under this name (default: the role)")
+    parser.add_argument("--workers", type=int, help="Rendering processes (default: CPU count)")
+    parser.add_argument("--all", action="store_true", help="Include sessions already exported")
+    parser.add_argument("--db", default=storage.DB_PATH, help="Path to the SQLite database file")
+    args = parser.parse_args()
+
+    storage.set_db_path(args.db)
+    path, count = export_role(args.job_role, args.output, args.name, args.workers, args.all)
+    if path:
+        print(f"Exported {count} sessions to {path}")
+    else:
+        print("No new finished sessions to export.")
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import random
+import threading
+import time
+
+# Generated questions combine one of these asks with one of these subjects
+QUESTION_ASKS = [
+    "How would you design {} for a team that is growing quickly?",
+    "Walk me through debugging {} when it fails in production.",
+    "What trade-offs matter most when planning {}?",
+    "Tell me about a time you had to deal with {}.",
+    "How would you test {} before it reaches users?",
+    "How would you explain {} to a non-technical manager?",
+]
+QUESTION_SUBJECTS = [
+    "a feature store", "model drift", "a vector database", "gradient checkpointing", "an A/B test", "data leakage",
+    "a retrieval pipeline", "class imbalance", "continuous training", "GPU memory limits", "a tokenizer change",
+    "label noise", "online inference latency", "a rollback plan", "privacy requirements", "a flaky training job",
+    "an annotation budget", "model compression", "stakeholder pushback", "an evaluation benchmark",
+    "prompt injection", "a cold-start problem", "schema changes upstream", "a cost overrun on inference",
+]
+
+
+class FakeOllamaClient:
+    """
+    Deterministic local stand-in for `ollama.Client`, for benchmarks and offline runs.
+
+    Responses are canned and wrapped in a `<think>` block like deepseek-r1's. Timing is
+    simulated: `latency` seconds of prefill before the first token, then
+    `tokens_per_sec` for every output token (thinking included). The same prompt always
+    gets the same text, apart from a per-call counter in generated questions so pools and
+    interviews still see distinct questions.
+
+    Args:
+        latency (float): Seconds before the first token.
+        tokens_per_sec (float): Output rate; 0 means instant.
+        think_tokens (int): Hidden reasoning tokens emitted before the answer.
+        seed (int): Seed for the canned scores.
+        format_drift (float): Fraction of `format="json"` evaluations answered in free
+            text anyway, to exercise the parser's repair path.
+        load_time (float): Seconds a request waits while an unloaded model loads. Models
+            stay loaded for their `keep_alive` (default 5 minutes, -1 forever), as in ollama.
+        speeds (dict, optional): {model: factor}; a model's latency and per-token time are
+            divided by its factor (default 1), so a small model can be made faster.
+        missing (iterable, optional): Models that fail every request as if not pulled.
+        repeat_rate (float): Fraction of generated questions that reword an earlier one,
+            to exercise near-duplicate detection.
+    """
+
+    def __init__(self, latency=0.5, tokens_per_sec=40.0, think_tokens=60, seed=0, format_drift=0.0, load_time=0.0,
+                 speeds=None, missing=(), repeat_rate=0.0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.think_tokens = think_tokens
+        self.seed = seed
+        self.format_drift = format_drift
+        self.load_time = load_time
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.calls = 0
+        self.loaded = {}  # model -> expiry (time.monotonic() value, or inf)
+        self.speeds = dict(speeds or {})
+        self.missing = set(missing)
+        self.repeat_rate = repeat_rate
+        self.questions = []  # Generated so far, for rewording
+
+    def _text(self, prompt, call_no, format=""):
+        digest = int(hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest(), 16)
+        rng = random.Random(digest)
+        think = "<think>" + " ".join("hmm" for _ in range(self.think_tokens)) + "</think>\n\n"
+        explanation = "Solid answer, a concrete example would make it even stronger!"
+        if "Rewrite the evaluation above as JSON" in prompt:
+            score = rng.randint(2, 10)
+            return json.dumps({"score": score, "explanation": explanation})
+        if "Evaluate for:" in prompt:
+            score = rng.randint(2, 10)
+            if format == "json" and rng.random() >= self.format_drift:
+                return json.dumps({"score": score, "explanation": explanation})  # No room to think in JSON mode
+            return think + f"I would rate this a {score} out of ten. {explanation}"
+        if "Summarize the candidate's performance" in prompt:
+            score = rng.randint(30, 95)
+            selection = "Selected" if score >= 60 else "Not Selected"
+            return think + (
+                "Summary: Clear fundamentals and steady problem-solving; keep practising the harder scenarios.\n"
+                f"Total Score: {score}\nSelection: {selection}"
+            )
+        if "Summarize this interview round" in prompt:
+            return think + "Answers were mostly accurate and well structured; adding concrete examples is the next step."
+        rng = random.Random(f"{digest}:{call_no}")
+        with self.lock:
+            if self.questions and rng.random() < self.repeat_rate:
+                question = "Quick one: " + rng.choice(self.questions)
+            else:
+                question = rng.choice(QUESTION_ASKS).format(rng.choice(QUESTION_SUBJECTS))
+                self.questions.append(question)
+        return think + f"Question {call_no}: {question}"
+
+    def _tokens(self, text):
+        # Whitespace-separated words stand in for tokens; keep the separators attached
+        tokens = []
+        for word in text.split(" "):
+            tokens.append(word + " ")
+        tokens[-1] = tokens[-1][:-1]
+        return tokens
+
+    def _keep_alive_seconds(self, keep_alive):
+        if keep_alive is None:
+            return 300.0
+        if isinstance(keep_alive, str) and keep_alive[-1:] in ("s", "m", "h"):
+            return float(keep_alive[:-1]) * {"s": 1, "m": 60, "h": 3600}[keep_alive[-1]]
+        seconds = float(keep_alive)
+        return float("inf") if seconds < 0 else seconds
+
+    def _load(self, model, keep_alive):
+        with self.load_lock:  # Concurrent requests wait for the same load, like the server
+            if self.loaded.get(model, 0) <= time.monotonic():
+                time.sleep(self.load_time)
+            self.loaded[model] = time.monotonic() + self._keep_alive_seconds(keep_alive)
+
+    def ps(self):
+        now = time.monotonic()
+        with self.load_lock:
+            models = [model for model, expiry in self.loaded.items() if expiry > now]
+        return {"models": [{"name": m if ":" in m else f"{m}:latest", "model": m} for m in models]}
+
+    def generate(self, model="", prompt="", options=None, stream=False, format="", keep_alive=None, **kwargs):
+        if model in self.missing:
+            raise RuntimeError(f"model '{model}' not found, try pulling it first")
+        self._load(model, keep_alive)
+        if not prompt:  # ollama: an empty prompt only loads the model
+            return {"model": model, "response": "", "done": True}
+        with self.lock:
+            self.calls += 1
+            call_no = self.calls
+        text = self._text(prompt, call_no, format)
+        tokens = self._tokens(text)
+        speed = self.speeds.get(model, 1.0)
+        latency = self.latency / speed
+        delay = 1 / (self.tokens_per_sec * speed) if self.tokens_per_sec else 0
+        prompt_tokens = len(prompt.split())
+        if stream:
+            return self._stream(model, tokens, latency, delay, prompt_tokens)
+        time.sleep(latency + delay * len(tokens))
+        return {
+            "model": model,
+            "response": text,
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(delay * len(tokens) * 1e9),
+        }
+
+    def embed(self, model="", input=(), keep_alive=None, **kwargs):
+        from question_index import HashingEmbedder  # Only offline embedding runs need NumPy here
+        if model in self.missing:
+            raise RuntimeError(f"model '{model}' not found, try pulling it first")
+        self._load(model, keep_alive)
+        texts = [input] if isinstance(input, str) else list(input)
+        time.sleep(self.latency / self.speeds.get(model, 1.0))
+        return {"model": model, "embeddings": HashingEmbedder()(texts).tolist()}
+
+    def _stream(self, model, tokens, latency, delay, prompt_tokens):
+        time.sleep(latency)
+        for i, token in enumerate(tokens):
+            time.sleep(delay)
+            part = {"model": model, "response": token, "done": i == len(tokens) - 1}
+            if part["done"]:
+                part.update({
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(latency * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int(delay * len(tokens) * 1e9),
+                })
+            yield part
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "llm_cache.db"
+MAX_ENTRIES = 5000
+
+# Per call-site policy. "pool" keeps up to `variants` different answers for the same
+# prompt and serves a random one once the pool is full; "exact" reuses a single answer.
+CACHE_POLICIES = {
+    "question": {"mode": "pool", "variants": 5, "ttl": 7 * 24 * 3600},
+    "evaluation": {"mode": "exact", "variants": 1, "ttl": 24 * 3600},
+    "summary": {"mode": "exact", "variants": 1, "ttl": 24 * 3600},
+}
+
+
+def cache_key(model, options, context, prompt, format=""):
+    """
+    Content address for an LLM request.
+
+    Args:
+        model (str): Model name.
+        options (dict): Generation options sent to ollama.
+        context (str): Context block prepended to the prompt.
+        prompt (str): Prompt text.
+        format (str, optional): ollama output format, e.g. "json".
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical request.
+    """
+    request = [model, options, context, prompt] + ([format] if format else [])  # Free-text keys stay unchanged
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Disk-backed LLM response cache with TTL and LRU eviction. `max_entries=0` disables it."""
+
+    def __init__(self, db_path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT,
+                variant INTEGER,
+                response TEXT,
+                created_at REAL,
+                last_access REAL,
+                PRIMARY KEY (key, variant)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+        self.conn.commit()
+
+    def get(self, key, policy, exclude=()):
+        """
+        Look up a cached response for `key` under the named policy.
+
+        Args:
+            key (str): Value from `cache_key`.
+            policy (str): Name of an entry in CACHE_POLICIES.
+            exclude (iterable): Responses the caller cannot use (e.g. questions already asked).
+
+        Returns:
+            str or None: A cached response, or None on a miss.
+        """
+        rules = CACHE_POLICIES[policy]
+        now = time.time()
+        with self.lock:
+            if not self.max_entries:
+                self.misses[policy] = self.misses.get(policy, 0) + 1
+                return None
+            self.conn.execute(
+                "DELETE FROM llm_cache WHERE key = ? AND created_at < ?", (key, now - rules["ttl"])
+            )
+            rows = self.conn.execute(
+                "SELECT variant, response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchall()
+            usable = [row for row in rows if row[1] not in exclude]
+            # A pool only serves once it holds enough variants to give some variety
+            if not usable or (rules["mode"] == "pool" and len(rows) < rules["variants"]):
+                self.conn.commit()
+                self.misses[policy] = self.misses.get(policy, 0) + 1
+                return None
+            variant, response = random.choice(usable)
+            self.conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ? AND variant = ?", (now, key, variant)
+            )
+            self.conn.commit()
+            self.hits[policy] = self.hits.get(policy, 0) + 1
+            return response
+
+    def put(self, key, policy, response):
+        """
+        Store a response, adding a pool variant or replacing the exact-match entry.
+
+        Args:
+            key (str): Value from `cache_key`.
+            policy (str): Name of an entry in CACHE_POLICIES.
+            response (str): Filtered LLM response.
+        """
+        rules = CACHE_POLICIES[policy]
+        now = time.time()
+        with self.lock:
+            if not self.max_entries:
+                return
+            variants = [row[0] for row in self.conn.execute(
+                "SELECT variant FROM llm_cache WHERE key = ? ORDER BY variant", (key,)
+            )]
+            if rules["mode"] == "exact":
+                variant = 0
+            elif len(variants) < rules["variants"]:
+                variant = next(i for i in range(rules["variants"]) if i not in variants)
+            else:
+                return
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, variant, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, variant, response, now, now),
+            )
+            self.evict()
+            self.conn.commit()
+
+    def evict(self):
+        # Drop least recently used rows beyond the size limit (caller holds the lock)
+        self.conn.execute("""
+            DELETE FROM llm_cache WHERE rowid IN (
+                SELECT rowid FROM llm_cache ORDER BY last_access
+                LIMIT MAX(0, (SELECT COUNT(*) FROM llm_cache) - ?)
+            )
+        """, (self.max_entries,))
+
+    def stats(self):
+        """
+        Hit/miss counters per policy since this process started.
+
+        Returns:
+            dict: {policy: {"hits": int, "misses": int, "hit_rate": float}}
+        """
+        with self.lock:
+            result = {}
+            for policy in CACHE_POLICIES:
+                hits = self.hits.get(policy, 0)
+                misses = self.misses.get(policy, 0)
+                total = hits + misses
+                result[policy] = {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+            return result
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache instance; survives Streamlit reruns because modules are imported once."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def set_cache(cache):
+    """Replace the process-wide cache (benchmarks and tools)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
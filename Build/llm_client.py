@@ -0,0 +1,288 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from llm_scheduler import QUESTION, LLMBusyError, LLMScheduler
+
+# Model slots shared by every session in this process. The ollama server runs
+# OLLAMA_NUM_PARALLEL requests at once, so more in-flight calls than that only queue there.
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "2"))
+MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "32"))
+DEFAULT_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "120"))
+# Loading a model's weights can take minutes on a cold start; only warmup calls wait this long
+LOAD_TIMEOUT = float(os.environ.get("LLM_LOAD_TIMEOUT", "900"))
+WAIT_POLL = 0.25  # seconds between queue position updates while a caller waits
+
+
+_STREAM_DONE = object()
+
+
+def _partial_tag(text, tag):
+    # Length of the longest suffix of `text` that could be the start of `tag`
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+def filter_think(chunks, open_tag="<think>", close_tag="</think>"):
+    """
+    Drop `<think>...</think>` blocks from a stream of text chunks as they arrive.
+
+    Tags may be split across chunks; only the few characters that could begin a tag
+    are held back. Leading whitespace before the first visible text is skipped, matching
+    the `.strip()` applied to non-streamed responses.
+
+    Args:
+        chunks (iterable): Text fragments in arrival order.
+
+    Yields:
+        str: Visible text fragments.
+    """
+    buffer = ""
+    inside = False
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        while buffer:
+            if inside:
+                end = buffer.find(close_tag)
+                if end == -1:
+                    buffer = buffer[len(buffer) - _partial_tag(buffer, close_tag):]
+                    break
+                buffer = buffer[end + len(close_tag):]
+                inside = False
+            else:
+                start = buffer.find(open_tag)
+                if start == -1:
+                    keep = _partial_tag(buffer, open_tag)
+                    visible, buffer = buffer[:len(buffer) - keep], buffer[len(buffer) - keep:]
+                else:
+                    visible, buffer = buffer[:start], buffer[start + len(open_tag):]
+                    inside = True
+                if not started:
+                    visible = visible.lstrip()
+                if visible:
+                    started = True
+                    yield visible
+                if start == -1:
+                    break
+    if buffer and not inside:
+        visible = buffer if started else buffer.lstrip()
+        if visible:
+            yield visible
+
+
+class LLMClient:
+    """
+    Shared ollama client with a fixed number of model slots.
+
+    One `ollama.Client` keeps its HTTP connections alive across calls. At most
+    `max_concurrency` requests run at once; up to `max_queue` more wait in line, most
+    urgent class first and taking turns between users (see LLMScheduler). Anything
+    beyond that evicts queued background work or is rejected immediately rather than
+    piling onto the server.
+    """
+
+    def __init__(self, host=None, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE, timeout=DEFAULT_TIMEOUT, client=None,
+                 load_timeout=LOAD_TIMEOUT):
+        # `client` may be any object with ollama.Client's generate() (e.g. the benchmark's fake)
+        loader = client
+        if client is None:
+            import ollama  # Pulls in httpx; tools that never call the model skip it
+            client = ollama.Client(host=host, timeout=timeout)
+            loader = ollama.Client(host=host, timeout=load_timeout)
+        self.client = client
+        self.loader = loader  # Same server, but waits out a cold model load (see ModelWarmer)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.scheduler = LLMScheduler(max_concurrency, max_queue)
+        # model -> keep_alive sent with every request; without it each call resets the server default (5m)
+        self.keep_alive = {}
+
+    def submit(self, fn, *args, priority=QUESTION, user=None, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)` on a model slot.
+
+        Args:
+            priority (int): Class from llm_scheduler; lower runs first.
+            user (str, optional): Whose call this is, for fair turns within a class.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the return value of `fn`.
+
+        Raises:
+            LLMBusyError: If the queue is full of work at least as urgent.
+        """
+        return self.scheduler.submit(fn, *args, priority=priority, user=user, **kwargs)
+
+    def _wait_turn(self, future, on_wait, deadline):
+        # Report the caller's place in line until the call starts (or fails while queued)
+        if on_wait is None:
+            return
+        while not future.done():
+            position = self.scheduler.position(future)
+            if position is None:
+                break
+            on_wait(position)
+            if time.monotonic() >= deadline:
+                break
+            try:
+                future.exception(timeout=min(WAIT_POLL, max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                pass
+        on_wait(None)
+
+    def generate(self, model, prompt, options=None, timeout=None, format="", priority=QUESTION, user=None,
+                 on_wait=None):
+        """
+        Run a generate call through the pool and wait for it.
+
+        Args:
+            model (str): Model name.
+            prompt (str): Full prompt text.
+            options (dict, optional): ollama generation options.
+            timeout (float, optional): Seconds to wait, including time spent queued.
+            format (str, optional): "json" to constrain the reply to valid JSON.
+            priority (int): Class from llm_scheduler; lower runs first.
+            user (str, optional): Whose call this is, for fair turns within a class.
+            on_wait (callable, optional): Called with the 1-based queue position while
+                the call waits for a slot, then with None once it starts.
+
+        Returns:
+            dict: The ollama response.
+
+        Raises:
+            LLMBusyError: If the queue is full, or the call was evicted for more urgent work.
+            TimeoutError: If no slot produced a result in time.
+        """
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        future = self.generate_async(model, prompt, options, format, priority, user)
+        try:
+            self._wait_turn(future, on_wait, deadline)
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()  # Frees the queue entry; a running call ends at the HTTP timeout
+            raise TimeoutError(f"LLM call to {model} timed out after {timeout}s")
+
+    def generate_async(self, model, prompt, options=None, format="", priority=QUESTION, user=None):
+        """
+        Queue a generate call without waiting for it; see generate.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the ollama response. Cancelling it while
+            queued frees its place.
+        """
+        return self.submit(self.client.generate, model=model, prompt=prompt, options=options, format=format,
+                           keep_alive=self.keep_alive.get(model), priority=priority, user=user)
+
+    def embed(self, model, texts, timeout=None, priority=QUESTION, user=None):
+        """
+        Embed `texts` with an embedding model through the pool.
+
+        Returns:
+            list: One vector (list of floats) per text.
+
+        Raises:
+            LLMBusyError: If the queue is full, or the call was evicted for more urgent work.
+            TimeoutError: If no slot produced a result in time.
+        """
+        future = self.submit(self.client.embed, model=model, input=texts, keep_alive=self.keep_alive.get(model),
+                             priority=priority, user=user)
+        try:
+            return future.result(timeout=timeout or self.timeout)["embeddings"]
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"Embedding call to {model} timed out after {timeout or self.timeout}s")
+
+    def stream(self, model, prompt, options=None, timeout=None, on_done=None, format="", priority=QUESTION,
+               user=None, on_wait=None):
+        """
+        Stream a generate call through the pool, yielding raw response fragments.
+
+        The request holds a model slot until the stream ends or the consumer stops
+        iterating. `timeout` bounds the wait for each fragment, including the first.
+        `on_done`, if given, is called with the final response part (token counts, durations).
+        `priority`, `user` and `on_wait` are as for `generate`.
+
+        Raises:
+            LLMBusyError: If the queue is full, or the call was evicted for more urgent work.
+            TimeoutError: If the next fragment does not arrive in time.
+        """
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def run():
+            try:
+                for part in self.client.generate(model=model, prompt=prompt, options=options, format=format,
+                                                 keep_alive=self.keep_alive.get(model), stream=True):
+                    if stop.is_set():
+                        break
+                    chunks.put(part["response"])
+                    if part.get("done") and on_done:
+                        on_done(part)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_STREAM_DONE)
+
+        def evicted(future):
+            # Failed while queued (preempted): `run` never starts, so end the stream here
+            if not future.cancelled() and future.exception() is not None:
+                chunks.put(future.exception())
+
+        future = self.submit(run, priority=priority, user=user)
+        future.add_done_callback(evicted)
+        try:
+            self._wait_turn(future, on_wait, time.monotonic() + (timeout or self.timeout))
+            while True:
+                try:
+                    item = chunks.get(timeout=timeout or self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"LLM stream from {model} stalled for {timeout or self.timeout}s")
+                if item is _STREAM_DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            future.cancel()
+
+    def stats(self):
+        """
+        Returns:
+            dict: slots, in_flight and queued, plus per priority class queue depth,
+            wait percentiles and eviction counts (see LLMScheduler.stats).
+        """
+        scheduled = self.scheduler.stats()
+        return {
+            "slots": self.max_concurrency,
+            "in_flight": scheduled["running"],
+            "queued": scheduled["queued"],
+            "classes": scheduled["classes"],
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client, shared by all sessions and Streamlit reruns."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+
+def set_client(client):
+    """Replace the process-wide client (benchmarks and tools)."""
+    global _client
+    with _client_lock:
+        _client = client
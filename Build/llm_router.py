@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from metrics import REGISTRY
+
+DEFAULT_MODEL = "deepseek-r1"
+# route -> models tried in order. Routes are the call sites' cache policies: "question"
+# (generate_question), "evaluation" (evaluate_response) and "summary" (round summaries
+# and generate_final_evaluation).
+DEFAULT_ROUTES = {
+    "question": [DEFAULT_MODEL],
+    "evaluation": [DEFAULT_MODEL],
+    "summary": [DEFAULT_MODEL],
+}
+FAILURE_COOLDOWN = 30  # seconds a model that just failed is skipped while a fallback exists
+STATS_WINDOW = 200  # Latest calls kept per route and model for percentiles
+
+logger = logging.getLogger(__name__)
+
+# options are merged over the caller's base options; timeout None means the client default
+Target = namedtuple("Target", "model options timeout")
+
+
+def parse_routes(config):
+    """
+    Normalize a routes config.
+
+    Args:
+        config (dict): {route: [entry, ...]}, where an entry is a model name or
+            {"model": str, "options": dict, "timeout": float}. A single entry may be
+            given without the list.
+
+    Returns:
+        dict: {route: [Target, ...]}
+    """
+    routes = {}
+    for route, entries in config.items():
+        if isinstance(entries, (str, dict)):
+            entries = [entries]
+        targets = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"model": entry}
+            targets.append(Target(entry["model"], dict(entry.get("options") or {}), entry.get("timeout")))
+        if not targets:
+            raise ValueError(f"Route {route!r} has no models")
+        routes[route] = targets
+    return routes
+
+
+def load_routes():
+    """
+    Routes from LLM_ROUTES (inline JSON or a path to a JSON file) over DEFAULT_ROUTES.
+
+    e.g. LLM_ROUTES='{"question": [{"model": "llama3.2:3b", "timeout": 20}, "deepseek-r1"]}'
+    """
+    config = dict(DEFAULT_ROUTES)
+    raw = os.environ.get("LLM_ROUTES", "").strip()
+    if raw:
+        if not raw.startswith("{"):
+            with open(raw) as f:
+                raw = f.read()
+        config.update(json.loads(raw))
+    return parse_routes(config)
+
+
+class ModelRouter:
+    """
+    Picks the model chain for each call site and tracks how each model performs there.
+
+    A model that fails (error or timeout) is skipped for FAILURE_COOLDOWN seconds in
+    every chain that has another model, so a down or overloaded model costs one
+    failed call rather than one per request.
+
+    Args:
+        routes (dict, optional): {route: [Target, ...]}; defaults to `load_routes()`.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes if routes is not None else load_routes()
+        self.lock = threading.Lock()
+        self.down_until = {}
+        self.samples = {}  # (route, model) -> deque of recent successful call seconds
+        self.counts = {}  # (route, model) -> [calls, errors]
+
+    def chain(self, route, model=None):
+        """
+        Models to try for `route`, in order.
+
+        Args:
+            route (str): Call site.
+            model (str, optional): Caller's explicit choice; bypasses routing.
+
+        Returns:
+            list: Targets, with recently failed models left out unless nothing else is left.
+        """
+        if model:
+            return [Target(model, {}, None)]
+        targets = self.routes.get(route) or [Target(DEFAULT_MODEL, {}, None)]
+        now = time.monotonic()
+        with self.lock:
+            healthy = [t for t in targets if self.down_until.get(t.model, 0) <= now]
+        return healthy or targets
+
+    def record(self, route, model, seconds, ok):
+        """Record one call; a failure puts the model on cooldown."""
+        REGISTRY.observe("llm_route_seconds", seconds, help="LLM call time by route, model and outcome.",
+                         route=route, model=model, outcome="ok" if ok else "error")
+        with self.lock:
+            counts = self.counts.setdefault((route, model), [0, 0])
+            counts[0] += 1
+            if ok:
+                self.samples.setdefault((route, model), deque(maxlen=STATS_WINDOW)).append(seconds)
+                self.down_until.pop(model, None)
+            else:
+                counts[1] += 1
+                self.down_until[model] = time.monotonic() + FAILURE_COOLDOWN
+        if not ok:
+            logger.warning("Model %s failed on route %s; falling back for %ds", model, route, FAILURE_COOLDOWN)
+
+    def models(self):
+        """Every routed model, each route's first choice before any fallback."""
+        ordered = []
+        depth = max((len(targets) for targets in self.routes.values()), default=0)
+        for i in range(depth):
+            for targets in self.routes.values():
+                if i < len(targets) and targets[i].model not in ordered:
+                    ordered.append(targets[i].model)
+        return ordered
+
+    def stats(self):
+        """
+        Returns:
+            dict: {route: {model: {"calls", "errors", "p50", "p95"}}}, latencies in seconds
+            over the last STATS_WINDOW successful calls.
+        """
+        with self.lock:
+            counts = {key: list(value) for key, value in self.counts.items()}
+            samples = {key: sorted(value) for key, value in self.samples.items()}
+        result = {}
+        for (route, model), (calls, errors) in sorted(counts.items()):
+            values = samples.get((route, model), [])
+            result.setdefault(route, {})[model] = {
+                "calls": calls,
+                "errors": errors,
+                "p50": values[(len(values) - 1) // 2] if values else None,
+                "p95": values[max(0, -(-len(values) * 95 // 100) - 1)] if values else None,
+            }
+        return result
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Process-wide router built from LLM_ROUTES."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
+
+
+def set_router(router):
+    """Replace the process-wide router (benchmarks and tools)."""
+    global _router
+    with _router_lock:
+        _router = router
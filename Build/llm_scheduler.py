@@ -0,0 +1,213 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from metrics import REGISTRY
+
+# Priority classes, most urgent first
+INTERACTIVE = 0  # Scoring an answer the candidate just submitted
+SUMMARY = 1  # Round summaries and the final evaluation
+QUESTION = 2  # The next question, when no prefetched one is ready
+BACKGROUND = 3  # Speculative prefetch and question-bank fills
+PRIORITY_NAMES = ("interactive", "summary", "question", "background")
+# Default class for each call site (see llm_router)
+ROUTE_PRIORITY = {"evaluation": INTERACTIVE, "summary": SUMMARY, "question": QUESTION}
+WAIT_WINDOW = 500  # Latest queue waits kept per class for percentiles
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBusyError(RuntimeError):
+    """Raised when the request queue is full and new work is turned away."""
+
+
+class _Task:
+    __slots__ = ("future", "fn", "args", "kwargs", "priority", "user", "seq", "enqueued")
+
+    def __init__(self, future, fn, args, kwargs, priority, user, seq):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.user = user
+        self.seq = seq
+        self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+    """
+    Runs LLM calls on a fixed number of worker threads, most urgent class first.
+
+    Within a class, users take turns: each user's calls run in order, but one user
+    with many queued calls cannot hold back another's. When the queue is full, a
+    more urgent call evicts the newest queued BACKGROUND call (which fails with
+    LLMBusyError), and is only rejected itself if none is waiting. Calls a candidate
+    is waiting on are never evicted.
+
+    Args:
+        workers (int): Calls running at once.
+        max_queue (int): Calls allowed to wait.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cond = threading.Condition()
+        self.queues = [OrderedDict() for _ in PRIORITY_NAMES]  # class -> {user: deque of tasks}
+        self.tasks = {}  # future -> queued task
+        self.running = 0
+        self.seq = itertools.count()
+        self.waits = [deque(maxlen=WAIT_WINDOW) for _ in PRIORITY_NAMES]
+        self.preempted = [0] * len(PRIORITY_NAMES)
+        self.rejected = [0] * len(PRIORITY_NAMES)
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"llm-slot-{i}", daemon=True).start()
+
+    def submit(self, fn, *args, priority=QUESTION, user=None, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)`.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the return value of `fn`. Cancelling
+            it while queued frees its place.
+
+        Raises:
+            LLMBusyError: If the queue is full of work at least as urgent.
+        """
+        future = Future()
+        with self.cond:
+            if len(self.tasks) >= self.max_queue and not self._evict_below(priority):
+                self.rejected[priority] += 1
+                REGISTRY.inc("llm_rejected_total", help="LLM calls turned away because the queue was full.",
+                             priority=PRIORITY_NAMES[priority])
+                raise LLMBusyError(f"LLM queue full ({len(self.tasks)} requests waiting)")
+            task = _Task(future, fn, args, kwargs, priority, user, next(self.seq))
+            self.queues[priority].setdefault(user, deque()).append(task)
+            self.tasks[future] = task
+            self.cond.notify()
+        future.add_done_callback(self._discard)
+        return future
+
+    def _evict_below(self, priority):
+        # Called with the lock held: fail the newest queued BACKGROUND call. Only speculative work
+        # is evicted; a live question or summary a candidate waits on would surface as an error.
+        if priority >= BACKGROUND or not self.queues[BACKGROUND]:
+            return False
+        victim = max((tasks[-1] for tasks in self.queues[BACKGROUND].values()), key=lambda task: task.seq)
+        self._remove(victim)
+        self.preempted[BACKGROUND] += 1
+        REGISTRY.inc("llm_preempted_total", help="Queued LLM calls evicted for more urgent work.",
+                     priority=PRIORITY_NAMES[BACKGROUND])
+        victim.future.set_exception(LLMBusyError("Preempted by more urgent work"))
+        return True
+
+    def _remove(self, task):
+        users = self.queues[task.priority]
+        users[task.user].remove(task)
+        if not users[task.user]:
+            del users[task.user]
+        del self.tasks[task.future]
+
+    def _discard(self, future):
+        # A call cancelled (or preempted) while queued gives its place back
+        with self.cond:
+            task = self.tasks.get(future)
+            if task is not None:
+                self._remove(task)
+
+    def promote(self, user, priority):
+        """
+        Move `user`'s queued calls of a less urgent class up to `priority`, e.g. a
+        prefetch the candidate is now waiting on.
+
+        Returns:
+            int: Calls moved.
+        """
+        moved = 0
+        with self.cond:
+            for lower in range(priority + 1, len(PRIORITY_NAMES)):
+                tasks = self.queues[lower].pop(user, None)
+                if not tasks:
+                    continue
+                for task in tasks:
+                    task.priority = priority
+                self.queues[priority].setdefault(user, deque()).extend(tasks)
+                moved += len(tasks)
+        return moved
+
+    def _next(self):
+        for priority, users in enumerate(self.queues):
+            if users:
+                user, tasks = next(iter(users.items()))
+                task = tasks.popleft()
+                del users[user]
+                if tasks:
+                    users[user] = tasks  # Back of the line for this class
+                del self.tasks[task.future]
+                return task
+        return None
+
+    def _work(self):
+        while True:
+            with self.cond:
+                task = self._next()
+                while task is None:
+                    self.cond.wait()
+                    task = self._next()
+                self.running += 1
+            waited = time.monotonic() - task.enqueued
+            REGISTRY.observe("llm_queue_wait_seconds", waited, help="Time LLM calls spent queued, by priority class.",
+                             priority=PRIORITY_NAMES[task.priority])
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    self.waits[task.priority].append(waited)
+                    try:
+                        task.future.set_result(task.fn(*task.args, **task.kwargs))
+                    except BaseException as e:
+                        task.future.set_exception(e)
+            finally:
+                with self.cond:
+                    self.running -= 1
+
+    def position(self, future):
+        """
+        Returns:
+            int or None: 1 if `future` runs next, 2 if one call is ahead of it, ...;
+            None once it is running or done.
+        """
+        with self.cond:
+            task = self.tasks.get(future)
+            if task is None:
+                return None
+            ahead = sum(len(tasks) for users in self.queues[:task.priority] for tasks in users.values())
+            # Same class: users ahead in the rotation each get one call per turn before this user's next
+            turn = list(self.queues[task.priority]).index(task.user)
+            own = self.queues[task.priority][task.user].index(task)
+            for i, tasks in enumerate(self.queues[task.priority].values()):
+                ahead += min(len(tasks), own + (1 if i < turn else 0))
+            return ahead + 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: running, queued, and per class: queued, wait p50/p95 (seconds),
+            preempted and rejected counts.
+        """
+        with self.cond:
+            queued = [sum(len(tasks) for tasks in users.values()) for users in self.queues]
+            waits = [sorted(w) for w in self.waits]
+            result = {"running": self.running, "queued": sum(queued), "classes": {}}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                values = waits[priority]
+                result["classes"][name] = {
+                    "queued": queued[priority],
+                    "wait_p50": values[(len(values) - 1) // 2] if values else None,
+                    "wait_p95": values[max(0, -(-len(values) * 95 // 100) - 1)] if values else None,
+                    "preempted": self.preempted[priority],
+                    "rejected": self.rejected[priority],
+                }
+        return result
@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+
+from llm_client import get_client
+from llm_router import get_router
+from llm_scheduler import BACKGROUND
+from metrics import REGISTRY
+
+# Models in priority order; the first one serves interviews and is never unloaded.
+# Defaults to every model the router uses, each route's first choice ahead of its fallbacks.
+MODELS = [m.strip() for m in os.environ.get("LLM_MODELS", "").split(",") if m.strip()] or get_router().models()
+PINNED_KEEP_ALIVE = -1  # ollama: keep loaded until the server restarts
+KEEP_ALIVE = os.environ.get("LLM_KEEP_ALIVE", "30m")  # Lower-priority models
+REFRESH_INTERVAL = 60  # seconds between checks that every model is still loaded
+WARMUP_PROMPT = "Reply with OK."
+
+logger = logging.getLogger(__name__)
+
+
+def keep_alive_for(priority):
+    return PINNED_KEEP_ALIVE if priority == 0 else KEEP_ALIVE
+
+
+def _tagged(model):
+    # `ollama ps` reports "deepseek-r1:latest" for a model requested as "deepseek-r1"
+    return model if ":" in model else f"{model}:latest"
+
+
+class ModelWarmer:
+    """
+    Loads the configured models ahead of the first interview and keeps them loaded.
+
+    Each model is loaded with an empty prompt (ollama's preload) and then given a
+    one-token generate, so the first real question does not pay for loading weights or
+    compiling kernels. Every request the shared client sends carries the model's
+    keep_alive, the highest-priority model pinned, and a background check reloads,
+    highest priority first, any model the server has evicted.
+
+    Args:
+        client (LLMClient): Shared client; its keep_alive map is filled in here.
+        models (list): Model names, highest priority first.
+        interval (float): Seconds between residency checks.
+    """
+
+    def __init__(self, client, models=MODELS, interval=REFRESH_INTERVAL):
+        self.client = client
+        self.models = list(models)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.state = {model: {"ready": False, "load_seconds": None, "error": None} for model in self.models}
+        for priority, model in enumerate(self.models):
+            client.keep_alive[model] = keep_alive_for(priority)
+
+    def warm(self, model):
+        """Load `model` and run a one-token generate; records how long it took."""
+        keep_alive = self.client.keep_alive.get(model)
+        started = time.perf_counter()
+        try:
+            # Takes a model slot like any other call, but through the loader client: a cold load can
+            # outlast the normal per-call timeout, and only LOAD_TIMEOUT bounds the wait
+            self.client.submit(self._load, model, keep_alive, priority=BACKGROUND).result()
+        except Exception as e:
+            logger.warning("Could not warm up %s: %s", model, e)
+            with self.lock:
+                self.state[model].update(ready=False, error=str(e))
+            return False
+        elapsed = time.perf_counter() - started
+        REGISTRY.observe("llm_model_warmup_seconds", elapsed, help="Time to load and warm up a model.", model=model)
+        with self.lock:
+            self.state[model].update(ready=True, load_seconds=elapsed, error=None)
+        logger.info("Model %s ready after %.1fs", model, elapsed)
+        return True
+
+    def _load(self, model, keep_alive):
+        loader = self.client.loader
+        loader.generate(model=model, prompt="", keep_alive=keep_alive)
+        loader.generate(model=model, prompt=WARMUP_PROMPT, options={"num_predict": 1}, keep_alive=keep_alive)
+
+    def loaded_models(self):
+        """
+        Returns:
+            set or None: Models the server has in memory, or None if it cannot be asked.
+        """
+        try:
+            running = self.client.client.ps().get("models", [])
+        except Exception as e:
+            logger.warning("Could not list loaded models: %s", e)
+            return None
+        return {m.get("name") or m.get("model") for m in running}
+
+    def refresh(self):
+        """Reload, highest priority first, every model the server no longer holds."""
+        loaded = self.loaded_models()
+        for model in self.models:
+            if loaded is not None and _tagged(model) in loaded:
+                continue
+            if loaded is not None and self.state[model]["ready"]:
+                REGISTRY.inc("llm_model_reloads_total", help="Models found unloaded and loaded again.", model=model)
+                logger.info("Model %s was unloaded; loading it again", model)
+            with self.lock:
+                self.state[model]["ready"] = False
+            self.warm(model)
+
+    def run(self):
+        for model in self.models:
+            self.warm(model)
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Model keep-alive check failed")
+
+    def status(self):
+        """
+        Returns:
+            dict: {model: {"ready", "load_seconds", "error"}} in priority order.
+        """
+        with self.lock:
+            return {model: dict(self.state[model]) for model in self.models}
+
+    def ready(self):
+        """True once the highest-priority model has been loaded and warmed up."""
+        with self.lock:
+            return bool(self.models) and self.state[self.models[0]]["ready"]
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_warmup(models=MODELS, interval=REFRESH_INTERVAL):
+    """Start warming `models` in the background once per process; later calls return the same warmer."""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = ModelWarmer(get_client(), models, interval)
+            threading.Thread(target=_warmer.run, name="llm-warmup", daemon=True).start()
+        return _warmer
+
+
+def get_warmer():
+    """The running warmer, or None if start_warmup has not been called in this process."""
+    return _warmer
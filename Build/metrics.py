@@ -0,0 +1,213 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_FILE = os.environ.get("METRICS_FILE")  # e.g. a node_exporter textfile collector path
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))  # serve /metrics on this port when set
+METRICS_INTERVAL = 15  # seconds between text file writes
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+logger = logging.getLogger(__name__)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Registry:
+    """Thread-safe counters and histograms rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = {}  # name -> {label_key: value}
+        self.histograms = {}  # name -> {label_key: [bucket counts..., sum, count]}
+        self.buckets = {}
+
+    def inc(self, name, value=1, help="", **labels):
+        with self.lock:
+            self.help.setdefault(name, help)
+            series = self.counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, help="", **labels):
+        with self.lock:
+            self.help.setdefault(name, help)
+            self.buckets.setdefault(name, buckets)
+            series = self.histograms.setdefault(name, {})
+            key = _label_key(labels)
+            data = series.get(key)
+            if data is None:
+                data = series[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets[name]):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                buckets = self.buckets[name]
+                lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, data in sorted(series.items()):
+                    for bound, count in zip(buckets, data):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {data[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {data[-2]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {data[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Spans finished on the current thread are also appended here while a trace is active
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace():
+    """
+    Collect spans finished on this thread (e.g. one Streamlit rerun).
+
+    Returns:
+        list: Filled with (span name, seconds) tuples as spans complete.
+    """
+    trace = []
+    _trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block into `interview_span_seconds{span=name}` and count its failures."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REGISTRY.inc("interview_span_errors_total", help="Spans that raised an exception.", span=name, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        REGISTRY.observe("interview_span_seconds", elapsed, help="Wall time of instrumented code paths.",
+                         span=name, **labels)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+
+def timed(name):
+    """Decorator form of `span`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_response(response, model, route):
+    """
+    Record token counts and model-side timings reported by ollama.
+
+    Args:
+        response (dict): Final (or only) ollama response object.
+        model (str): Model name.
+        route (str): Call site, e.g. "question" or "evaluation".
+    """
+    prompt_tokens = response.get("prompt_eval_count") or 0
+    eval_tokens = response.get("eval_count") or 0
+    eval_seconds = (response.get("eval_duration") or 0) / 1e9
+    REGISTRY.inc("llm_prompt_tokens_total", prompt_tokens, help="Prompt tokens evaluated by the model.",
+                 model=model, route=route)
+    REGISTRY.inc("llm_eval_tokens_total", eval_tokens, help="Tokens generated by the model.",
+                 model=model, route=route)
+    REGISTRY.observe("llm_eval_seconds", eval_seconds, help="Model-reported generation time (eval_duration).",
+                     model=model, route=route)
+    if eval_seconds:
+        REGISTRY.observe("llm_tokens_per_second", eval_tokens / eval_seconds,
+                         buckets=(1, 5, 10, 20, 40, 80, 160, 320), help="Generation speed reported by the model.",
+                         model=model, route=route)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood stderr
+
+
+def _write_file_forever(path, interval):
+    while True:
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(REGISTRY.render())
+            os.replace(tmp_path, path)  # Collectors never see a half-written file
+        except OSError:
+            logger.exception("Could not write metrics to %s", path)
+        time.sleep(interval)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters(file_path=METRICS_FILE, port=METRICS_PORT, interval=METRICS_INTERVAL):
+    """
+    Start the text-file writer and/or the HTTP /metrics endpoint once per process.
+
+    Args:
+        file_path (str, optional): Rewrite this file every `interval` seconds.
+        port (int, optional): Serve http://0.0.0.0:<port>/metrics.
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if file_path:
+        threading.Thread(target=_write_file_forever, args=(file_path, interval),
+                         name="metrics-file", daemon=True).start()
+    if port:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
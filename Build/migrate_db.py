@@ -0,0 +1,81 @@
+import argparse
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from storage import init_db, update_leaderboard
+
+# Longest allowed interview; answers further apart than this cannot share a session
+MAX_SESSION_GAP = timedelta(minutes=60)
+
+
+def _close_session(conn, group):
+    first, last = group[0], group[-1]
+    total_score, selected = last[3], last[4]
+    ended_at = last[5] if total_score is not None else None
+    c = conn.execute(
+        "INSERT INTO sessions (username, job_role, started_at, ended_at, total_score, selected) VALUES (?, ?, ?, ?, ?, ?)",
+        (first[1], first[2], first[5], ended_at, total_score, selected),
+    )
+    session_id = c.lastrowid
+    conn.executemany("UPDATE interviews SET session_id = ? WHERE id = ?", [(session_id, row[0]) for row in group])
+    if total_score is not None:
+        update_leaderboard(conn, session_id, first[1], first[2], total_score, ended_at)
+    return total_score is not None
+
+
+def migrate(db_path="interviews.db"):
+    """
+    Move answer rows written before the sessions table existed into sessions.
+
+    Legacy rows carry the final score on every answer, so consecutive answers of the
+    same user and role with the same total_score/selected (and no gap longer than an
+    interview) are treated as one session. Two back-to-back attempts with identical
+    totals cannot be told apart and end up merged. Rows that already have a
+    session_id are left alone, so the migration can be re-run safely.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+    """
+    if not Path(db_path).exists():
+        print(f"Error: Database file '{db_path}' does not exist.")
+        return
+
+    conn = sqlite3.connect(db_path)
+    init_db(conn)  # Adds sessions, leaderboard and interviews.session_id if missing
+    rows = conn.execute("""
+        SELECT id, username, job_role, total_score, selected, timestamp
+        FROM interviews
+        WHERE session_id IS NULL
+        ORDER BY username, job_role, id
+    """).fetchall()
+
+    sessions = completed = answers = 0
+    group = []
+    with conn:
+        for row in rows:
+            if group:
+                prev = group[-1]
+                same_attempt = (
+                    prev[1:5] == row[1:5]
+                    and datetime.fromisoformat(row[5]) - datetime.fromisoformat(prev[5]) <= MAX_SESSION_GAP
+                )
+                if not same_attempt:
+                    completed += _close_session(conn, group)
+                    sessions += 1
+                    group = []
+            group.append(row)
+            answers += 1
+        if group:
+            completed += _close_session(conn, group)
+            sessions += 1
+    conn.close()
+
+    print(f"Migrated {answers} answers into {sessions} sessions ({completed} completed).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate interviews.db to the session-based schema.")
+    parser.add_argument("db_path", nargs="?", default="interviews.db", help="Path to the SQLite database file")
+    args = parser.parse_args()
+    migrate(args.db_path)
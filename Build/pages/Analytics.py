@@ -0,0 +1,52 @@
+import pandas as pd
+import streamlit as st
+
+import analytics
+from analytics import MAX_SCORE, MAX_TOTAL, PERCENTILES
+
+# Summary tables are folded in at most once a minute; every view after that is a few small reads
+@st.cache_data(ttl=60)
+def refresh_summaries():
+    return analytics.refresh()
+
+@st.cache_data(ttl=60)
+def load_role(role_key):
+    return (analytics.total_distribution(role_key), analytics.score_distributions(role_key),
+            analytics.question_calibration(role_key))
+
+st.title("📊 Interview Analytics")
+refresh_summaries()
+roles = analytics.roles()
+if not roles:
+    st.info("No completed interviews yet.")
+    st.stop()
+
+role_key = st.selectbox("Job Role", roles)
+totals, distributions, calibration = load_role(role_key)
+
+st.subheader("Final Scores")
+st.caption(f"{totals.sum()} completed interviews · " + " · ".join(
+    f"p{p}: {value:.0f}" for p, value in zip(PERCENTILES, analytics.percentiles_from_histogram(totals))
+))
+st.bar_chart(pd.DataFrame({"Interviews": totals}, index=pd.RangeIndex(MAX_TOTAL + 1, name="Score")))
+
+st.subheader("Question Scores by Topic and Difficulty")
+st.dataframe(pd.DataFrame([
+    {"Topic": topic, "Difficulty": difficulty, "Answers": stats["answers"], "Mean": round(stats["mean"], 2),
+     **{f"p{p}": value for p, value in zip(PERCENTILES, stats["percentiles"])}}
+    for (topic, difficulty), stats in distributions.items()
+]), hide_index=True, use_container_width=True)
+if distributions:
+    st.bar_chart(pd.DataFrame(
+        {f"{topic} / {difficulty}": stats["counts"] for (topic, difficulty), stats in distributions.items()},
+        index=pd.RangeIndex(MAX_SCORE + 1, name="Score"),
+    ))
+
+st.subheader("Question Calibration")
+verdicts = st.multiselect("Show", ["too easy", "too hard", "weak discrimination", "ok"],
+                          default=["too easy", "too hard", "weak discrimination"])
+rows = [q for q in calibration if q["verdict"] in verdicts]
+if rows:
+    st.dataframe(pd.DataFrame(rows).rename(columns=str.title), hide_index=True, use_container_width=True)
+else:
+    st.write(f"No questions with at least {analytics.MIN_ANSWERS} answers match.")
@@ -0,0 +1,114 @@
+import argparse
+import hashlib
+import logging
+import re
+from collections import namedtuple
+
+from tabulate import tabulate
+
+import storage
+from metrics import REGISTRY
+from question_bank import question_hash
+
+RESTATED_OVERLAP = 0.9  # Share of an answer's words taken from the question that makes it a copy
+RESTATED_COVERAGE = 0.8  # Share of the question's words a copy contains
+# Whole answers that say the candidate is skipping the question; anything longer goes to the LLM,
+# however terse ("Tuple, immutable." can be a correct answer)
+SKIP_PHRASES = {
+    "idk", "i dont know", "i do not know", "dont know", "dunno", "no idea", "pass", "skip", "n a", "na", "todo",
+    "tbd",
+}
+
+# reason: "empty", "skipped" or "restates_question" (scored here, no bonuses) or
+# "duplicate" (the earlier LLM score, still subject to the usual bonuses)
+PreScore = namedtuple("PreScore", "score explanation reason")
+
+_WORD = re.compile(r"[a-z0-9_']+")
+_FENCED = re.compile(r"```[a-z]*\n?(.*?)(?:```|\Z)", re.IGNORECASE | re.DOTALL)
+_COMMENT = re.compile(r"#.*$", re.MULTILINE)
+
+logger = logging.getLogger(__name__)
+
+
+def answer_hash(question, answer):
+    # The question is normalized like the question bank's; the answer must match exactly
+    return hashlib.sha1(f"{question_hash(question)}\x1f{answer.strip()}".encode("utf-8")).hexdigest()
+
+
+def _words(text):
+    # Comments are dropped from fenced code only: "C# uses ..." in prose keeps its words
+    text = _FENCED.sub(lambda code: " " + _COMMENT.sub("", code.group(1)) + " ", text)
+    return _WORD.findall(text.lower())
+
+
+def prescore(question, answer):
+    """
+    Score an answer without the LLM when the outcome is obvious.
+
+    Catches empty answers (empty or comment-only code blocks included), answers that
+    only say the candidate skips ("idk", "pass"), answers that paste the question back,
+    and answers identical to one the LLM already scored for the same question. Any other
+    answer, however short, goes to the LLM.
+
+    Args:
+        question (str): Question as shown to the candidate.
+        answer (str): Submitted answer, including any code.
+
+    Returns:
+        PreScore or None: None if the answer needs a real evaluation.
+    """
+    words = _words(answer)
+    if not words:
+        return PreScore(0, "No answer was submitted, give the next one a try!", "empty")
+    if " ".join(word.replace("'", "") for word in words) in SKIP_PHRASES:
+        return PreScore(1, "Skipped, give the next one a try!", "skipped")
+    question_words = set(_words(question))
+    new_words = [word for word in words if word not in question_words]
+    if (question_words and 1 - len(new_words) / len(words) >= RESTATED_OVERLAP
+            and len(question_words & set(words)) >= RESTATED_COVERAGE * len(question_words)):
+        return PreScore(0, "That repeats the question, tell us how you would answer it!", "restates_question")
+    earlier = storage.fetch_scored_answer(answer_hash(question, answer))
+    if earlier:
+        return PreScore(earlier[0], earlier[1], "duplicate")
+    return None
+
+
+def remember(question, answer, score, explanation):
+    """Index an LLM-scored answer so an identical later submission can reuse the score."""
+    storage.save_scored_answer(answer_hash(question, answer), score, explanation)
+
+
+def record_shortcut(session_id, username, job_role, question, answer, result):
+    """Log, count and store one skipped LLM evaluation for later audit."""
+    logger.info("Evaluation shortcut (%s, score %s) for session %s", result.reason, result.score, session_id)
+    REGISTRY.inc("evaluation_shortcuts_total", help="Evaluations answered without the LLM, by reason.",
+                 reason=result.reason)
+    storage.save_evaluation_shortcut(session_id, username, job_role, question, answer, result.reason, result.score)
+
+
+def print_audit(limit=20):
+    storage.flush()
+    with storage.get_pool().connection() as conn:
+        counts = conn.execute("""
+            SELECT reason, COUNT(*), AVG(score) FROM evaluation_shortcuts GROUP BY reason ORDER BY COUNT(*) DESC
+        """).fetchall()
+        recent = conn.execute("""
+            SELECT created_at, session_id, username, reason, score, substr(answer, 1, 60) FROM evaluation_shortcuts
+            ORDER BY id DESC LIMIT ?
+        """, (limit,)).fetchall()
+    if not counts:
+        print("No evaluations have been shortcut.")
+        return
+    print(tabulate(counts, headers=["Reason", "Count", "Mean Score"], tablefmt="grid"))
+    print(f"\nLatest {len(recent)}:")
+    print(tabulate(recent, headers=["When", "Session", "Username", "Reason", "Score", "Answer"], tablefmt="grid"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit evaluations scored without the LLM.")
+    parser.add_argument("--limit", type=int, default=20, help="Latest shortcuts to list")
+    parser.add_argument("--db", default=storage.DB_PATH, help="Path to the SQLite database file")
+    args = parser.parse_args()
+
+    storage.set_db_path(args.db)
+    print_audit(args.limit)
@@ -0,0 +1,95 @@
+import logging
+import math
+import re
+from collections import namedtuple
+
+from metrics import REGISTRY
+
+CHARS_PER_TOKEN = 3.5  # Conservative for English prose; code and symbols run closer to 3
+NUM_CTX_BUCKETS = (1024, 2048, 4096, 8192)  # Few distinct sizes so ollama can reuse loaded runners
+MIN_SECTION_TOKENS = 48  # A trimmed section always keeps at least this much
+
+# Tokens left free for the reply, <think> block included, per call site
+ROUTE_RESERVE = {"question": 768, "evaluation": 1024, "summary": 1024}
+DEFAULT_RESERVE = 1024
+
+logger = logging.getLogger(__name__)
+
+# `priority` None means the section is never trimmed; lower numbers are trimmed first
+Section = namedtuple("Section", "text priority")
+PromptPlan = namedtuple("PromptPlan", "context prompt num_ctx prompt_tokens dropped_tokens")
+
+
+def estimate_tokens(text):
+    """Rough token count without a tokenizer; errs on the high side."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def compress(text):
+    # Lossless for the model's purposes: trailing spaces, runs of blank lines and indentation tabs
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.replace("\t", "    ").strip()
+
+
+def trim(text, max_tokens):
+    """Keep the head and tail of `text` within about `max_tokens`, marking the cut."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep_chars = int(max_tokens * CHARS_PER_TOKEN)
+    head = text[:keep_chars * 2 // 3]
+    tail = text[len(text) - keep_chars // 3:]
+    return f"{head}\n[... {tokens - max_tokens} tokens trimmed ...]\n{tail}"
+
+
+def plan_prompt(prompt, context="", route="evaluation", reserve=None, buckets=NUM_CTX_BUCKETS):
+    """
+    Assemble context and prompt within the largest context bucket and pick `num_ctx`.
+
+    Args:
+        prompt (str): Instructions; never trimmed.
+        context (str or list): A string, or a list of strings and `Section`s. Plain strings
+            are kept whole; sections are compressed and then trimmed by priority, in
+            proportion to their size, until everything fits.
+        route (str): Call site, used for the reply reserve and metrics.
+        reserve (int, optional): Tokens to leave for the reply; defaults per route.
+        buckets (tuple): Allowed `num_ctx` values, ascending.
+
+    Returns:
+        PromptPlan: Final context text, prompt, chosen num_ctx, estimated prompt tokens and
+        the number of tokens dropped by trimming.
+    """
+    reserve = ROUTE_RESERVE.get(route, DEFAULT_RESERVE) if reserve is None else reserve
+    sections = [Section(part, None) if isinstance(part, str) else part
+                for part in ([context] if isinstance(context, str) else context)]
+    budget = buckets[-1] - reserve - estimate_tokens(prompt)
+    texts = [section.text for section in sections]
+    original = sum(estimate_tokens(text) for text in texts)
+
+    if original > budget:
+        texts = [compress(text) if section.priority is not None else text
+                 for text, section in zip(texts, sections)]
+        for priority in sorted({s.priority for s in sections if s.priority is not None}):
+            excess = sum(estimate_tokens(text) for text in texts) - budget
+            if excess <= 0:
+                break
+            group = [i for i, s in enumerate(sections) if s.priority == priority]
+            group_tokens = sum(estimate_tokens(texts[i]) for i in group)
+            for i in group:
+                tokens = estimate_tokens(texts[i])
+                cut = math.ceil(excess * tokens / group_tokens) if group_tokens else 0
+                texts[i] = trim(texts[i], max(MIN_SECTION_TOKENS, tokens - cut))
+
+    context_text = "\n".join(text for text in texts if text)
+    prompt_tokens = estimate_tokens(context_text) + estimate_tokens(prompt) + 1
+    dropped = max(0, original - sum(estimate_tokens(text) for text in texts))
+    num_ctx = next((size for size in buckets if size >= prompt_tokens + reserve), buckets[-1])
+
+    REGISTRY.observe("prompt_tokens", prompt_tokens, buckets=buckets, help="Estimated prompt size in tokens.",
+                     route=route)
+    if dropped:
+        REGISTRY.inc("prompt_tokens_dropped_total", dropped, help="Estimated tokens trimmed to fit num_ctx.",
+                     route=route)
+        logger.warning("Trimmed %d tokens from the %s prompt to fit num_ctx=%d", dropped, route, num_ctx)
+    return PromptPlan(context_text, prompt, num_ctx, prompt_tokens, dropped)
@@ -0,0 +1,354 @@
+import argparse
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import question_index
+import storage
+from llm_client import MAX_CONCURRENCY, LLMBusyError, filter_think, get_client
+from llm_router import get_router
+from llm_scheduler import BACKGROUND, QUESTION
+from metrics import timed
+from prompt_builder import plan_prompt
+
+OPTIONS = {"temperature": 0.9}  # A little hotter than live generation for variety
+TOPICS = ["technical_skills", "problem_solving", "behavioral"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+FILL_TARGET = 10  # Questions kept per (role, topic, difficulty) by background filling
+BACKGROUND_FILL = os.environ.get("QUESTION_BANK_FILL", "1") != "0"
+DEDUPLICATE = os.environ.get("QUESTION_DEDUP", "1") != "0"  # Reject near-duplicate questions (see question_index)
+DRAW_CANDIDATES = 5  # Banked questions drawn at once, so reworded copies of asked ones can be skipped
+REGENERATE_BATCH = 3  # Questions generated at once to replace a near-duplicate
+REGENERATE_ROUNDS = 2
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_role(job_role):
+    """Bank key for a job role: "  Sr. AI-Engineer " and "sr ai engineer" share questions."""
+    return " ".join(re.sub(r"[^a-z0-9+#]+", " ", job_role.lower()).split())
+
+
+def question_hash(question):
+    # Case, punctuation and spacing differences do not make a new question
+    normalized = " ".join(re.sub(r"[^a-z0-9]+", " ", question.lower()).split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def question_prompt(job_role, topic, difficulty):
+    """
+    Build the question-generation prompt.
+
+    Returns:
+        tuple: (prompt, context) for call_llm.
+    """
+    context = f"Job Role: {job_role}\nDifficulty: {difficulty}\nAssume typical skills and responsibilities."
+    if job_role.lower() == "agi researcher":
+        context += "\nFor AGI Researcher, include reasoning, ethics, or novel architectures in Hard difficulty."
+    prompt = f"""
+    Generate a {topic} interview question for a {job_role} at {difficulty} difficulty.
+    - Easy: Basic concepts or simple scenarios.
+    - Medium: Practical applications or moderate challenges.
+    - Hard: Advanced topics, complex problem-solving, or futuristic concepts (e.g., AGI ethics).
+    Ensure the question is specific to the role. Return only the question.
+    """
+    return prompt, context
+
+
+_indexed_roles = set()
+_indexed_lock = threading.Lock()
+
+
+def role_index(job_role):
+    """
+    The role's near-duplicate index. Questions banked before it existed are indexed by a
+    background thread started on first use; until it finishes, only what is indexed is searched.
+    """
+    role_key = normalize_role(job_role)
+    slot = (storage.DB_PATH, role_key)
+    with _indexed_lock:
+        backfill = slot not in _indexed_roles
+        _indexed_roles.add(slot)
+
+    def run():
+        try:
+            question_index.backfill(role_key)
+        except Exception:
+            logger.exception("Question index backfill failed for %s", role_key)
+            with _indexed_lock:
+                _indexed_roles.discard(slot)  # Retried on the next lookup
+
+    if backfill:
+        threading.Thread(target=run, name="question-index-backfill", daemon=True).start()
+    return question_index.get_shard(role_key)
+
+
+def similar_question(job_role, question, others, priority=QUESTION, user=None):
+    """
+    `priority` and `user` queue any embedding call (OllamaEmbedder) like the caller's own.
+
+    Returns:
+        str or None: The first of `others` that `question` is a near-duplicate of.
+    """
+    others = list(others)
+    if not DEDUPLICATE or not others:
+        return None
+    shard = role_index(job_role)
+    texts = [question, *others]
+    vectors = shard.vectors([question_hash(q) for q in texts], texts, priority=priority, user=user)
+    similarities = vectors[1:] @ vectors[0]
+    match = int(similarities.argmax())
+    return others[match] if similarities[match] >= shard.embedder.threshold else None
+
+
+def nearest_question(job_role, question):
+    """
+    Returns:
+        tuple: (cosine similarity, most similar indexed question or None) for the role.
+    """
+    shard = role_index(job_role)
+    best, rows = shard.search(shard.vectors([question_hash(question)], [question], user="question-index"))
+    return float(best[0]), shard.questions[rows[0]] if rows[0] >= 0 else None
+
+
+@timed("bank_add_questions")
+def add_questions(job_role, topic, difficulty, questions, priority=BACKGROUND, user="question-bank"):
+    """
+    Store questions, skipping exact duplicates of ones banked for the same slot and
+    near-duplicates (by embedding similarity) of any question banked for the role.
+    `priority` and `user` are those of the embedding call.
+
+    Returns:
+        int: Number of new questions stored.
+    """
+    role_key = normalize_role(job_role)
+    now = datetime.now().isoformat()
+    questions = [q.strip() for q in questions if q and q.strip() and not q.startswith("Error calling LLM")]
+    if DEDUPLICATE and questions:
+        rejected = role_index(job_role).add_distinct([question_hash(q) for q in questions], questions,
+                                                     priority=priority, user=user)
+        question_index.record_duplicates(role_key, rejected, questions, "bank")
+        skip = {i for i, _ in rejected}
+        questions = [q for i, q in enumerate(questions) if i not in skip]
+    rows = [(role_key, topic, difficulty, q, question_hash(q), now) for q in questions]
+    with storage.get_pool().connection() as conn:
+        before = conn.total_changes
+        with conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO question_bank (role_key, topic, difficulty, question, question_hash, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+        return conn.total_changes - before
+
+
+def count_questions(job_role, topic, difficulty):
+    with storage.get_pool().connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM question_bank WHERE role_key = ? AND topic = ? AND difficulty = ?",
+            (normalize_role(job_role), topic, difficulty),
+        ).fetchone()[0]
+
+
+@timed("bank_draw_question")
+def draw_question(job_role, topic, difficulty, exclude=(), priority=QUESTION, user=None):
+    """
+    Pick a random banked question for the slot that is not in `exclude`, nor a
+    reworded copy of one of them.
+
+    Returns:
+        str or None: A question, or None if the bank has nothing usable.
+    """
+    exclude = list(exclude)
+    placeholders = ",".join("?" * len(exclude))
+    not_asked = f"AND question NOT IN ({placeholders})" if exclude else ""
+    with storage.get_pool().connection() as conn:
+        rows = conn.execute(f"""
+            SELECT question FROM question_bank
+            WHERE role_key = ? AND topic = ? AND difficulty = ? {not_asked}
+            ORDER BY random() LIMIT ?
+        """, [normalize_role(job_role), topic, difficulty] + exclude + [DRAW_CANDIDATES]).fetchall()
+    for (question,) in rows:
+        similar = similar_question(job_role, question, exclude, priority, user)
+        if similar is None:
+            return question
+        question_index.record_duplicates(normalize_role(job_role), [(0, similar)], [question], "draw")
+    return None
+
+
+def generate_one(job_role, topic, difficulty, model=None, priority=BACKGROUND, user="question-bank"):
+    """
+    Generate a fresh question straight from the model, bypassing the response cache.
+
+    Uses the "question" route's models in order unless `model` is given.
+    """
+    plan = plan_prompt(*question_prompt(job_role, topic, difficulty), route="question")
+    router = get_router()
+    targets = router.chain("question", model)
+    for i, target in enumerate(targets):
+        options = dict(OPTIONS, **target.options, num_ctx=plan.num_ctx)
+        started = time.perf_counter()
+        try:
+            response = get_client().generate(model=target.model, prompt=f"{plan.context}\n{plan.prompt}",
+                                             options=options, timeout=target.timeout, priority=priority,
+                                             user=user)
+        except LLMBusyError:
+            raise  # Same slots for every model: another model would only queue behind them
+        except Exception:
+            router.record("question", target.model, time.perf_counter() - started, ok=False)
+            if i == len(targets) - 1:
+                raise
+            continue
+        router.record("question", target.model, time.perf_counter() - started, ok=True)
+        return "".join(filter_think([response["response"]])).strip()
+
+
+# A queued call holds its thread while it waits for a slot, so live replacements get their own
+# pool: behind background fills they would never reach the scheduler to outrank them
+_batch_executor = ThreadPoolExecutor(max_workers=2 * MAX_CONCURRENCY, thread_name_prefix="bank-batch")
+_foreground_executor = ThreadPoolExecutor(max_workers=2 * MAX_CONCURRENCY, thread_name_prefix="bank-live")
+
+
+def generate_batch(job_role, topic, difficulty, count, model=None, priority=BACKGROUND, user="question-bank"):
+    """
+    Generate `count` questions at once; calls that fail are left out. Background work
+    runs on `_batch_executor`, anything more urgent on `_foreground_executor`.
+
+    Returns:
+        list: The questions, in no particular order.
+    """
+    executor = _batch_executor if priority == BACKGROUND else _foreground_executor
+    try:
+        futures = [executor.submit(generate_one, job_role, topic, difficulty, model, priority, user)
+                   for _ in range(count)]
+    except RuntimeError:
+        return []  # Interpreter shutting down; a background fill just stops
+    questions = []
+    for future in as_completed(futures):
+        try:
+            questions.append(future.result())
+        except Exception as e:
+            logger.warning("Question generation failed for %s / %s / %s: %s", job_role, topic, difficulty, e)
+    return questions
+
+
+def regenerate_question(job_role, topic, difficulty, exclude, priority=QUESTION, user=None):
+    """
+    Replace a near-duplicate: generate REGENERATE_BATCH questions at once and take the
+    first unlike every question in `exclude`. Distinct ones are banked either way.
+
+    Returns:
+        str or None: None if every round only produced near-duplicates.
+    """
+    for _ in range(REGENERATE_ROUNDS):
+        candidates = generate_batch(job_role, topic, difficulty, REGENERATE_BATCH, priority=priority, user=user)
+        add_questions(job_role, topic, difficulty, candidates, priority, user)
+        for question in candidates:
+            similar = similar_question(job_role, question, exclude, priority, user)
+            if similar is None:
+                return question
+            question_index.record_duplicates(normalize_role(job_role), [(0, similar)], [question], "interview")
+    return None
+
+
+def fill_slot(job_role, topic, difficulty, target=FILL_TARGET, model=None):
+    """
+    Generate questions for one slot until it holds `target` distinct questions.
+
+    Each round generates the missing number at once. Gives up after 3 x `target`
+    questions so a model that keeps repeating itself cannot loop forever.
+
+    Returns:
+        int: Number of new questions stored.
+    """
+    added = attempts = 0
+    while attempts < target * 3:
+        missing = min(target - count_questions(job_role, topic, difficulty), target * 3 - attempts)
+        if missing <= 0:
+            break
+        added += add_questions(job_role, topic, difficulty, generate_batch(job_role, topic, difficulty, missing, model))
+        attempts += missing
+    return added
+
+
+def build_bank(roles, per_slot=FILL_TARGET, workers=MAX_CONCURRENCY, topics=TOPICS, difficulties=DIFFICULTIES):
+    """
+    Fill every (role, topic, difficulty) slot in parallel.
+
+    Returns:
+        dict: {(role, topic, difficulty): questions added}
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bank-build") as executor:
+        futures = {
+            executor.submit(fill_slot, role, topic, difficulty, per_slot): (role, topic, difficulty)
+            for role in roles for topic in topics for difficulty in difficulties
+        }
+        for future in as_completed(futures):
+            slot = futures[future]
+            try:
+                results[slot] = future.result()
+            except Exception as e:
+                print(f"Failed to fill {slot}: {e}")
+                results[slot] = 0
+            print(f"{slot[0]} / {slot[1]} / {slot[2]}: +{results[slot]}")
+    return results
+
+
+_fill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bank-fill")
+_filling = set()
+_filling_lock = threading.Lock()
+
+
+def fill_in_background(job_role, topic, difficulty, target=FILL_TARGET):
+    """Top up a slot the bank could not serve, at most one fill per slot at a time."""
+    if not BACKGROUND_FILL:
+        return
+    slot = (normalize_role(job_role), topic, difficulty)
+    with _filling_lock:
+        if slot in _filling:
+            return
+        _filling.add(slot)
+
+    def run():
+        try:
+            fill_slot(job_role, topic, difficulty, target)
+        except Exception:
+            logger.exception("Background bank fill failed for %s", slot)
+        finally:
+            with _filling_lock:
+                _filling.discard(slot)
+
+    _fill_executor.submit(run)
+
+
+def print_stats():
+    with storage.get_pool().connection() as conn:
+        rows = conn.execute("""
+            SELECT role_key, topic, difficulty, COUNT(*) FROM question_bank
+            GROUP BY role_key, topic, difficulty ORDER BY role_key, topic, difficulty
+        """).fetchall()
+    if not rows:
+        print("The question bank is empty.")
+    for role_key, topic, difficulty, count in rows:
+        print(f"{role_key:<30}{topic:<20}{difficulty:<8}{count:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate the interview question bank.")
+    parser.add_argument("roles", nargs="*", help='Job roles to build, e.g. "AI Engineer" "AGI Researcher"')
+    parser.add_argument("--per-slot", type=int, default=FILL_TARGET, help="Questions per role/topic/difficulty")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENCY, help="Slots generated in parallel")
+    parser.add_argument("--db", default=storage.DB_PATH, help="Path to the SQLite database file")
+    parser.add_argument("--stats", action="store_true", help="Show how many questions each slot holds")
+    args = parser.parse_args()
+
+    storage.set_db_path(args.db)
+    if args.roles:
+        build_bank(args.roles, per_slot=args.per_slot, workers=args.workers)
+    if args.stats or not args.roles:
+        print_stats()
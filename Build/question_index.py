@@ -0,0 +1,529 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+import storage
+from llm_scheduler import BACKGROUND
+from metrics import REGISTRY, timed
+
+# "hash" (local, deterministic) or "ollama:<embedding model>", e.g. "ollama:nomic-embed-text"
+EMBEDDER = os.environ.get("QUESTION_EMBEDDER", "hash")
+INDEX_DIR = os.environ.get("QUESTION_INDEX_DIR", "")  # Default: "<database>.vectors" next to the database
+APPROXIMATE = os.environ.get("QUESTION_INDEX_APPROX", "1") != "0"
+APPROX_MIN_ROWS = 5000  # Smaller snapshots are scanned exactly
+APPROX_PROBES = 8  # Clusters searched per query
+SNAPSHOT_ROWS = 2000  # Rows past the memory-mapped snapshot before a new one is written
+HASH_DIM = 256
+# Words every generated question shares; they say nothing about what is being asked
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "be", "you", "your", "would",
+    "how", "what", "why", "when", "which", "do", "does", "can", "could", "this", "that", "role", "describe",
+    "explain", "question",
+}
+
+_WORD = re.compile(r"[a-z0-9+#]+")
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedder:
+    """
+    Local, deterministic embedder: signed feature hashing of words and word pairs.
+
+    Needs no model and gives the same vector in every process, so tests and benchmarks
+    are repeatable. It catches reworded copies that keep most of the wording; a real
+    embedding model (OllamaEmbedder) also catches paraphrases with new words.
+    """
+
+    threshold = 0.8  # Cosine similarity from which two questions count as the same
+
+    def __init__(self, dim=HASH_DIM):
+        self.dim = dim
+        self.name = f"hash{dim}"
+
+    def __call__(self, texts, priority=BACKGROUND, user=None):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            # Numbers are left out: "Question 3:" and "Question 9:" ask the same thing
+            words = [word for word in _WORD.findall(text.lower()) if word not in STOP_WORDS and not word.isdigit()]
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(vectors)
+
+
+class OllamaEmbedder:
+    """
+    Embeddings from an ollama embedding model, through the shared client's slots.
+
+    Calls are queued like any other LLM call: `priority` and `user` are the caller's, so a
+    bank fill embeds in the background class and a live question in the question class.
+    """
+
+    threshold = 0.92
+
+    def __init__(self, model):
+        self.model = model
+        self.name = f"ollama:{model}"
+
+    def __call__(self, texts, priority=BACKGROUND, user=None):
+        from llm_client import get_client
+        return _normalize(get_client().embed(self.model, list(texts), priority=priority, user=user))
+
+
+def load_embedder(spec=EMBEDDER):
+    if spec.startswith("ollama:"):
+        return OllamaEmbedder(spec.split(":", 1)[1])
+    if spec == "hash":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown embedder {spec!r}; use 'hash' or 'ollama:<model>'")
+
+
+def build_clusters(vectors, lists, iterations=5, sample=20000, seed=0):
+    """
+    Spherical k-means over `vectors` for approximate search.
+
+    Returns:
+        tuple: (centroids, order, bounds): rows of cluster k are order[bounds[k]:bounds[k + 1]].
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, min(n, sample), replace=False))])
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]  # A cluster that lost every member keeps its centre
+        centroids = _normalize(sums)
+    assign = np.concatenate([np.argmax(np.asarray(vectors[i:i + 10000]) @ centroids.T, axis=1)
+                             for i in range(0, n, 10000)])
+    order = np.argsort(assign, kind="stable")
+    bounds = np.searchsorted(assign[order], np.arange(lists + 1))
+    return centroids, order, bounds
+
+
+def search_rows(base, clusters, tail, vectors):
+    """
+    Most similar row of `base` (then `tail`) for each query row; see Shard.search.
+
+    Returns:
+        tuple: (similarities, rows); rows of `tail` are numbered after those of `base`.
+    """
+    best = np.full(len(vectors), -1.0, dtype=np.float32)
+    rows = np.full(len(vectors), -1, dtype=np.int64)
+    offset = 0
+    if base is not None and len(base):
+        offset = len(base)
+        if clusters is None:
+            scores = base @ vectors.T
+            rows[:] = np.argmax(scores, axis=0)
+            best[:] = scores[rows, np.arange(len(vectors))]
+        else:
+            centroids, order, bounds = clusters
+            probes = min(APPROX_PROBES, len(centroids))
+            for i, vector in enumerate(vectors):
+                nearest = np.argpartition(-(centroids @ vector), probes - 1)[:probes]
+                candidates = np.concatenate([order[bounds[k]:bounds[k + 1]] for k in nearest])
+                if len(candidates):
+                    scores = base[candidates] @ vector
+                    top = int(np.argmax(scores))
+                    rows[i], best[i] = candidates[top], scores[top]
+    if tail is not None and len(tail):
+        scores = tail @ vectors.T
+        top = np.argmax(scores, axis=0)
+        top_scores = scores[top, np.arange(len(vectors))]
+        better = top_scores > best
+        rows[better] = top[better] + offset
+        best[better] = top_scores[better]
+    return best, rows
+
+
+class Shard:
+    """
+    Embeddings of one role's questions, searched by cosine similarity.
+
+    Rows live in the `question_embeddings` table, so every worker process sees every
+    question. Each process keeps them as float32: a memory-mapped snapshot file plus
+    rows added since, in memory. Once SNAPSHOT_ROWS rows pile up past the snapshot, a
+    new one is written. Snapshots of APPROX_MIN_ROWS rows or more are clustered, and a
+    query only scans the APPROX_PROBES clusters closest to it.
+
+    Args:
+        role_key (str): Normalized job role.
+        embedder: Callable turning a list of texts (plus `priority` and `user` keywords for the
+            LLM queue) into unit-length float32 rows.
+        directory (str): Where snapshot files go.
+        approximate (bool): Cluster large snapshots; False scans every row.
+    """
+
+    def __init__(self, role_key, embedder, directory, approximate=APPROXIMATE):
+        self.role_key = role_key
+        self.embedder = embedder
+        self.key = hashlib.sha1(f"{embedder.name}\x1f{role_key}".encode("utf-8")).hexdigest()[:16]
+        self.directory = directory
+        self.approximate = approximate
+        self.lock = threading.RLock()
+        self.dim = None
+        self.base = None  # np.memmap of the snapshot, or None
+        self.clusters = None  # (centroids, order, bounds) over `base`
+        self.tail = None  # Rows after the snapshot; the first `tail_rows` are in use
+        self.tail_rows = 0
+        self.questions = []
+        self.rows = {}  # question_hash -> row
+        self.last_id = 0
+        self.rejected = 0
+        self.compacting = False
+        self._load_snapshot()
+
+    def __len__(self):
+        return len(self.questions)
+
+    def _snapshot_path(self, last_id, ext):
+        return os.path.join(self.directory, f"{self.key}.{last_id}.{ext}")
+
+    def _load_snapshot(self):
+        snapshots = sorted((int(path.rsplit(".", 2)[1])
+                            for path in glob.glob(os.path.join(self.directory, f"{self.key}.*.json"))), reverse=True)
+        if not snapshots:
+            return
+        with storage.get_pool().connection() as conn:
+            stored = conn.execute("SELECT MAX(id) FROM question_embeddings WHERE shard = ?", (self.key,)).fetchone()[0]
+        for last_id in snapshots:
+            if (stored or 0) < last_id:
+                logger.warning("Ignoring question index snapshot %s: the database has fewer rows", self.key)
+                continue
+            try:
+                with open(self._snapshot_path(last_id, "json")) as f:
+                    meta = json.load(f)
+                base = np.memmap(self._snapshot_path(last_id, "f32"), dtype=np.float32, mode="r",
+                                 shape=(meta["rows"], meta["dim"]))
+                break
+            except (OSError, ValueError) as e:
+                # Removed by another process's newer snapshot between the glob and the open
+                logger.info("Skipping question index snapshot %s.%s: %s", self.key, last_id, e)
+        else:
+            return  # No usable snapshot: sync() reads every row from the database
+        self.dim = meta["dim"]
+        self.base = base
+        self.clusters = self._cluster(self.base)
+        self.questions = list(meta["questions"])
+        self.rows = {h: i for i, h in enumerate(meta["hashes"])}
+        self.last_id = meta["last_id"]
+        self.tail = np.zeros((64, self.dim), dtype=np.float32)
+
+    def _cluster(self, base):
+        if self.approximate and len(base) >= APPROX_MIN_ROWS:
+            return build_clusters(base, int(math.sqrt(len(base))))
+        return None
+
+    def sync(self):
+        """Pick up rows any process stored since the last call."""
+        with storage.get_pool().connection() as conn:
+            new = conn.execute("""
+                SELECT id, question_hash, question, vector FROM question_embeddings
+                WHERE shard = ? AND id > ? ORDER BY id
+            """, (self.key, self.last_id)).fetchall()
+        if not new:
+            return
+        with self.lock:
+            new = [row for row in new if row[0] > self.last_id]
+            if not new:
+                return  # Another thread took them in meanwhile
+            vectors = np.frombuffer(b"".join(row[3] for row in new), dtype=np.float32).reshape(len(new), -1)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.tail = np.zeros((64, self.dim), dtype=np.float32)
+            needed = self.tail_rows + len(new)
+            if needed > len(self.tail):
+                grown = np.zeros((max(needed, 2 * len(self.tail)), self.dim), dtype=np.float32)
+                grown[:self.tail_rows] = self.tail[:self.tail_rows]
+                self.tail = grown
+            self.tail[self.tail_rows:needed] = vectors
+            self.tail_rows = needed
+            for _, question_hash, question, _ in new:
+                self.rows[question_hash] = len(self.questions)
+                self.questions.append(question)
+            self.last_id = new[-1][0]
+            if self.tail_rows >= SNAPSHOT_ROWS and not self.compacting:
+                self.compacting = True
+                threading.Thread(target=self._compact, name="question-index-snapshot", daemon=True).start()
+
+    def _compact(self):
+        # Runs in its own thread: lookups keep using the old snapshot until the new one is ready.
+        # A new file per snapshot, since other processes may still have the old one mapped.
+        with self.lock:
+            base = np.asarray(self.base) if self.base is not None else np.zeros((0, self.dim), dtype=np.float32)
+            taken = self.tail_rows
+            vectors = np.concatenate([base, self.tail[:taken]])
+            hashes = [None] * len(vectors)
+            for question_hash, row in self.rows.items():
+                if row < len(vectors):
+                    hashes[row] = question_hash
+            meta = {"role_key": self.role_key, "embedder": self.embedder.name, "dim": self.dim,
+                    "rows": len(vectors), "last_id": self.last_id, "hashes": hashes,
+                    "questions": self.questions[:len(vectors)]}
+        old = glob.glob(os.path.join(self.directory, f"{self.key}.*"))
+        last_id = meta["last_id"]
+        # Temporary names per process, moved into place whole: other processes only ever open
+        # complete files, and the vectors are in place before the .json that points to them
+        tmp = f"{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            vectors.tofile(self._snapshot_path(last_id, f"f32.{tmp}"))
+            os.replace(self._snapshot_path(last_id, f"f32.{tmp}"), self._snapshot_path(last_id, "f32"))
+            with open(self._snapshot_path(last_id, f"json.{tmp}"), "w") as f:
+                json.dump(meta, f)
+            os.replace(self._snapshot_path(last_id, f"json.{tmp}"), self._snapshot_path(last_id, "json"))
+            mapped = np.memmap(self._snapshot_path(last_id, "f32"), dtype=np.float32, mode="r", shape=vectors.shape)
+            clusters = self._cluster(mapped)
+        except OSError as e:
+            logger.warning("Could not write question index snapshot %s: %s", self.key, e)
+            with self.lock:
+                self.compacting = False
+            return
+        with self.lock:
+            # Row numbers do not change: the snapshot holds exactly the rows it replaces
+            leftover = self.tail[taken:self.tail_rows].copy()
+            self.base, self.clusters = mapped, clusters
+            self.tail = np.zeros((max(64, 2 * len(leftover)), self.dim), dtype=np.float32)
+            self.tail[:len(leftover)] = leftover
+            self.tail_rows = len(leftover)
+            self.compacting = False
+        # Metadata first, so fewer readers find a snapshot whose vectors are already gone
+        for path in sorted(old, key=lambda path: not path.endswith(".json")):
+            if f".{last_id}." in os.path.basename(path) or path.endswith(".tmp"):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Still mapped by another process (Windows); removed after a later snapshot
+
+    def search(self, vectors):
+        """
+        Most similar stored question for each query row.
+
+        Args:
+            vectors (np.ndarray): (n, dim) unit-length float32 queries.
+
+        Returns:
+            tuple: (similarities, rows) arrays of length n; row -1 and similarity -1 when empty.
+        """
+        with self.lock:
+            base, clusters, tail = self.base, self.clusters, self.tail[:self.tail_rows] if self.tail_rows else None
+        return search_rows(base, clusters, tail, np.asarray(vectors, dtype=np.float32))
+
+    def vectors(self, hashes, questions, priority=BACKGROUND, user=None):
+        """Embeddings of `questions`, reusing stored rows instead of re-embedding."""
+        with self.lock:
+            # Under the lock: a backfill thread may fill an empty shard (and set dim) at any time
+            result = np.zeros((len(questions), self.dim), dtype=np.float32) if self.dim else None
+            base_rows = len(self.base) if self.base is not None else 0
+            known = [self.rows.get(h) for h in hashes]
+            for i, row in enumerate(known):
+                if row is not None:
+                    result[i] = self.base[row] if row < base_rows else self.tail[row - base_rows]
+        missing = [i for i, row in enumerate(known) if row is None]
+        if missing:
+            embedded = self.embedder([questions[i] for i in missing], priority=priority, user=user)
+            if result is None:
+                result = np.zeros((len(questions), embedded.shape[1]), dtype=np.float32)
+            result[missing] = embedded
+        return result
+
+    def add_distinct(self, hashes, questions, threshold=None, priority=BACKGROUND, user=None):
+        """
+        Store the questions that are not near-duplicates of a stored one or of each other.
+        `priority` and `user` are passed to the embedder.
+
+        Returns:
+            list: (index into `questions`, similar stored question or None) for each rejected
+            question, in order; every other question was stored.
+        """
+        threshold = self.embedder.threshold if threshold is None else threshold
+        if not questions:
+            return []
+        vectors = self.embedder(questions, priority=priority, user=user)
+        with self.lock:
+            self.sync()
+            best, rows = self.search(vectors)
+            accepted, rejected = [], []
+            for i in range(len(questions)):
+                if best[i] >= threshold:
+                    rejected.append((i, self.questions[rows[i]]))
+                elif accepted and float(np.max(vectors[accepted] @ vectors[i])) >= threshold:
+                    rejected.append((i, None))
+                else:
+                    accepted.append(i)
+            now = datetime.now().isoformat()
+            with storage.get_pool().connection() as conn:
+                with conn:
+                    conn.executemany("""
+                        INSERT OR IGNORE INTO question_embeddings (shard, question_hash, question, vector, created_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, [(self.key, hashes[i], questions[i], vectors[i].tobytes(), now) for i in accepted])
+            self.sync()
+            self.rejected += len(rejected)
+        return rejected
+
+
+_shards = {}
+_shards_lock = threading.Lock()
+_embedder = None
+
+
+def get_embedder():
+    global _embedder
+    with _shards_lock:
+        if _embedder is None:
+            _embedder = load_embedder()
+        return _embedder
+
+
+def set_embedder(embedder):
+    """Replace the process-wide embedder (benchmarks and tests); shards are rebuilt."""
+    global _embedder
+    with _shards_lock:
+        _embedder = embedder
+        _shards.clear()
+
+
+def index_dir():
+    return INDEX_DIR or f"{storage.DB_PATH}.vectors"
+
+
+def get_shard(role_key):
+    """Process-wide shard for a normalized role, up to date with every process's additions."""
+    embedder = get_embedder()
+    key = (storage.DB_PATH, embedder.name, role_key)
+    with _shards_lock:
+        shard = _shards.get(key)
+        if shard is None:
+            shard = _shards[key] = Shard(role_key, embedder, index_dir())
+    shard.sync()
+    return shard
+
+
+def record_duplicates(role_key, rejected, questions, stage):
+    for i, similar in rejected:
+        logger.info("Rejected near-duplicate question for %s (%s): %r ~ %r", role_key, stage, questions[i], similar)
+        REGISTRY.inc("question_duplicates_total", help="Generated questions rejected as near-duplicates.", stage=stage)
+
+
+def stats():
+    """
+    Returns:
+        dict: {role_key: {"rows", "approximate", "rejected"}} for shards loaded in this process.
+    """
+    with _shards_lock:
+        shards = list(_shards.values())
+    return {shard.role_key: {"rows": len(shard), "approximate": shard.clusters is not None,
+                             "rejected": shard.rejected} for shard in shards}
+
+
+@timed("question_index_backfill")
+def backfill(role_key=None, batch=500, priority=BACKGROUND, user="question-index"):
+    """
+    Index every banked question (of one role, or all) not indexed yet. Near-duplicates
+    already in the bank stay there but are counted, and recorded in `question_duplicates`
+    so no process embeds them again.
+
+    Returns:
+        tuple: (questions indexed, near-duplicates found)
+    """
+    with storage.get_pool().connection() as conn:
+        if role_key is None:
+            rows = conn.execute("SELECT role_key, question_hash, question FROM question_bank ORDER BY id").fetchall()
+        else:
+            rows = conn.execute("SELECT role_key, question_hash, question FROM question_bank WHERE role_key = ? ORDER BY id",
+                                (role_key,)).fetchall()
+    indexed = duplicates = 0
+    by_role = {}
+    for role_key, question_hash, question in rows:
+        by_role.setdefault(role_key, []).append((question_hash, question))
+    for role_key, items in by_role.items():
+        shard = get_shard(role_key)
+        with storage.get_pool().connection() as conn:
+            known = {h for (h,) in conn.execute("SELECT question_hash FROM question_duplicates WHERE shard = ?",
+                                                 (shard.key,))}
+        items = [(h, q) for h, q in items if h not in shard.rows and h not in known]
+        for i in range(0, len(items), batch):
+            chunk = items[i:i + batch]
+            rejected = shard.add_distinct([h for h, _ in chunk], [q for _, q in chunk], priority=priority, user=user)
+            indexed += len(chunk) - len(rejected)
+            duplicates += len(rejected)
+            if rejected:
+                now = datetime.now().isoformat()
+                with storage.get_pool().connection() as conn:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO question_duplicates (shard, question_hash, created_at) VALUES (?, ?, ?)",
+                            [(shard.key, chunk[j][0], now) for j, _ in rejected])
+    return indexed, duplicates
+
+
+def measure_lookups(rows=100000, queries=200, dim=HASH_DIM, approximate=True, seed=0):
+    """
+    Time single-question lookups against a synthetic shard of `rows` random vectors.
+
+    Returns:
+        dict: {"rows", "approximate", "p50_ms", "p95_ms", "recall"}; recall is the share of
+        queries (near copies of stored rows) whose nearest row the search found.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = _normalize(rng.standard_normal((rows, dim)))
+    clusters = build_clusters(vectors, int(math.sqrt(rows))) if approximate else None
+    targets = rng.choice(rows, queries, replace=False)
+    probes = _normalize(vectors[targets] + 0.3 * _normalize(rng.standard_normal((queries, dim))))
+    times, found = [], 0
+    for target, probe in zip(targets, probes):
+        started = time.perf_counter()
+        _, row = search_rows(vectors, clusters, None, probe[None, :])
+        times.append(time.perf_counter() - started)
+        found += int(row[0] == target)
+    times.sort()
+    return {"rows": rows, "approximate": approximate, "p50_ms": times[len(times) // 2] * 1000,
+            "p95_ms": times[int(len(times) * 0.95)] * 1000, "recall": found / queries}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate question index.")
+    parser.add_argument("--backfill", action="store_true", help="Index every banked question")
+    parser.add_argument("--check", help="Show the most similar indexed question for this text")
+    parser.add_argument("--role", help="Job role for --check")
+    parser.add_argument("--measure", type=int, metavar="ROWS", help="Time lookups on a synthetic shard of ROWS rows")
+    parser.add_argument("--db", default=storage.DB_PATH, help="Path to the SQLite database file")
+    args = parser.parse_args()
+
+    storage.set_db_path(args.db)
+    if args.backfill:
+        indexed, duplicates = backfill()
+        print(f"Indexed {indexed} questions; {duplicates} banked questions are near-duplicates.")
+    if args.check:
+        from question_bank import nearest_question, normalize_role
+        backfill(normalize_role(args.role or ""))  # The app does this in the background; here, wait for it
+        similarity, question = nearest_question(args.role or "", args.check)
+        print(f"{similarity:.3f}  {question}" if question else "The index for this role is empty.")
+    if args.measure:
+        for approximate in (False, True):
+            result = measure_lookups(args.measure, approximate=approximate)
+            print(f"{'approximate' if approximate else 'exact':<12}{result['rows']:>8} rows  "
+                  f"p50 {result['p50_ms']:.3f}ms  p95 {result['p95_ms']:.3f}ms  recall {result['recall']:.2f}")
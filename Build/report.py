@@ -0,0 +1,114 @@
+import io
+from collections import namedtuple
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 72
+FONT = "Helvetica"
+BOLD_FONT = "Helvetica-Bold"
+FONT_SIZE = 10
+LEADING = 14  # Line height in points
+
+# Everything the PDF shows, as immutable values: equal data means an identical report
+ReportData = namedtuple("ReportData", "job_role username total_time duration rounds feedback")
+
+
+def report_data(state, feedback):
+    """
+    Snapshot the parts of an InterviewState that appear in the report.
+
+    Args:
+        state (InterviewState): Finished (or timed-out) interview.
+        feedback (str): Final evaluation text shown on the completion card.
+
+    Returns:
+        ReportData: Safe to hand to another thread and to compare against an earlier snapshot.
+    """
+    rounds = tuple(
+        (round.difficulty, tuple((q, a, score) for (q, a), score in zip(round.history, round.scores)))
+        for round in state.rounds
+    )
+    return ReportData(state.job_role, state.username, int(state.total_time), int(state.interview_duration / 60),
+                      rounds, feedback)
+
+
+def _wrap(paragraph, font, width):
+    lines = []
+    for line in simpleSplit(paragraph, font, FONT_SIZE, width) or [""]:
+        # simpleSplit only breaks at spaces; cut unbroken runs (long identifiers, URLs) by character
+        while stringWidth(line, font, FONT_SIZE) > width:
+            fits, too_long = 1, len(line)  # Binary search for the longest prefix that fits
+            while too_long - fits > 1:
+                mid = (fits + too_long) // 2
+                if stringWidth(line[:mid], font, FONT_SIZE) <= width:
+                    fits = mid
+                else:
+                    too_long = mid
+            lines.append(line[:fits])
+            line = line[fits:]
+        lines.append(line)
+    return lines
+
+
+class _PageWriter:
+    """Writes wrapped lines top to bottom, starting a new page when one fills up."""
+
+    def __init__(self, c):
+        self.c = c
+        self.y = PAGE_HEIGHT - MARGIN
+        self.width = PAGE_WIDTH - 2 * MARGIN
+
+    def text(self, text, font=FONT, indent=0):
+        lines = []
+        for paragraph in str(text).splitlines() or [""]:
+            lines.extend(_wrap(paragraph, font, self.width - indent))
+        for line in lines:
+            if self.y < MARGIN:
+                self.c.showPage()
+                self.y = PAGE_HEIGHT - MARGIN
+            self.c.setFont(font, FONT_SIZE)
+            self.c.drawString(MARGIN + indent, self.y, line)
+            self.y -= LEADING
+
+    def space(self, lines=1):
+        self.y -= LEADING * lines
+
+
+def render_report(data):
+    """
+    Render the interview report to PDF in memory.
+
+    Long questions, answers and feedback wrap and flow onto further pages.
+
+    Args:
+        data (ReportData): Output of `report_data`.
+
+    Returns:
+        bytes: The PDF file.
+    """
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    c.setTitle(f"Interview Report: {data.job_role}")
+    out = _PageWriter(c)
+    out.text(f"Interview Report: {data.job_role}", BOLD_FONT)
+    out.text(f"Username: {data.username}")
+    out.text(f"Total Time: {data.total_time} seconds")
+    if data.duration is not None:
+        out.text(f"Duration Set: {data.duration} minutes")
+    out.space()
+    for i, (difficulty, answers) in enumerate(data.rounds):
+        out.text(f"Round {i+1} ({difficulty}):", BOLD_FONT)
+        for j, (q, r, score) in enumerate(answers):
+            out.text(f"Q{j+1}: {q}", indent=12)
+            out.text(f"A: {r}", indent=12)
+            out.text(f"Score: {score}", indent=12)
+            out.space(0.5)
+        out.space()
+    out.text("Summary:", BOLD_FONT)
+    out.text(data.feedback)
+    c.save()
+    return buffer.getvalue()
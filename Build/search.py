@@ -0,0 +1,230 @@
+import argparse
+import re
+import sqlite3
+import time
+
+from tabulate import tabulate
+
+import storage
+from metrics import timed
+
+PAGE_SIZE = 20
+# A term in the question says what was asked; in an answer it may only be mentioned in passing
+QUESTION_WEIGHT = 2.0
+ANSWER_WEIGHT = 1.0
+SNIPPET_TOKENS = 12
+FIELDS = ("question", "answer")
+HEADERS = ["ID", "Session", "Username", "Job Role", "Question", "Answer", "Q Score", "Rank"]
+
+_TERM = re.compile(r"\S+")
+
+
+def match_query(text, field=None, raw=False):
+    """
+    Turn search box text into an FTS5 MATCH expression.
+
+    Every word must appear (in any order); a trailing `*` makes a word a prefix, so
+    `transform*` finds "transformer" and "transformers". Words are quoted, so
+    punctuation and FTS5 operators in user text cannot cause syntax errors.
+
+    Args:
+        text (str): Words to look for.
+        field (str, optional): "question" or "answer" to search only that column.
+        raw (bool): Pass `text` through as FTS5 syntax (OR, NOT, NEAR, "phrases").
+
+    Returns:
+        str or None: The expression, or None if `text` has no words.
+    """
+    if raw:
+        expression = text.strip()
+    else:
+        terms = []
+        for term in _TERM.findall(text):
+            prefix = term.endswith("*") and len(term) > 1
+            term = term.rstrip("*").replace('"', '""')
+            if term:
+                terms.append(f'"{term}"*' if prefix else f'"{term}"')
+        expression = " ".join(terms)
+    if not expression:
+        return None
+    if field:
+        if field not in FIELDS:
+            raise ValueError(f"field must be one of {FIELDS}, not {field!r}")
+        expression = f"{field} : ({expression})"
+    return expression
+
+
+def _filters(username, job_role):
+    where, params = "", []
+    if username:
+        where += " AND i.username = ?"
+        params.append(username)
+    if job_role:
+        where += " AND i.job_role = ?"
+        params.append(job_role)
+    return where, params
+
+
+@timed("search")
+def search(conn, text, username=None, job_role=None, field=None, page=0, page_size=PAGE_SIZE, raw=False):
+    """
+    Answers matching `text`, best match first (bm25, question matches weighted higher).
+
+    Ordering by the FTS5 `rank` column lets the index sort the matches, so snippets
+    are only built for the page returned. Pages use OFFSET: ranking scores every
+    match anyway, so skipping earlier pages costs little on top.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the interviews database.
+        text (str): Search words; see `match_query`.
+        username (str, optional): Only this user's answers.
+        job_role (str, optional): Only answers for this role.
+        field (str, optional): "question" or "answer".
+        page (int): Zero-based page number.
+        page_size (int): Results per page.
+        raw (bool): `text` is an FTS5 expression.
+
+    Returns:
+        list: (id, session_id, username, job_role, question snippet, answer snippet,
+        question_score, rank) tuples; matched words are in [brackets]. Lower rank is better.
+
+    Raises:
+        sqlite3.OperationalError: For an invalid raw expression, or if SQLite lacks FTS5.
+    """
+    expression = match_query(text, field, raw)
+    if expression is None:
+        return []
+    where, params = _filters(username, job_role)
+    return conn.execute(f"""
+        SELECT i.id, i.session_id, i.username, i.job_role,
+               snippet(interviews_fts, 0, '[', ']', '...', {SNIPPET_TOKENS}),
+               snippet(interviews_fts, 1, '[', ']', '...', {SNIPPET_TOKENS}),
+               i.question_score, interviews_fts.rank
+        FROM interviews_fts JOIN interviews i ON i.id = interviews_fts.rowid
+        WHERE interviews_fts MATCH ? {where}
+          AND interviews_fts.rank MATCH 'bm25({QUESTION_WEIGHT}, {ANSWER_WEIGHT})'
+        ORDER BY interviews_fts.rank
+        LIMIT ? OFFSET ?
+    """, [expression, *params, page_size, page * page_size]).fetchall()
+
+
+def count_matches(conn, text, username=None, job_role=None, field=None, raw=False):
+    """Number of answers `search` would page through."""
+    expression = match_query(text, field, raw)
+    if expression is None:
+        return 0
+    where, params = _filters(username, job_role)
+    if not where:
+        return conn.execute("SELECT COUNT(*) FROM interviews_fts WHERE interviews_fts MATCH ?",
+                            (expression,)).fetchone()[0]
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM interviews_fts JOIN interviews i ON i.id = interviews_fts.rowid
+        WHERE interviews_fts MATCH ? {where}
+    """, [expression, *params]).fetchone()[0]
+
+
+def index_coverage(conn):
+    """
+    Returns:
+        tuple: (answers in the search index, answers in the table). They differ until
+        a database that predates the index has been backfilled.
+    """
+    indexed = conn.execute("SELECT COUNT(*) FROM interviews_fts_docsize").fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM interviews").fetchone()[0]
+    return indexed, total
+
+
+@timed("search_backfill")
+def backfill(conn):
+    """
+    Rebuild the search index from every row of `interviews`.
+
+    Safe to re-run, and the triggers keep the index current afterwards. The rebuild
+    is one transaction, so the app's writers wait for it on a large database.
+
+    Returns:
+        int: Answers indexed.
+    """
+    with conn:
+        conn.execute("INSERT INTO interviews_fts (interviews_fts) VALUES ('rebuild')")
+    return index_coverage(conn)[0]
+
+
+def compare_with_like(conn, text, repeat=5):
+    """
+    Time an indexed search for `text` against the LIKE scan it replaces.
+
+    Both sides count the matches and fetch the first page, as the CLI does. Each word
+    becomes `(question LIKE '%word%' OR answer LIKE '%word%')`; LIKE also matches
+    inside longer words and does not stem, so its count can differ.
+
+    Returns:
+        dict: {"fts": (matches, best seconds), "like": (matches, best seconds)}
+    """
+    words = [term.rstrip("*") for term in _TERM.findall(text) if term.rstrip("*")]
+    like_where = " AND ".join("(question LIKE ? OR answer LIKE ?)" for _ in words) or "0"
+    like_params = [f"%{word}%" for word in words for _ in range(2)]
+
+    def best(run):
+        times, count = [], 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = run()
+            times.append(time.perf_counter() - started)
+        return count, min(times)
+
+    return {
+        "fts": best(lambda: (search(conn, text), count_matches(conn, text))[1]),
+        "like": best(lambda: (
+            conn.execute(f"SELECT * FROM interviews WHERE {like_where} ORDER BY id DESC LIMIT ?",
+                         like_params + [PAGE_SIZE]).fetchall(),
+            conn.execute(f"SELECT COUNT(*) FROM interviews WHERE {like_where}", like_params).fetchone()[0],
+        )[1]),
+    }
+
+
+def print_results(rows, total, page, page_size):
+    if not rows:
+        print("No matching answers.")
+        return
+    print(tabulate([row[:-1] + (f"{row[-1]:.2f}",) for row in rows], headers=HEADERS, tablefmt="grid"))
+    shown = page * page_size + len(rows)
+    print(f"\nShowing {page * page_size + 1}-{shown} of {total} matches.")
+    if shown < total:
+        print(f"Next page: --page {page + 1}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over interview questions and answers.")
+    parser.add_argument("query", nargs="?", help='Words to find, e.g. "transformers attention"; word* for prefixes')
+    parser.add_argument("--field", choices=FIELDS, help="Only search questions or only answers")
+    parser.add_argument("--user", help="Filter by username")
+    parser.add_argument("--role", help="Filter by job role")
+    parser.add_argument("--page", type=int, default=0, help="Zero-based results page")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Results per page")
+    parser.add_argument("--raw", action="store_true", help="Treat the query as FTS5 syntax (OR, NOT, NEAR, phrases)")
+    parser.add_argument("--backfill", action="store_true", help="Index every existing answer, then exit")
+    parser.add_argument("--compare-like", action="store_true", help="Time the query against a LIKE scan")
+    parser.add_argument("--db", default=storage.DB_PATH, help="Path to the SQLite database file")
+    args = parser.parse_args()
+
+    storage.set_db_path(args.db)
+    try:
+        with storage.get_pool().connection() as conn:
+            if args.backfill:
+                print(f"Indexed {backfill(conn)} answers.")
+            elif not args.query:
+                parser.error("a query is required unless --backfill is given")
+            elif args.compare_like:
+                timings = compare_with_like(conn, args.query)
+                for name, (matches, seconds) in timings.items():
+                    print(f"{name:<5}{matches:>8} matches {seconds * 1000:>10.2f}ms")
+            else:
+                indexed, total = index_coverage(conn)
+                if indexed < total:
+                    print(f"Warning: only {indexed} of {total} answers are indexed; run with --backfill.")
+                rows = search(conn, args.query, args.user, args.role, args.field, args.page, args.page_size, args.raw)
+                print_results(rows, count_matches(conn, args.query, args.user, args.role, args.field, args.raw),
+                              args.page, args.page_size)
+    except sqlite3.OperationalError as e:
+        print(f"Search failed: {e}")
@@ -0,0 +1,685 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import REGISTRY, timed
+
+DB_PATH = os.environ.get("INTERVIEWS_DB", "interviews.db")
+POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+WRITE_BATCH_SIZE = 200
+WRITE_BATCH_DELAY = 0.05  # seconds to wait for more rows before committing a batch
+LEADERBOARD_SIZE = 5
+WARM_ROLES = 10  # Roles with the most finished sessions whose leaderboards are loaded at startup
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of SQLite connections shared by every session in the process.
+
+    Connections use WAL so readers never block the writer, `synchronous=NORMAL` so a
+    commit does not wait on a full fsync, and a busy timeout instead of failing fast
+    with "database is locked".
+    """
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.wait_seconds = 0.0  # Time spent blocked waiting for a free connection
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool when the block exits."""
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                grow = self.created < self.size
+                if grow:
+                    self.created += 1
+            if grow:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self.lock:
+                        self.created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                conn = self.idle.get()
+                with self.lock:
+                    self.wait_seconds += time.perf_counter() - started
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self.lock:
+            self.created = 0
+
+
+class WriteBehindQueue:
+    """
+    Collects writes from all sessions and commits them in shared transactions.
+
+    A background thread drains the queue, grouping up to WRITE_BATCH_SIZE statements
+    (or whatever arrives within WRITE_BATCH_DELAY) into one commit. `flush()` blocks
+    until everything queued before it is on disk.
+    """
+
+    def __init__(self, pool, max_batch=WRITE_BATCH_SIZE, max_delay=WRITE_BATCH_DELAY):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.items = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="db-write-behind", daemon=True)
+        self.thread.start()
+
+    def put(self, sql, params):
+        self.items.put((sql, params))
+
+    def flush(self, timeout=None):
+        """
+        Wait until all previously queued writes are committed.
+
+        Returns:
+            bool: False if `timeout` expired first.
+        """
+        marker = threading.Event()
+        self.items.put(marker)
+        return marker.wait(timeout)
+
+    def run(self):
+        while True:
+            batch = [self.items.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.items.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, batch):
+        statements = [item for item in batch if not isinstance(item, threading.Event)]
+        try:
+            if statements:
+                with self.pool.connection() as conn:
+                    try:
+                        with conn:
+                            for sql, params in statements:
+                                conn.execute(sql, params)
+                    except sqlite3.Error:
+                        # One bad row must not drop the rest of the batch
+                        logger.exception("Batched write failed, retrying %d statements one by one", len(statements))
+                        for sql, params in statements:
+                            try:
+                                with conn:
+                                    conn.execute(sql, params)
+                            except sqlite3.Error:
+                                logger.exception("Dropped write: %s %r", sql, params)
+        except Exception:
+            logger.exception("Write-behind batch failed")
+        finally:
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+
+def init_db(conn):
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS interviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            job_role TEXT,
+            question TEXT,
+            answer TEXT,
+            question_score INTEGER,
+            total_score INTEGER,
+            selected TEXT,
+            timestamp TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_user_role ON interviews (username, job_role)")
+    # One row per interview attempt; answers point at it through interviews.session_id.
+    # interviews.total_score/selected are only filled on rows written before sessions existed.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            job_role TEXT,
+            started_at TEXT,
+            ended_at TEXT,
+            total_score INTEGER,
+            selected TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_role ON sessions (username, job_role, ended_at)")
+    columns = [row[1] for row in c.execute("PRAGMA table_info(interviews)")]
+    if "session_id" not in columns:
+        c.execute("ALTER TABLE interviews ADD COLUMN session_id INTEGER REFERENCES sessions (id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_interviews_session ON interviews (session_id)")
+    # What the question was generated as; NULL on rows written before these columns existed
+    if "topic" not in columns:
+        c.execute("ALTER TABLE interviews ADD COLUMN topic TEXT")
+    if "difficulty" not in columns:
+        c.execute("ALTER TABLE interviews ADD COLUMN difficulty TEXT")
+    # Best completed score per user and role, updated as each session finishes
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            job_role TEXT,
+            username TEXT,
+            best_score INTEGER,
+            session_id INTEGER REFERENCES sessions (id),
+            achieved_at TEXT,
+            PRIMARY KEY (job_role, username)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard (job_role, best_score DESC)")
+    # Pre-generated questions per normalized role/topic/difficulty (see question_bank.py)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role_key TEXT,
+            topic TEXT,
+            difficulty TEXT,
+            question TEXT,
+            question_hash TEXT,
+            created_at TEXT,
+            UNIQUE (role_key, topic, difficulty, question_hash)
+        )
+    """)
+    # Incrementally maintained summaries of completed sessions (see analytics.py)
+    c.execute("CREATE TABLE IF NOT EXISTS analytics_sessions (session_id INTEGER PRIMARY KEY)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS score_histogram (
+            role_key TEXT,
+            topic TEXT,
+            difficulty TEXT,
+            score INTEGER,
+            count INTEGER,
+            PRIMARY KEY (role_key, topic, difficulty, score)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS total_histogram (
+            role_key TEXT,
+            score INTEGER,
+            count INTEGER,
+            PRIMARY KEY (role_key, score)
+        )
+    """)
+    # Sufficient statistics per question: mean, spread and correlation with the session total
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS question_stats (
+            role_key TEXT,
+            topic TEXT,
+            difficulty TEXT,
+            question_hash TEXT,
+            question TEXT,
+            answers INTEGER,
+            score_sum REAL,
+            score_sq_sum REAL,
+            total_sum REAL,
+            total_sq_sum REAL,
+            cross_sum REAL,
+            PRIMARY KEY (role_key, topic, difficulty, question_hash)
+        )
+    """)
+    # Sessions already shipped by each named bulk export (see export.py)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS exported_sessions (
+            export_name TEXT,
+            session_id INTEGER REFERENCES sessions (id),
+            exported_at TEXT,
+            archive TEXT,
+            PRIMARY KEY (export_name, session_id)
+        )
+    """)
+    init_search_index(c)
+    # LLM base scores by (question, exact answer), reused for identical submissions (see prescore.py)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS scored_answers (
+            answer_hash TEXT PRIMARY KEY,
+            score INTEGER,
+            explanation TEXT,
+            scored_at TEXT
+        )
+    """)
+    # Audit trail of every evaluation answered without the LLM
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_shortcuts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER REFERENCES sessions (id),
+            username TEXT,
+            job_role TEXT,
+            question TEXT,
+            answer TEXT,
+            reason TEXT,
+            score INTEGER,
+            created_at TEXT
+        )
+    """)
+    # Latest serialized InterviewState per resume token; any worker process can pick a session up
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS interview_checkpoints (
+            token TEXT PRIMARY KEY,
+            session_id INTEGER REFERENCES sessions (id),
+            version INTEGER,
+            state TEXT,
+            updated_at TEXT
+        )
+    """)
+    # Question embeddings per role shard, for near-duplicate detection (see question_index.py)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS question_embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shard TEXT,
+            question_hash TEXT,
+            question TEXT,
+            vector BLOB,
+            created_at TEXT,
+            UNIQUE (shard, question_hash)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_question_embeddings_shard ON question_embeddings (shard, id)")
+    # Banked questions the backfill found to be near-duplicates: not indexed, and not embedded again
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS question_duplicates (
+            shard TEXT,
+            question_hash TEXT,
+            created_at TEXT,
+            PRIMARY KEY (shard, question_hash)
+        )
+    """)
+    # Leaderboard and score history results, rewritten whenever a session finishes (see cached_read)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS read_cache (
+            scope TEXT PRIMARY KEY,
+            version INTEGER,
+            value TEXT
+        )
+    """)
+    conn.commit()
+
+
+def init_search_index(c):
+    """
+    Full-text index over interviews.question/answer, kept in sync by triggers (see search.py).
+
+    Rows written before the index existed are only searchable after `python search.py --backfill`.
+    SQLite builds without FTS5 skip the index; everything except search keeps working.
+    """
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'interviews_fts'").fetchone()
+    try:
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS interviews_fts USING fts5(
+                question, answer, content='interviews', content_rowid='id', tokenize='porter unicode61'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning("Full-text search unavailable (%s)", e)
+        return
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS interviews_fts_insert AFTER INSERT ON interviews BEGIN
+            INSERT INTO interviews_fts (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS interviews_fts_delete AFTER DELETE ON interviews BEGIN
+            INSERT INTO interviews_fts (interviews_fts, rowid, question, answer)
+            VALUES ('delete', old.id, old.question, old.answer);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS interviews_fts_update AFTER UPDATE OF question, answer ON interviews BEGIN
+            INSERT INTO interviews_fts (interviews_fts, rowid, question, answer)
+            VALUES ('delete', old.id, old.question, old.answer);
+            INSERT INTO interviews_fts (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+        END
+    """)
+    if not exists and c.execute("SELECT 1 FROM interviews LIMIT 1").fetchone():
+        logger.warning("Search index created on a database with existing answers; run `python search.py --backfill`")
+
+
+def update_leaderboard(conn, session_id, username, job_role, total_score, achieved_at):
+    # Keeps only a user's best score per role; a lower score leaves the row untouched
+    conn.execute("""
+        INSERT INTO leaderboard (job_role, username, best_score, session_id, achieved_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (job_role, username) DO UPDATE SET
+            best_score = excluded.best_score,
+            session_id = excluded.session_id,
+            achieved_at = excluded.achieved_at
+        WHERE excluded.best_score > leaderboard.best_score
+    """, (job_role, username, total_score, session_id, achieved_at))
+    refresh_cached_reads(conn, username, job_role)
+
+
+# Read Cache
+def _leaderboard_scope(job_role):
+    return f"leaderboard\x1f{job_role}"
+
+
+def _history_scope(username, job_role):
+    return f"history\x1f{job_role}\x1f{username}"
+
+
+def _query_leaderboard(conn, job_role):
+    return conn.execute("""
+        SELECT username, job_role, best_score
+        FROM leaderboard
+        WHERE job_role = ?
+        ORDER BY best_score DESC
+        LIMIT ?
+    """, (job_role, LEADERBOARD_SIZE)).fetchall()
+
+
+def _query_user_history(conn, username, job_role):
+    rows = conn.execute("""
+        SELECT total_score
+        FROM sessions
+        WHERE username = ? AND job_role = ? AND total_score IS NOT NULL
+        ORDER BY ended_at DESC
+    """, (username, job_role)).fetchall()
+    return [row[0] for row in rows]
+
+
+def refresh_cached_reads(conn, username, job_role):
+    """
+    Rewrite the cached leaderboard for `job_role` and the score history of `username`.
+
+    Runs inside the caller's transaction, so every process sees the new results
+    with the same commit that finished the session, and no cache is ever stale.
+    """
+    for scope, value in ((_leaderboard_scope(job_role), _query_leaderboard(conn, job_role)),
+                         (_history_scope(username, job_role), _query_user_history(conn, username, job_role))):
+        conn.execute("""
+            INSERT INTO read_cache (scope, version, value) VALUES (?, 1, ?)
+            ON CONFLICT (scope) DO UPDATE SET version = read_cache.version + 1, value = excluded.value
+        """, (scope, json.dumps(value)))
+
+
+_reads = {}  # scope -> (version, value): this process's copy of read_cache rows
+_reads_lock = threading.Lock()
+
+
+def cached_read(scope, compute):
+    """
+    Result for `scope` from read_cache, kept in memory until its version changes.
+
+    A hit costs one primary-key lookup of the version; the value is only decoded
+    again after another session (in any process) has finished and rewritten it.
+    A scope never written yet is computed once and stored for every process.
+
+    Args:
+        scope (str): read_cache key.
+        compute (callable): `compute(conn)` builds the value from the base tables.
+
+    Returns:
+        The JSON-decoded value.
+    """
+    with _reads_lock:
+        local = _reads.get(scope)
+    with get_pool().connection() as conn:
+        row = conn.execute("SELECT version, CASE WHEN version = ? THEN NULL ELSE value END FROM read_cache WHERE scope = ?",
+                           (local[0] if local else -1, scope)).fetchone()
+        if row is None:
+            result = "miss"
+            version, value = 0, json.loads(json.dumps(compute(conn)))
+            with conn:
+                # A session finishing meanwhile has already written version 1, which wins
+                conn.execute("INSERT OR IGNORE INTO read_cache (scope, version, value) VALUES (?, 0, ?)",
+                             (scope, json.dumps(value)))
+        elif row[1] is None:
+            result = "hit"
+            version, value = local
+        else:
+            result = "refresh"
+            version, value = row[0], json.loads(row[1])
+    REGISTRY.inc("read_cache_lookups_total", help="Leaderboard and history reads by outcome.",
+                 kind=scope.split("\x1f", 1)[0], result=result)
+    if result != "hit":
+        with _reads_lock:
+            _reads[scope] = (version, value)
+    return value
+
+
+def warm_read_cache(top=WARM_ROLES):
+    """
+    Load the leaderboards of the `top` roles with the most finished sessions.
+
+    Returns:
+        list: The roles warmed.
+    """
+    with get_pool().connection() as conn:
+        roles = [row[0] for row in conn.execute("""
+            SELECT job_role FROM sessions WHERE ended_at IS NOT NULL
+            GROUP BY job_role ORDER BY COUNT(*) DESC LIMIT ?
+        """, (top,))]
+    for job_role in roles:
+        fetch_leaderboard(job_role)
+    return roles
+
+
+_pool = None
+_writer = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool for DB_PATH; the schema is created on first use."""
+    global _pool, _writer
+    with _lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB_PATH)
+            with _pool.connection() as conn:
+                init_db(conn)
+            _writer = WriteBehindQueue(_pool)
+        return _pool
+
+
+def get_writer():
+    get_pool()
+    return _writer
+
+
+def set_db_path(db_path):
+    """Point the process at another database file (tools and benchmarks)."""
+    global DB_PATH, _pool, _writer
+    flush()
+    with _lock:
+        if _pool is not None:
+            _pool.close()
+        DB_PATH = db_path
+        _pool = None
+        _writer = None
+    with _reads_lock:
+        _reads.clear()
+
+
+@timed("db_flush")
+def flush(timeout=None):
+    """Commit every queued write; call before reading rows this process just saved."""
+    with _lock:
+        writer = _writer
+    return writer.flush(timeout) if writer else True
+
+
+atexit.register(flush, 10)
+
+
+# Database Functions
+@timed("db_start_session")
+def start_session(username, job_role):
+    """
+    Open a new interview session.
+
+    Returns:
+        int: The session id that answers and final results are recorded against.
+    """
+    with get_pool().connection() as conn:
+        c = conn.execute(
+            "INSERT INTO sessions (username, job_role, started_at) VALUES (?, ?, ?)",
+            (username, job_role, datetime.now().isoformat()),
+        )
+        conn.commit()
+        return c.lastrowid
+
+
+@timed("db_save_question_answer")
+def save_question_answer(session_id, username, job_role, question, answer, question_score, topic=None,
+                         difficulty=None):
+    get_writer().put("""
+        INSERT INTO interviews (session_id, username, job_role, question, answer, question_score, topic, difficulty,
+                                timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (session_id, username, job_role, question, answer, question_score, topic, difficulty,
+          datetime.now().isoformat()))
+
+
+@timed("db_save_final_results")
+def save_final_results(session_id, total_score, selected):
+    """
+    Close a session and fold its score into the leaderboard.
+
+    A session is only closed once, so a repeated call (e.g. a rerun) cannot overwrite it.
+
+    Returns:
+        bool: True if the session was closed by this call.
+    """
+    flush()  # Every answer of the session is committed before the session is closed
+    ended_at = datetime.now().isoformat()
+    with get_pool().connection() as conn:
+        with conn:
+            c = conn.execute("""
+                UPDATE sessions
+                SET ended_at = ?, total_score = ?, selected = ?
+                WHERE id = ? AND ended_at IS NULL
+            """, (ended_at, total_score, "Selected" if selected else "Not Selected", session_id))
+            if c.rowcount == 0:
+                return False
+            username, job_role = conn.execute(
+                "SELECT username, job_role FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            update_leaderboard(conn, session_id, username, job_role, total_score, ended_at)
+    return True
+
+
+@timed("db_fetch_scored_answer")
+def fetch_scored_answer(answer_hash):
+    """
+    Returns:
+        tuple or None: (score, explanation) the LLM gave this exact answer before.
+    """
+    with get_pool().connection() as conn:
+        return conn.execute(
+            "SELECT score, explanation FROM scored_answers WHERE answer_hash = ?", (answer_hash,)
+        ).fetchone()
+
+
+@timed("db_save_scored_answer")
+def save_scored_answer(answer_hash, score, explanation):
+    # The first evaluation stays: a resubmitted answer always gets the same score
+    get_writer().put("""
+        INSERT OR IGNORE INTO scored_answers (answer_hash, score, explanation, scored_at) VALUES (?, ?, ?, ?)
+    """, (answer_hash, score, explanation, datetime.now().isoformat()))
+
+
+@timed("db_save_evaluation_shortcut")
+def save_evaluation_shortcut(session_id, username, job_role, question, answer, reason, score):
+    get_writer().put("""
+        INSERT INTO evaluation_shortcuts (session_id, username, job_role, question, answer, reason, score, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (session_id, username, job_role, question, answer, reason, score, datetime.now().isoformat()))
+
+
+@timed("db_save_checkpoint")
+def save_checkpoint(token, session_id, version, state):
+    """
+    Queue the latest state of an interview for `load_checkpoint`.
+
+    A checkpoint only replaces one with a lower version, so a late write from a
+    stale tab or worker cannot roll a session back.
+
+    Args:
+        token (str): Resume token.
+        session_id (int): Session the interview records answers against.
+        version (int): Increases with every checkpoint of the same interview.
+        state (str): Serialized InterviewState.
+    """
+    get_writer().put("""
+        INSERT INTO interview_checkpoints (token, session_id, version, state, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (token) DO UPDATE SET
+            session_id = excluded.session_id,
+            version = excluded.version,
+            state = excluded.state,
+            updated_at = excluded.updated_at
+        WHERE excluded.version > interview_checkpoints.version
+    """, (token, session_id, version, state, datetime.now().isoformat()))
+
+
+@timed("db_load_checkpoint")
+def load_checkpoint(token):
+    """
+    Returns:
+        str or None: The newest serialized InterviewState saved under `token`.
+    """
+    flush()  # A checkpoint this process just queued is visible
+    with get_pool().connection() as conn:
+        row = conn.execute("SELECT state FROM interview_checkpoints WHERE token = ?", (token,)).fetchone()
+    return row[0] if row else None
+
+
+@timed("db_fetch_leaderboard")
+def fetch_leaderboard(job_role):
+    """
+    Returns:
+        list: Top (username, job_role, best_score) tuples for `job_role`, current as of
+        the last finished session in any process.
+    """
+    rows = cached_read(_leaderboard_scope(job_role), lambda conn: _query_leaderboard(conn, job_role))
+    return [tuple(row) for row in rows]
+
+
+@timed("db_fetch_user_history")
+def fetch_user_history(username, job_role):
+    """
+    Returns:
+        list: The user's finished scores for `job_role`, newest first.
+    """
+    return list(cached_read(_history_scope(username, job_role),
+                            lambda conn: _query_user_history(conn, username, job_role)))